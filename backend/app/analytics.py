@@ -0,0 +1,389 @@
+"""
+Sales rollups: units, revenue and order count per day x category x status.
+
+`sales_rollups` holds one document per (day, category, status), where day
+is the UTC date the order was placed. Orders move between statuses, so an
+order's numbers always sit under its current status:
+
+- record_order adds a new order under "pending"
+- record_status_change moves an order's numbers from its old status to
+  the new one
+
+Both are $inc upserts issued after the order write. If one fails the
+rollups drift from the orders, and rebuild() recomputes them: it
+aggregates orders in _id chunks on the server ($merge into a staging
+collection named for the run) and swaps the result in. Status changes
+made to orders the rebuild already passed are lost in the swap, so run it
+when order traffic is quiet (or run it again). One rebuild runs at a time
+across all workers: each holds a lease in the `locks` collection, renewed
+between chunks.
+
+Items of orders placed before line items carried their category are
+matched to the product's current category.
+"""
+import asyncio
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError, PyMongoError
+
+from app.config import settings
+from app.indexes import declare_index, hot_query
+
+ROLLUPS = "sales_rollups"
+# Prefix of the per-run staging collections
+STAGING = "sales_rollups_rebuild"
+LOCKS = "locks"
+REBUILD_LOCK = "sales_rollups_rebuild"
+KEY = ("day", "category", "status")
+UNKNOWN_CATEGORY = "Unknown"
+DAY_FORMAT = "%Y-%m-%d"
+
+declare_index(ROLLUPS, [("day", 1), ("category", 1), ("status", 1)], unique=True)
+hot_query("sales rollups: by day", ROLLUPS, {"day": {"$gte": "2024-01-01", "$lte": "2024-01-31"}})
+
+
+def _day(created_at: datetime) -> str:
+    return created_at.strftime(DAY_FORMAT)
+
+
+def order_contributions(order: dict) -> Dict[str, Tuple[int, float]]:
+    """category -> (units, revenue) for one order"""
+    totals: Dict[str, Tuple[int, float]] = {}
+    for item in order["items"]:
+        category = item.get("category") or UNKNOWN_CATEGORY
+        units, revenue = totals.get(category, (0, 0.0))
+        totals[category] = (units + item["quantity"], revenue + item["quantity"] * item["price"])
+    return totals
+
+
+def _increments(order: dict, status: str, sign: int) -> List[UpdateOne]:
+    day = _day(order["created_at"])
+    now = datetime.utcnow()
+    return [
+        UpdateOne(
+            {"day": day, "category": category, "status": status},
+            {
+                "$inc": {"units": sign * units, "revenue": sign * revenue, "orders": sign},
+                "$set": {"updated_at": now},
+            },
+            upsert=True,
+        )
+        for category, (units, revenue) in order_contributions(order).items()
+    ]
+
+
+async def _apply(db, updates: List[UpdateOne], what: str):
+    if not updates or not settings.ANALYTICS_ENABLED:
+        return
+    try:
+        await db[ROLLUPS].bulk_write(updates, ordered=False)
+    except PyMongoError as e:
+        # The order itself is fine; a rebuild brings the rollups back in line
+        print(f"⚠️  Sales rollups not updated for {what}: {e}")
+
+
+async def record_order(db, order: dict):
+    """Add a newly placed order to the rollups"""
+    await _apply(db, _increments(order, order.get("status", "pending"), 1), f"order {order['_id']}")
+
+
+async def _fill_categories(db, order: dict):
+    """Give older orders' items their product's current category, as rebuild() does"""
+    missing = {item["product_id"] for item in order["items"] if not item.get("category")}
+    if not missing:
+        return
+    cursor = db.products.find(
+        {"_id": {"$in": [ObjectId(pid) for pid in missing if ObjectId.is_valid(pid)]}}, {"category": 1}
+    )
+    categories = {str(product["_id"]): product.get("category") async for product in cursor}
+    for item in order["items"]:
+        if not item.get("category"):
+            item["category"] = categories.get(item["product_id"])
+
+
+async def record_status_change(db, order: dict, new_status: str):
+    """Move an order's numbers from `order["status"]` (its old status) to `new_status`"""
+    if order["status"] == new_status or not settings.ANALYTICS_ENABLED:
+        return
+    await _fill_categories(db, order)
+    updates = _increments(order, order["status"], -1) + _increments(order, new_status, 1)
+    await _apply(db, updates, f"order {order['_id']}")
+
+
+# Queries
+
+GROUPS = ("day", "category", "status")
+
+
+async def sales(db, start: Optional[str] = None, end: Optional[str] = None,
+                category: Optional[str] = None, status: Optional[str] = None,
+                group_by: Tuple[str, ...] = ("day", "category")) -> List[dict]:
+    """Rollup totals between two days (inclusive), grouped by `group_by`"""
+    query = {}
+    if start or end:
+        query["day"] = {}
+        if start:
+            query["day"]["$gte"] = start
+        if end:
+            query["day"]["$lte"] = end
+    if category:
+        query["category"] = category
+    if status:
+        query["status"] = status
+
+    pipeline = [
+        {"$match": query},
+        {"$group": {
+            "_id": {name: f"${name}" for name in group_by},
+            "units": {"$sum": "$units"},
+            "revenue": {"$sum": "$revenue"},
+            "orders": {"$sum": "$orders"},
+        }},
+        {"$sort": {f"_id.{name}": 1 for name in group_by}},
+    ]
+    rows = []
+    async for row in db[ROLLUPS].aggregate(pipeline):
+        rows.append({**row.pop("_id"), **row, "revenue": round(row["revenue"], 2)})
+    return rows
+
+
+# Rebuild
+
+def _lookup_categories() -> list:
+    """Stages filling in items.category from products for older orders"""
+    return [
+        {"$set": {"items.product_oid": {
+            "$convert": {"input": "$items.product_id", "to": "objectId", "onError": None, "onNull": None}
+        }}},
+        {"$lookup": {
+            "from": "products", "localField": "items.product_oid", "foreignField": "_id", "as": "product",
+        }},
+        {"$set": {"items.category": {
+            "$ifNull": ["$items.category", {"$arrayElemAt": ["$product.category", 0]}]
+        }}},
+    ]
+
+
+def _id_range(after, last) -> dict:
+    """_id filter for after < _id <= last (no lower bound for the first chunk)"""
+    bounds = {"$lte": last}
+    if after is not None:
+        bounds["$gt"] = after
+    return {"_id": bounds}
+
+
+def rebuild_pipeline(staging: str, after, last, lookup: bool) -> list:
+    """Aggregate the orders in one _id chunk into the staging collection"""
+    return [
+        {"$match": _id_range(after, last)},
+        {"$project": {"created_at": 1, "status": 1, "items": 1}},
+        {"$unwind": "$items"},
+        *(_lookup_categories() if lookup else []),
+        # Per order and category first, so each order counts once
+        {"$group": {
+            "_id": {"order": "$_id", "category": {"$ifNull": ["$items.category", UNKNOWN_CATEGORY]}},
+            "day": {"$first": {"$dateToString": {"format": DAY_FORMAT, "date": "$created_at"}}},
+            "status": {"$first": "$status"},
+            "units": {"$sum": "$items.quantity"},
+            "revenue": {"$sum": {"$multiply": ["$items.quantity", "$items.price"]}},
+        }},
+        {"$group": {
+            "_id": {"day": "$day", "category": "$_id.category", "status": "$status"},
+            "units": {"$sum": "$units"},
+            "revenue": {"$sum": "$revenue"},
+            "orders": {"$sum": 1},
+        }},
+        {"$project": {
+            "_id": 0, "day": "$_id.day", "category": "$_id.category", "status": "$_id.status",
+            "units": 1, "revenue": 1, "orders": 1, "updated_at": "$$NOW",
+        }},
+        {"$merge": {
+            "into": staging,
+            "on": list(KEY),
+            "whenMatched": [{"$set": {
+                "units": {"$add": ["$units", "$$new.units"]},
+                "revenue": {"$add": ["$revenue", "$$new.revenue"]},
+                "orders": {"$add": ["$orders", "$$new.orders"]},
+                "updated_at": "$$new.updated_at",
+            }}],
+            "whenNotMatched": "insert",
+        }},
+    ]
+
+
+async def _next_chunk(db, after, chunk_size: int):
+    """(last _id, order count) of the next chunk after `after`, or None when done.
+
+    The chunk end is found by skipping along the _id index on the server,
+    so no ids are shipped to the app.
+    """
+    query = {"_id": {"$gt": after}} if after is not None else {}
+    end = await db.orders.find(query, {"_id": 1}).sort("_id", 1).skip(chunk_size - 1).limit(1) \
+        .to_list(length=1)
+    if end:
+        return end[0]["_id"], chunk_size
+    # Fewer than chunk_size orders left
+    end = await db.orders.find(query, {"_id": 1}).sort("_id", -1).limit(1).to_list(length=1)
+    if not end:
+        return None
+    return end[0]["_id"], await db.orders.count_documents(query)
+
+
+class RebuildLease:
+    """Lease on the rollup rebuild, held through a document in `locks`.
+
+    A lease that is not renewed lapses after `seconds`, so a crashed
+    worker does not block rebuilds for good.
+    """
+
+    def __init__(self, db, seconds: Optional[float] = None):
+        self.db = db
+        self.seconds = seconds or settings.ANALYTICS_REBUILD_LEASE_SECONDS
+        self.owner = ObjectId()
+
+    def _expiry(self) -> datetime:
+        return datetime.utcnow() + timedelta(seconds=self.seconds)
+
+    async def acquire(self) -> bool:
+        """Take the lease; False if another run holds it"""
+        lock = {"owner": self.owner, "expires_at": self._expiry()}
+        try:
+            await self.db[LOCKS].insert_one({"_id": REBUILD_LOCK, **lock})
+            return True
+        except DuplicateKeyError:
+            pass
+        # Take over a lapsed lease
+        result = await self.db[LOCKS].update_one(
+            {"_id": REBUILD_LOCK, "expires_at": {"$lte": datetime.utcnow()}}, {"$set": lock}
+        )
+        return result.modified_count == 1
+
+    async def renew(self):
+        """Extend the lease. Raises RuntimeError if it lapsed and was taken over"""
+        result = await self.db[LOCKS].update_one(
+            {"_id": REBUILD_LOCK, "owner": self.owner}, {"$set": {"expires_at": self._expiry()}}
+        )
+        if result.matched_count == 0:
+            raise RuntimeError("Rebuild lease lost to another run")
+
+    async def release(self):
+        await self.db[LOCKS].delete_one({"_id": REBUILD_LOCK, "owner": self.owner})
+
+
+async def _drop_stale_staging(db, current: str):
+    """Staging collections left by runs that crashed or were cancelled"""
+    for name in await db.list_collection_names(filter={"name": {"$regex": f"^{STAGING}_"}}):
+        if name != current:
+            await db[name].drop()
+
+
+async def rebuild(db, chunk_size: Optional[int] = None, progress: Optional[dict] = None,
+                  lease: Optional[RebuildLease] = None) -> dict:
+    """Recompute every rollup from the orders collection and swap it in.
+
+    Takes the rebuild lease unless given one already held; RuntimeError if
+    another run holds it.
+    """
+    if lease is None:
+        lease = RebuildLease(db)
+        if not await lease.acquire():
+            raise RuntimeError("A rebuild is already running")
+    staging = f"{STAGING}_{lease.owner}"
+    try:
+        await _drop_stale_staging(db, staging)
+        return await _rebuild(db, lease, staging, chunk_size or settings.ANALYTICS_REBUILD_CHUNK_SIZE,
+                              progress if progress is not None else {})
+    except BaseException:
+        await db[staging].drop()
+        raise
+    finally:
+        await lease.release()
+
+
+async def _rebuild(db, lease: RebuildLease, staging: str, chunk_size: int, progress: dict) -> dict:
+    started = time.perf_counter()
+    await db[staging].create_index([(name, 1) for name in KEY], unique=True)
+
+    after, chunks, scanned = None, 0, 0
+    progress.update({"orders_scanned": 0, "chunks": 0})
+    while True:
+        chunk = await _next_chunk(db, after, chunk_size)
+        if chunk is None:
+            break
+        last, count = chunk
+        # The category lookup is only needed for chunks with older orders
+        lookup = await db.orders.find_one(
+            {**_id_range(after, last), "items": {"$elemMatch": {"category": {"$exists": False}}}},
+            {"_id": 1}
+        ) is not None
+        await db.orders.aggregate(rebuild_pipeline(staging, after, last, lookup)).to_list(length=None)
+        await lease.renew()
+
+        after = last
+        chunks += 1
+        scanned += count
+        progress.update({"chunks": chunks, "orders_scanned": scanned})
+        # Let requests in between chunks
+        await asyncio.sleep(0)
+
+    rollups = await db[staging].count_documents({})
+    if rollups:
+        await db[staging].rename(ROLLUPS, dropTarget=True)
+    else:
+        await db[staging].drop()
+        await db[ROLLUPS].delete_many({})
+
+    return {
+        "orders": scanned,
+        "chunks": chunks,
+        "rollups": rollups,
+        "seconds": round(time.perf_counter() - started, 2),
+    }
+
+
+# Background rebuild for the admin endpoint
+
+_rebuild_task: Optional[asyncio.Task] = None
+_rebuild_status: dict = {"state": "idle"}
+
+
+def rebuild_status() -> dict:
+    return dict(_rebuild_status)
+
+
+async def start_rebuild(db) -> bool:
+    """Start a rebuild in the background; False if one is already running in any worker"""
+    global _rebuild_task
+    if _rebuild_task is not None and not _rebuild_task.done():
+        return False
+    lease = RebuildLease(db)
+    if not await lease.acquire():
+        return False
+
+    async def run():
+        _rebuild_status.clear()
+        _rebuild_status.update({"state": "running", "started_at": datetime.utcnow()})
+        try:
+            result = await rebuild(db, progress=_rebuild_status, lease=lease)
+            _rebuild_status.update({"state": "finished", **result})
+        except Exception as e:
+            _rebuild_status.update({"state": "failed", "error": str(e)})
+            print(f"⚠️  Sales rollup rebuild failed: {e}")
+        _rebuild_status["finished_at"] = datetime.utcnow()
+
+    _rebuild_task = asyncio.create_task(run())
+    return True
+
+
+async def stop_rebuild():
+    """Cancel a running background rebuild (its staging collection is dropped)"""
+    if _rebuild_task is not None and not _rebuild_task.done():
+        _rebuild_task.cancel()
+        try:
+            await _rebuild_task
+        except asyncio.CancelledError:
+            pass
@@ -1,9 +1,14 @@
 from datetime import datetime, timedelta
 from typing import Optional
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from fastapi import HTTPException, status
 from jose import JWTError, jwt
+import asyncio
 import hashlib
 import secrets
+import time
 from app.config import settings
+from app.instrumentation import timed_phase
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
@@ -29,6 +34,70 @@ def get_password_hash(password: str) -> str:
     return f"{salt.hex()}:{password_hash.hex()}"
 
 
+# Password hashing pool
+#
+# PBKDF2 with 100,000 iterations takes tens of milliseconds of CPU, so the
+# async handlers run it in a bounded pool instead of on the event loop.
+# Requests beyond PASSWORD_HASH_WORKERS + PASSWORD_HASH_QUEUE_SIZE are
+# rejected with 429 rather than queued without limit.
+
+_hash_executor: Optional[Executor] = None
+_hash_in_flight = 0
+
+
+def _get_hash_executor() -> Executor:
+    global _hash_executor
+    if _hash_executor is None:
+        if settings.PASSWORD_HASH_EXECUTOR == "process":
+            _hash_executor = ProcessPoolExecutor(max_workers=settings.PASSWORD_HASH_WORKERS)
+        else:
+            _hash_executor = ThreadPoolExecutor(
+                max_workers=settings.PASSWORD_HASH_WORKERS,
+                thread_name_prefix="password-hash",
+            )
+    return _hash_executor
+
+
+async def _run_hashing(func, *args):
+    global _hash_in_flight
+    if settings.PASSWORD_HASH_WORKERS <= 0:
+        return func(*args)
+    
+    if _hash_in_flight >= settings.PASSWORD_HASH_WORKERS + settings.PASSWORD_HASH_QUEUE_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many authentication requests, please retry shortly",
+            headers={"Retry-After": str(settings.PASSWORD_HASH_RETRY_AFTER_SECONDS)},
+        )
+    
+    _hash_in_flight += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_get_hash_executor(), func, *args)
+    finally:
+        _hash_in_flight -= 1
+
+
+@timed_phase("auth")
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password in the hashing pool"""
+    return await _run_hashing(verify_password, plain_password, hashed_password)
+
+
+@timed_phase("auth")
+async def get_password_hash_async(password: str) -> str:
+    """Hash a password in the hashing pool"""
+    return await _run_hashing(get_password_hash, password)
+
+
+def shutdown_hashing_pool():
+    """Stop the hashing pool workers"""
+    global _hash_executor
+    if _hash_executor is not None:
+        _hash_executor.shutdown(wait=True)
+        _hash_executor = None
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """Create JWT access token"""
     to_encode = data.copy()
@@ -37,18 +106,27 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     else:
         expire = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     
-    to_encode.update({"exp": expire})
+    # jti keys the principal cache; a fractional iat lets revocation
+    # reject tokens issued even a moment before it
+    to_encode.update({"exp": expire, "iat": time.time(), "jti": secrets.token_urlsafe(16)})
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
 
-def verify_token(token: str):
-    """Verify JWT token"""
+def decode_token(token: str) -> Optional[dict]:
+    """Verify JWT token and return its claims"""
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            return None
-        return email
     except JWTError:
         return None
+    if payload.get("sub") is None:
+        return None
+    return payload
+
+
+def verify_token(token: str):
+    """Verify JWT token"""
+    payload = decode_token(token)
+    if payload is None:
+        return None
+    return payload["sub"]
@@ -0,0 +1,140 @@
+"""
+Faceted catalog browsing: filters, sort orders and facet counts.
+
+GET /products/ filters by category, price range and stock, and sorts by
+creation time or price with keyset cursors on the sort field. Every
+filter/sort combination is served by one of the compound indexes below;
+the stock filter is left to the residual match since nearly every product
+is in stock.
+
+GET /products/facets counts matching products per category and per price
+bucket in a single $facet aggregation. Each facet applies every filter
+except its own, so the counts show what picking another value would give.
+The counts are cached in the catalog cache, so product writes invalidate
+them; stock changes from checkouts show up within the cache TTL.
+"""
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException
+from pymongo import ASCENDING, DESCENDING
+
+from app.cache import catalog_cache
+from app.config import settings
+from app.indexes import declare_index, hot_query
+from app.pagination import keyset_sort
+
+SORTS = {
+    "created": ("created_at", ASCENDING),
+    "newest": ("created_at", DESCENDING),
+    "price_asc": ("price", ASCENDING),
+    "price_desc": ("price", DESCENDING),
+}
+
+# (created_at, _id) and (category, created_at, _id) are declared with the
+# products routes; these cover price sorts and price ranges
+declare_index("products", keyset_sort(field="price"))
+declare_index("products", [("category", 1)] + keyset_sort(field="price"))
+hot_query("products: by price", "products", {"price": {"$gte": 50, "$lte": 150}}, keyset_sort(field="price"))
+hot_query(
+    "products: category by price", "products",
+    {"category": "Running", "price": {"$gte": 50, "$lte": 150}}, keyset_sort(DESCENDING, "price"),
+)
+
+
+def resolve_sort(sort: str) -> Tuple[str, int]:
+    """(field, direction) for a ?sort= value; 400 if unknown"""
+    if sort not in SORTS:
+        raise HTTPException(status_code=400, detail=f"Invalid sort. Must be one of: {list(SORTS)}")
+    return SORTS[sort]
+
+
+def price_boundaries() -> List[float]:
+    """Lower bounds of the price buckets, from PRODUCT_PRICE_BUCKETS (validated ascending)"""
+    return [float(bound) for bound in settings.PRODUCT_PRICE_BUCKETS.split(",") if bound.strip()]
+
+
+def price_filter(min_price: Optional[float], max_price: Optional[float]) -> dict:
+    if min_price is not None and max_price is not None and min_price > max_price:
+        raise HTTPException(status_code=400, detail="min_price cannot be greater than max_price")
+    bounds = {}
+    if min_price is not None:
+        bounds["$gte"] = min_price
+    if max_price is not None:
+        bounds["$lte"] = max_price
+    return {"price": bounds} if bounds else {}
+
+
+def stock_filter(in_stock: bool) -> dict:
+    if not in_stock:
+        return {}
+    # Sharded hot SKUs keep their stock in stock_shards; the product counts
+    # the shards that still have some (see app.inventory)
+    return {"$or": [{"stock": {"$gt": 0}}, {"stocked_shards": {"$gt": 0}}]}
+
+
+def catalog_filter(category: Optional[str], min_price: Optional[float], max_price: Optional[float],
+                   in_stock: bool) -> dict:
+    """find() filter for the browsing parameters"""
+    query = {}
+    if category:
+        query["category"] = category
+    query.update(price_filter(min_price, max_price))
+    query.update(stock_filter(in_stock))
+    return query
+
+
+def _match(query: dict) -> list:
+    return [{"$match": query}] if query else []
+
+
+def facet_pipeline(category: Optional[str], min_price: Optional[float], max_price: Optional[float],
+                   in_stock: bool) -> list:
+    by_category = price_filter(min_price, max_price)
+    by_price = {"category": category} if category else {}
+    return _match(stock_filter(in_stock)) + [
+        {"$project": {"_id": 0, "category": 1, "price": 1}},
+        {"$facet": {
+            "total": _match({**by_category, **by_price}) + [{"$count": "count"}],
+            "categories": _match(by_category) + [
+                {"$group": {"_id": "$category", "count": {"$sum": 1}}},
+                {"$sort": {"_id": 1}},
+            ],
+            "prices": _match(by_price) + [
+                {"$bucket": {
+                    "groupBy": "$price",
+                    "boundaries": price_boundaries() + [float("inf")],
+                    "default": "other",
+                    "output": {"count": {"$sum": 1}},
+                }},
+            ],
+        }},
+    ]
+
+
+def _shape(result: dict) -> dict:
+    counts = {bucket["_id"]: bucket["count"] for bucket in result["prices"]}
+    bounds = price_boundaries()
+    return {
+        "total": result["total"][0]["count"] if result["total"] else 0,
+        "categories": [
+            {"category": group["_id"], "count": group["count"]} for group in result["categories"]
+        ],
+        "price_buckets": [
+            {"min": low, "max": high, "count": counts.get(low, 0)}
+            for low, high in zip(bounds, bounds[1:] + [None])
+        ],
+    }
+
+
+async def facet_counts(db, category: Optional[str] = None, min_price: Optional[float] = None,
+                       max_price: Optional[float] = None, in_stock: bool = False) -> dict:
+    """Matching product count, per-category counts and per-price-bucket counts"""
+    params = ("facets", category, min_price, max_price, in_stock)
+    cached = catalog_cache.get_list(params)
+    if cached is None:
+        generation = catalog_cache.generation
+        pipeline = facet_pipeline(category, min_price, max_price, in_stock)
+        result = await db.products.aggregate(pipeline).to_list(length=1)
+        cached = _shape(result[0])
+        catalog_cache.set_list(params, cached, generation)
+    return cached
@@ -0,0 +1,285 @@
+"""
+Streaming bulk import and export of the product catalog.
+
+Imports read NDJSON or CSV line by line, validate rows against
+ProductCreate in chunks and write each chunk with one unordered
+bulk_write, while the next chunk is being parsed. At most two chunks are
+held at a time, so memory stays flat whatever the file size.
+
+Rows with a `sku` are upserted by SKU, rows with an `_id` (as produced by
+the export) by id, and anything else is inserted. Fields a row leaves out
+keep their current value on update.
+"""
+import asyncio
+import codecs
+import csv
+import io
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import AsyncIterable, AsyncIterator, List, Optional, Tuple
+
+from bson import ObjectId
+from pydantic import ValidationError
+from pymongo import InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError
+
+from app.config import settings
+from app.indexes import declare_index, hot_query
+from app.schemas.schemas import ProductCreate
+from app.serialization import dumps
+
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:
+    import json
+    _loads = json.loads
+
+FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+EXPORT_FIELDS = ["_id", "sku", "name", "description", "price", "category", "image_url", "stock", "created_at"]
+
+declare_index("products", [("sku", 1)], unique=True, partialFilterExpression={"sku": {"$type": "string"}})
+hot_query("products: by sku", "products", {"sku": "SKU-00000000"})
+
+
+def format_from_content_type(content_type: str) -> Optional[str]:
+    media_type = content_type.split(";")[0].strip().lower()
+    for name, known in FORMATS.items():
+        if media_type == known:
+            return name
+    if media_type in ("application/json", "application/jsonl", "application/x-jsonlines"):
+        return "ndjson"
+    return None
+
+
+# Parsing
+
+async def iter_lines(chunks: AsyncIterable[bytes]) -> AsyncIterator[str]:
+    """Decode a stream of byte chunks into lines, keeping line endings"""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        lines = pending.splitlines(keepends=True)
+        pending = lines.pop() if lines and not lines[-1].endswith(("\n", "\r")) else ""
+        for line in lines:
+            yield line
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+
+async def iter_file_lines(path: str) -> AsyncIterator[str]:
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        for line in f:
+            yield line
+
+
+async def _ndjson_rows(lines: AsyncIterable[str]) -> AsyncIterator[Tuple[int, object]]:
+    number = 0
+    async for line in lines:
+        if not line.strip():
+            continue
+        number += 1
+        try:
+            yield number, _loads(line)
+        except ValueError as e:
+            yield number, e
+
+
+async def _csv_rows(lines: AsyncIterable[str], max_record: Optional[int] = None) -> AsyncIterator[Tuple[int, object]]:
+    max_record = max_record or settings.BULK_IMPORT_MAX_CSV_RECORD_CHARS
+    header = None
+    number = 0
+    record, quotes = [], 0
+    size = 0
+    async for line in lines:
+        record.append(line)
+        size += len(line)
+        quotes += line.count('"')
+        # A quoted field may span lines; "" escapes keep the quote count even
+        if quotes % 2:
+            if size <= max_record:
+                continue
+            # Most likely an unmatched quote: drop the record and start again
+            # at the next line instead of buffering the rest of the file
+            record, quotes, size = [], 0, 0
+            if header is None:
+                yield number, ValueError("unterminated quoted field in the header")
+                return
+            number += 1
+            yield number, ValueError(f"unterminated quoted field (record longer than {max_record} characters)")
+            continue
+        text = "".join(record)
+        record, quotes, size = [], 0, 0
+        if not text.strip():
+            continue
+        try:
+            values = next(csv.reader([text]))
+        except csv.Error as e:
+            if header is None:
+                yield number, ValueError(f"invalid header: {e}")
+                return
+            number += 1
+            yield number, ValueError(str(e))
+            continue
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        number += 1
+        if len(values) != len(header):
+            yield number, ValueError(f"expected {len(header)} columns, got {len(values)}")
+            continue
+        # Empty cells mean "not given" so defaults and existing values apply
+        yield number, {name: value for name, value in zip(header, values) if value != ""}
+    if record and "".join(record).strip():
+        yield number + 1, ValueError("unterminated quoted field")
+
+
+def parse_rows(lines: AsyncIterable[str], fmt: str) -> AsyncIterator[Tuple[int, object]]:
+    """(row number, dict or parse error) for each data row"""
+    return _csv_rows(lines) if fmt == "csv" else _ndjson_rows(lines)
+
+
+# Import
+
+@dataclass
+class ImportReport:
+    rows: int = 0
+    inserted: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    failed: int = 0
+    errors: List[dict] = field(default_factory=list)
+    max_errors: int = 100
+
+    def error(self, row: int, message: str):
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({"row": row, "error": message})
+
+    def as_dict(self) -> dict:
+        return {
+            "rows": self.rows,
+            "inserted": self.inserted,
+            "updated": self.updated,
+            "unchanged": self.unchanged,
+            "failed": self.failed,
+            "errors": self.errors,
+            "errors_truncated": self.failed > len(self.errors),
+        }
+
+
+def _validation_message(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in e['loc']) or 'row'}: {e['msg']}" for e in error.errors()
+    )
+
+
+def product_write(row: dict, now: datetime):
+    """Validate a row and build its write. Raises ValueError or ValidationError"""
+    if not isinstance(row, dict):
+        raise ValueError("row must be an object")
+    object_id = row.get("_id") or row.get("id")
+    if object_id is not None and not ObjectId.is_valid(str(object_id)):
+        raise ValueError(f"invalid _id: {object_id}")
+
+    product = ProductCreate.model_validate(row)
+    given = product.model_dump(exclude_unset=True)
+    defaults = {k: v for k, v in product.model_dump().items() if k not in given}
+
+    if product.sku:
+        key = {"sku": product.sku}
+    elif object_id is not None:
+        key = {"_id": ObjectId(str(object_id))}
+    else:
+        return InsertOne({**product.model_dump(), "created_at": now})
+
+    return UpdateOne(key, {"$set": given, "$setOnInsert": {**defaults, "created_at": now}}, upsert=True)
+
+
+async def _write_chunk(db, writes: List[Tuple[int, object]], report: ImportReport):
+    try:
+        result = await db.products.bulk_write([w for _, w in writes], ordered=False)
+        details = result.bulk_api_result
+    except BulkWriteError as e:
+        details = e.details
+        for error in details.get("writeErrors", []):
+            report.error(writes[error["index"]][0], error.get("errmsg", "write failed"))
+
+    report.inserted += details.get("nInserted", 0) + details.get("nUpserted", 0)
+    report.updated += details.get("nModified", 0)
+    report.unchanged += details.get("nMatched", 0) - details.get("nModified", 0)
+
+
+async def import_products(db, lines: AsyncIterable[str], fmt: str = "ndjson",
+                          chunk_size: Optional[int] = None) -> ImportReport:
+    """Validate and upsert products from NDJSON or CSV lines"""
+    chunk_size = chunk_size or settings.BULK_IMPORT_CHUNK_SIZE
+    report = ImportReport(max_errors=settings.BULK_IMPORT_MAX_REPORTED_ERRORS)
+    now = datetime.utcnow()
+    writes: List[Tuple[int, object]] = []
+    in_flight: Optional[asyncio.Task] = None
+
+    async for number, row in parse_rows(lines, fmt):
+        report.rows += 1
+        if isinstance(row, Exception):
+            report.error(number, f"parse error: {row}")
+            continue
+        try:
+            writes.append((number, product_write(row, now)))
+        except ValidationError as e:
+            report.error(number, _validation_message(e))
+        except ValueError as e:
+            report.error(number, str(e))
+
+        if len(writes) >= chunk_size:
+            if in_flight is not None:
+                await in_flight
+            in_flight = asyncio.create_task(_write_chunk(db, writes, report))
+            writes = []
+
+    if in_flight is not None:
+        await in_flight
+    if writes:
+        await _write_chunk(db, writes, report)
+    return report
+
+
+# Export
+
+def _csv_line(product: dict) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow([_csv_value(product.get(name)) for name in EXPORT_FIELDS])
+    return buffer.getvalue()
+
+
+def _csv_value(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+async def export_products(db, fmt: str = "ndjson", query: Optional[dict] = None,
+                          batch_size: int = 1000) -> AsyncIterator[bytes]:
+    """Stream the catalog as NDJSON or CSV, one batch of rows per chunk"""
+    projection = {name: 1 for name in EXPORT_FIELDS}
+    cursor = db.products.find(query or {}, projection).sort("_id", 1).batch_size(batch_size)
+
+    if fmt == "csv":
+        yield _csv_line(dict(zip(EXPORT_FIELDS, EXPORT_FIELDS))).encode("utf-8")
+
+    rows: List[bytes] = []
+    async for product in cursor:
+        if fmt == "csv":
+            rows.append(_csv_line(product).encode("utf-8"))
+        else:
+            rows.append(dumps({name: product[name] for name in EXPORT_FIELDS if name in product}) + b"\n")
+        if len(rows) >= batch_size:
+            yield b"".join(rows)
+            rows = []
+    if rows:
+        yield b"".join(rows)
+
@@ -0,0 +1,280 @@
+"""
+In-process read-through cache for the product catalog
+"""
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, List, Optional
+
+from app.config import settings
+
+
+class TTLCache:
+    """Bounded LRU cache whose entries also expire after a fixed TTL"""
+
+    def __init__(self, maxsize: int, ttl: float, clock: Callable[[], float] = time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, value = entry
+        if expires_at <= self._clock():
+            del self._data[key]
+            self.expirations += 1
+            self.misses += 1
+            return None
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        if self.maxsize <= 0:
+            return
+        self._data[key] = (self._clock() + (self.ttl if ttl is None else ttl), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def delete(self, key: Hashable):
+        if self._data.pop(key, None) is not None:
+            self.invalidations += 1
+
+    def delete_where(self, predicate: Callable[[Hashable, Any], bool]):
+        for key in [k for k, (_, v) in self._data.items() if predicate(k, v)]:
+            del self._data[key]
+            self.invalidations += 1
+
+    def clear(self):
+        self.invalidations += len(self._data)
+        self._data.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
+
+
+class CatalogCache:
+    """Caches product listings and single products keyed by query shape.
+
+    Every invalidation bumps `generation`. Readers take it before querying
+    and hand it to set_list/set_product, which skip the write if an
+    invalidation happened meanwhile, so a slow read cannot put data from
+    before a write back into the cache.
+    """
+
+    LIST = "list"
+    PRODUCT = "product"
+
+    def __init__(self, maxsize: int, ttl: float, enabled: bool = True):
+        self.enabled = enabled
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._listeners: List[Callable[[Optional[str]], None]] = []
+        self.generation = 0
+
+    def _current(self, generation: Optional[int]) -> bool:
+        return self.enabled and (generation is None or generation == self.generation)
+
+    def subscribe(self, listener: Callable[[Optional[str]], None]):
+        """Call listener(product_id) on every invalidation; None means everything"""
+        self._listeners.append(listener)
+
+    def _notify(self, product_id: Optional[str]):
+        for listener in self._listeners:
+            listener(product_id)
+
+    def get_list(self, params: tuple):
+        """Cached listing for a tuple of query parameters"""
+        if not self.enabled:
+            return None
+        return self._cache.get((self.LIST, params))
+
+    def set_list(self, params: tuple, listing, generation: Optional[int] = None):
+        if self._current(generation):
+            self._cache.set((self.LIST, params), listing)
+
+    def get_product(self, product_id: str):
+        if not self.enabled:
+            return None
+        return self._cache.get((self.PRODUCT, product_id))
+
+    def set_product(self, product_id: str, product: dict, generation: Optional[int] = None):
+        if self._current(generation):
+            self._cache.set((self.PRODUCT, product_id), product)
+
+    def invalidate_product(self, product_id: Optional[str] = None):
+        """Drop one product and every listing it could appear in"""
+        self.generation += 1
+        if product_id is not None:
+            self._cache.delete((self.PRODUCT, product_id))
+        self._cache.delete_where(lambda key, value: key[0] == self.LIST)
+        self._notify(product_id)
+
+    def clear(self):
+        self.generation += 1
+        self._cache.clear()
+        self._notify(None)
+
+    def stats(self) -> dict:
+        return {"enabled": self.enabled, **self._cache.stats()}
+
+
+class PrincipalCache:
+    """Caches verified token principals for at most `max_ttl` seconds.
+
+    Revocations only clear the entries of the worker that handled them, so
+    `max_ttl` is how long other workers may still accept a revoked token.
+    """
+
+    def __init__(self, maxsize: int, max_ttl: float, clock: Callable[[], float] = time.monotonic):
+        self._cache = TTLCache(maxsize=maxsize, ttl=max_ttl, clock=clock)
+
+    def get(self, token_id: str) -> Optional[dict]:
+        return self._cache.get(token_id)
+
+    def set(self, token_id: str, principal: dict, expires_at: float):
+        """Cache a principal; the entry never outlives the token's exp claim"""
+        ttl = min(expires_at - time.time(), self._cache.ttl)
+        if ttl > 0:
+            self._cache.set(token_id, principal, ttl=ttl)
+
+    def invalidate_user(self, user_id: str):
+        self._cache.delete_where(lambda key, principal: principal["_id"] == user_id)
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self) -> dict:
+        return self._cache.stats()
+
+
+class UserCache:
+    """Small per-user values (cart summary, favorite ids).
+
+    Mutations in this worker replace the entry with the fresh value; the
+    TTL bounds how long another worker can keep serving a value from before
+    a mutation it did not see.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def get(self, user_id: str) -> Optional[Any]:
+        return self._cache.get(user_id)
+
+    def set(self, user_id: str, value: Any):
+        self._cache.set(user_id, value)
+
+    def invalidate(self, user_id: str):
+        self._cache.delete(user_id)
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self) -> dict:
+        return self._cache.stats()
+
+
+catalog_cache = CatalogCache(
+    maxsize=settings.CATALOG_CACHE_MAXSIZE,
+    ttl=settings.CATALOG_CACHE_TTL_SECONDS,
+    enabled=settings.CATALOG_CACHE_ENABLED,
+)
+
+principal_cache = PrincipalCache(
+    maxsize=settings.PRINCIPAL_CACHE_MAXSIZE,
+    max_ttl=settings.PRINCIPAL_CACHE_MAX_TTL_SECONDS,
+)
+
+# user_id -> {"count", "total"}
+cart_summary_cache = UserCache(
+    maxsize=settings.CART_SUMMARY_CACHE_MAXSIZE,
+    ttl=settings.CART_SUMMARY_CACHE_TTL_SECONDS,
+)
+
+# Invalidation feeds
+#
+# A feed keeps the cache of this worker coherent with writes made by other
+# workers. It is any coroutine function taking the database and the cache;
+# register new ones in INVALIDATION_FEEDS and select them with
+# CATALOG_CACHE_FEED.
+
+async def change_stream_feed(database, cache: CatalogCache):
+    """Invalidate from a MongoDB change stream (requires a replica set)"""
+    async with database.products.watch(full_document=None) as stream:
+        async for change in stream:
+            document_key = change.get("documentKey") or {}
+            product_id = document_key.get("_id")
+            cache.invalidate_product(str(product_id) if product_id is not None else None)
+
+
+INVALIDATION_FEEDS = {
+    "change_stream": change_stream_feed,
+}
+
+_feed_task: Optional[asyncio.Task] = None
+
+
+async def _run_feed(feed, database, cache: CatalogCache):
+    while True:
+        try:
+            await feed(database, cache)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"⚠️  Catalog invalidation feed failed: {e}")
+        # Anything may have changed while the feed was down
+        cache.clear()
+        await asyncio.sleep(settings.CATALOG_CACHE_FEED_RETRY_SECONDS)
+
+
+def start_invalidation_feed(database):
+    """Start the configured invalidation feed, if any"""
+    global _feed_task
+    name = settings.CATALOG_CACHE_FEED
+    if not name or not catalog_cache.enabled:
+        return
+    feed = INVALIDATION_FEEDS.get(name)
+    if feed is None:
+        print(f"⚠️  Unknown catalog invalidation feed: {name}")
+        return
+    _feed_task = asyncio.create_task(_run_feed(feed, database, catalog_cache))
+
+
+async def stop_invalidation_feed():
+    """Cancel the running invalidation feed"""
+    global _feed_task
+    if _feed_task is None:
+        return
+    _feed_task.cancel()
+    try:
+        await _feed_task
+    except asyncio.CancelledError:
+        pass
+    _feed_task = None
@@ -0,0 +1,215 @@
+"""
+Negotiated response compression (zstd, brotli, gzip) with size and CPU metrics.
+
+gzip is always available; brotli and zstd are used when the `brotli` and
+`zstandard` packages are installed. Streaming responses are compressed
+chunk by chunk so they keep their constant memory use.
+"""
+import time
+import zlib
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+
+from app.config import settings
+from app.metrics import BYTES_BUCKETS, registry
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/")
+
+raw_bytes = registry.histogram(
+    "http_response_raw_bytes", "Response body size before compression",
+    ["route", "encoding"], BYTES_BUCKETS,
+)
+compressed_bytes = registry.histogram(
+    "http_response_compressed_bytes", "Response body size after compression",
+    ["route", "encoding"], BYTES_BUCKETS,
+)
+compression_seconds = registry.histogram(
+    "http_response_compression_cpu_seconds", "CPU time spent compressing a response body",
+    ["route", "encoding"],
+)
+
+
+class _GzipCompressor:
+    def __init__(self, level: int):
+        self._obj = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._obj.compress(data)
+
+    def flush(self) -> bytes:
+        return self._obj.flush()
+
+
+class _BrotliCompressor:
+    def __init__(self, quality: int):
+        self._obj = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._obj.process(data)
+
+    def flush(self) -> bytes:
+        return self._obj.finish()
+
+
+class _ZstdCompressor:
+    def __init__(self, level: int):
+        self._obj = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._obj.compress(data)
+
+    def flush(self) -> bytes:
+        return self._obj.flush()
+
+
+def available_encodings() -> dict:
+    """Content-Encoding token -> compressor factory, for installed codecs"""
+    encodings = {"gzip": lambda: _GzipCompressor(settings.COMPRESSION_GZIP_LEVEL)}
+    if brotli is not None:
+        encodings["br"] = lambda: _BrotliCompressor(settings.COMPRESSION_BROTLI_QUALITY)
+    if zstandard is not None:
+        encodings["zstd"] = lambda: _ZstdCompressor(settings.COMPRESSION_ZSTD_LEVEL)
+    return encodings
+
+
+def negotiate(accept_encoding: str, preference: list) -> Optional[str]:
+    """Pick the most preferred encoding the client accepts with q > 0"""
+    accepted = {}
+    for part in accept_encoding.split(","):
+        token, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if token:
+            accepted[token.strip().lower()] = quality
+    for encoding in preference:
+        quality = accepted.get(encoding, accepted.get("*", 0.0))
+        if quality > 0:
+            return encoding
+    return None
+
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size: int = 1024):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.encodings = available_encodings()
+        self.preference = [
+            e.strip() for e in settings.COMPRESSION_ENCODINGS.split(",") if e.strip() in self.encodings
+        ]
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding", ""), self.preference)
+        responder = _CompressionResponder(scope, send, encoding, self.encodings.get(encoding), self.minimum_size)
+        await self.app(scope, receive, responder.send)
+
+
+class _CompressionResponder:
+    def __init__(self, scope, send, encoding, factory, minimum_size):
+        self.scope = scope
+        self._send = send
+        self.encoding = encoding
+        self.factory = factory
+        self.minimum_size = minimum_size
+        self.start_message = None
+        self.compressor = None
+        self.passthrough = False
+        self.raw_size = 0
+        self.compressed_size = 0
+        self.cpu_seconds = 0.0
+
+    def _route(self) -> str:
+        route = self.scope.get("route")
+        return getattr(route, "path", "unmatched")
+
+    def _compress(self, data: bytes, final: bool) -> bytes:
+        started = time.thread_time()
+        output = self.compressor.compress(data)
+        if final:
+            output += self.compressor.flush()
+        self.cpu_seconds += time.thread_time() - started
+        self.compressed_size += len(output)
+        return output
+
+    def _should_compress(self, body: bytes, more_body: bool) -> bool:
+        headers = Headers(raw=self.start_message["headers"])
+        if self.factory is None or "content-encoding" in headers:
+            return False
+        if self.start_message["status"] in (204, 304):
+            return False
+        if not headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES):
+            return False
+        return more_body or len(body) >= self.minimum_size
+
+    def _record(self):
+        route = self._route()
+        if self.compressor is None:
+            raw_bytes.observe(self.raw_size, route, "identity")
+            return
+        raw_bytes.observe(self.raw_size, route, self.encoding)
+        compressed_bytes.observe(self.compressed_size, route, self.encoding)
+        compression_seconds.observe(self.cpu_seconds, route, self.encoding)
+
+    async def send(self, message):
+        message_type = message["type"]
+        if message_type == "http.response.start":
+            self.start_message = message
+            return
+        if message_type != "http.response.body":
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        self.raw_size += len(body)
+
+        if self.passthrough:
+            await self._send(message)
+        elif self.compressor is not None:
+            await self._send({
+                "type": "http.response.body",
+                "body": self._compress(body, final=not more_body),
+                "more_body": more_body,
+            })
+        elif not self._should_compress(body, more_body):
+            self.passthrough = True
+            await self._send(self.start_message)
+            await self._send(message)
+        else:
+            self.compressor = self.factory()
+            headers = MutableHeaders(raw=self.start_message["headers"])
+            headers["Content-Encoding"] = self.encoding
+            headers.add_vary_header("Accept-Encoding")
+            # The compressed bytes are a different representation
+            etag = headers.get("etag")
+            if etag and not etag.startswith("W/"):
+                headers["ETag"] = f"W/{etag}"
+            compressed = self._compress(body, final=not more_body)
+            if more_body:
+                del headers["Content-Length"]
+            else:
+                headers["Content-Length"] = str(len(compressed))
+            await self._send(self.start_message)
+            await self._send({"type": "http.response.body", "body": compressed, "more_body": more_body})
+
+        if not more_body:
+            self._record()
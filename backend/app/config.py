@@ -1,5 +1,6 @@
+from pydantic import field_validator
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import List, Optional
 import json
 
 
@@ -8,22 +9,151 @@ class Settings(BaseSettings):
     MONGODB_URL: str = "mongodb://localhost:27017"
     DATABASE_NAME: str = "nike_store"
     
+    # MongoDB Connection Pool (per uvicorn worker)
+    MONGO_MAX_POOL_SIZE: int = 100
+    # Connections for the whole server; when set, each worker gets an equal
+    # share instead of MONGO_MAX_POOL_SIZE. Workers are counted as
+    # app.server counts them, so under a plain `uvicorn --workers N` set
+    # SERVER_WORKERS or WEB_CONCURRENCY to N
+    MONGO_TOTAL_POOL_SIZE: Optional[int] = None
+    MONGO_MIN_POOL_SIZE: int = 0
+    MONGO_MAX_IDLE_TIME_MS: Optional[int] = None
+    MONGO_WAIT_QUEUE_TIMEOUT_MS: Optional[int] = None
+    MONGO_SERVER_SELECTION_TIMEOUT_MS: int = 30000
+    MONGO_CONNECT_TIMEOUT_MS: int = 20000
+    MONGO_COMPRESSORS: str = ""  # e.g. "zstd,snappy,zlib"
+    MONGO_READ_PREFERENCE: str = "primary"
+    MONGO_WARM_CONNECTIONS: int = 0  # connections opened before serving traffic
+    ENSURE_INDEXES_ON_STARTUP: bool = True
+    # Checkout transactions: "auto" (replica sets and sharded clusters),
+    # "always" or "never"
+    ORDER_TRANSACTIONS: str = "auto"
+    # Inventory reservations: how long a hold keeps stock, and how often
+    # expired holds are swept back into stock (0 disables the sweeper)
+    RESERVATION_TTL_SECONDS: int = 600
+    RESERVATION_SWEEP_INTERVAL_SECONDS: float = 30.0
+    
+    # Sales rollups (app/analytics.py): incremental updates on order writes,
+    # and orders per aggregation when rebuilding them
+    ANALYTICS_ENABLED: bool = True
+    ANALYTICS_REBUILD_CHUNK_SIZE: int = 50000
+    # A rebuild's lease on the rollups lapses if not renewed (between
+    # chunks) for this long, e.g. when its worker died
+    ANALYTICS_REBUILD_LEASE_SECONDS: float = 300.0
+    
+    # Bulk product import: rows per bulk_write, and how many row errors
+    # are listed in the report (all of them are counted)
+    BULK_IMPORT_CHUNK_SIZE: int = 1000
+    BULK_IMPORT_MAX_REPORTED_ERRORS: int = 100
+    # Longest CSV record (a quoted field may span lines); an unmatched quote
+    # is reported as a row error once the record grows past this
+    BULK_IMPORT_MAX_CSV_RECORD_CHARS: int = 1_000_000
+    
     # JWT Configuration
     SECRET_KEY: str = "your-secret-key-here"
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     
+    # Password Hashing Pool - PASSWORD_HASH_WORKERS=0 hashes inline on the event loop
+    PASSWORD_HASH_EXECUTOR: str = "thread"  # "thread" or "process"
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_QUEUE_SIZE: int = 64
+    PASSWORD_HASH_RETRY_AFTER_SECONDS: int = 1
+    
+    # Verified-principal cache - bounds how long another worker may keep
+    # accepting a token after it was revoked, so keep it to a few seconds
+    PRINCIPAL_CACHE_MAXSIZE: int = 10000
+    PRINCIPAL_CACHE_MAX_TTL_SECONDS: float = 5.0
+    
+    # Cart summary (badge count + total) cache - bounds how stale another
+    # worker's summary can be after a cart change
+    CART_SUMMARY_CACHE_MAXSIZE: int = 50000
+    CART_SUMMARY_CACHE_TTL_SECONDS: float = 30.0
+    
+    # Favorites - per-user limit
+    FAVORITES_MAX_ITEMS: int = 1000
+    
     # CORS Configuration - Parse from JSON string in env
     CORS_ORIGINS: str = '["http://localhost:5173", "http://localhost:5174", "http://localhost:5175", "http://localhost:3000"]'
     
+    # Encode list responses directly to JSON instead of re-validating each
+    # item with Pydantic (see app/serialization.py)
+    FAST_JSON_RESPONSES: bool = False
+    
+    # Add a Server-Timing header (auth/db/app/serialize per request)
+    SERVER_TIMING_ENABLED: bool = True
+    
+    # Response Compression - brotli/zstd need the brotli/zstandard packages
+    COMPRESSION_ENABLED: bool = True
+    COMPRESSION_MINIMUM_SIZE: int = 1024
+    COMPRESSION_ENCODINGS: str = "zstd,br,gzip"  # server preference order
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_BROTLI_QUALITY: int = 4
+    COMPRESSION_ZSTD_LEVEL: int = 3
+    
     # Server Configuration
     HOST: str = "0.0.0.0"
     PORT: int = 8000
+    
+    # Production server (python -m app.server) - SERVER_WORKERS=0 uses
+    # WEB_CONCURRENCY or one worker per available CPU
+    SERVER_WORKERS: int = 0
+    SERVER_LOOP: str = "auto"  # "auto" (uvloop if installed), "uvloop" or "asyncio"
+    SERVER_HTTP: str = "auto"  # "auto" (httptools if installed), "httptools" or "h11"
+    SERVER_BACKLOG: int = 2048
+    # Longer than the load balancer's idle timeout, so it closes first
+    SERVER_KEEPALIVE_SECONDS: int = 75
+    # How long shutdown waits for in-flight requests before closing them
+    SERVER_GRACEFUL_SHUTDOWN_SECONDS: int = 25
+    SERVER_LIMIT_CONCURRENCY: Optional[int] = None  # per worker; excess gets 503
+    SERVER_MAX_REQUESTS: Optional[int] = None  # recycle workers after this many requests
+    SERVER_ACCESS_LOG: bool = False
+    SERVER_FORWARDED_ALLOW_IPS: Optional[str] = None  # proxies trusted for X-Forwarded-*
+
+    # Catalog Cache Configuration
+    CATALOG_CACHE_ENABLED: bool = True
+    CATALOG_CACHE_MAXSIZE: int = 1024
+    CATALOG_CACHE_TTL_SECONDS: float = 60.0
+    # Cross-worker invalidation feed: "" (disabled) or "change_stream"
+    CATALOG_CACHE_FEED: str = ""
+    CATALOG_CACHE_FEED_RETRY_SECONDS: float = 5.0
+    
+    # Catalog HTTP caching (Cache-Control on /products reads)
+    CATALOG_HTTP_MAX_AGE_SECONDS: int = 30
+    CATALOG_HTTP_STALE_WHILE_REVALIDATE_SECONDS: int = 300
+    # How often each worker re-reads the shared catalog version behind ETags
+    CATALOG_VERSION_CHECK_SECONDS: float = 1.0
+    
+    # Product Search - the in-process index is rebuilt at least this often
+    SEARCH_INDEX_MAX_AGE_SECONDS: float = 600.0
+    
+    # Catalog facets - lower bounds of the price buckets counted by
+    # GET /products/facets (the last bucket is open-ended); at least two,
+    # ascending
+    PRODUCT_PRICE_BUCKETS: str = "0,50,100,150,200"
+    
+    # Frequently bought together (see app.recommendations)
+    RECOMMENDATIONS_SNAPSHOT_PATH: str = "data/recommendations.snapshot"
+    RECOMMENDATIONS_TOP_K: int = 20
+    RECOMMENDATIONS_RELOAD_SECONDS: float = 30.0
+    # Orders newer than this are left for the next refresh
+    RECOMMENDATIONS_SETTLE_SECONDS: float = 60.0
+    # 0 = refresh from a scheduler (python -m app.recommendations refresh)
+    RECOMMENDATIONS_REFRESH_SECONDS: float = 0
 
     class Config:
         env_file = ".env"
         case_sensitive = True
 
+    @field_validator("PRODUCT_PRICE_BUCKETS")
+    @classmethod
+    def check_price_buckets(cls, value: str) -> str:
+        """$bucket needs ascending boundaries, so fail at startup rather than per request"""
+        bounds = [float(bound) for bound in value.split(",") if bound.strip()]
+        if len(bounds) < 2 or any(low >= high for low, high in zip(bounds, bounds[1:])):
+            raise ValueError("PRODUCT_PRICE_BUCKETS needs at least two ascending prices, e.g. 0,50,100")
+        return value
+
     @property
     def cors_origins_list(self) -> List[str]:
         """Parse CORS_ORIGINS string to list"""
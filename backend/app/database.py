@@ -1,5 +1,12 @@
+import asyncio
+import os
+import threading
+import time
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import monitoring
 from app.config import settings
+from app.metrics import registry
+from app.instrumentation import CommandMetricsListener
 
 
 class Database:
@@ -9,20 +16,153 @@ class Database:
 db = Database()
 
 
+# Connection pool metrics
+#
+# Pool events fire on the driver's worker threads; a checkout's start and
+# finish happen on the same thread, so the wait is timed thread-locally.
+
+pool_connections_open = registry.gauge(
+    "mongo_pool_connections_open", "Connections open in the MongoDB pool", ["address"]
+)
+pool_connections_in_use = registry.gauge(
+    "mongo_pool_connections_in_use", "Connections checked out of the MongoDB pool", ["address"]
+)
+pool_checkout_waiters = registry.gauge(
+    "mongo_pool_checkout_waiters", "Operations waiting to check out a connection", ["address"]
+)
+pool_checkout_wait = registry.histogram(
+    "mongo_pool_checkout_wait_seconds", "Time spent waiting for a pool connection", ["address"]
+)
+pool_checkout_failures = registry.counter(
+    "mongo_pool_checkout_failures_total", "Failed pool checkouts", ["address", "reason"]
+)
+
+
+def _address(event) -> str:
+    host, port = event.address
+    return f"{host}:{port}"
+
+
+class PoolMetricsListener(monitoring.ConnectionPoolListener):
+    def __init__(self):
+        self._local = threading.local()
+
+    def _checkout_finished(self, event):
+        address = _address(event)
+        pool_checkout_waiters.dec(1, address)
+        started = getattr(self._local, "checkout_started", None)
+        if started is not None:
+            pool_checkout_wait.observe(time.perf_counter() - started, address)
+            self._local.checkout_started = None
+
+    def connection_check_out_started(self, event):
+        self._local.checkout_started = time.perf_counter()
+        pool_checkout_waiters.inc(1, _address(event))
+
+    def connection_checked_out(self, event):
+        self._checkout_finished(event)
+        pool_connections_in_use.inc(1, _address(event))
+
+    def connection_check_out_failed(self, event):
+        self._checkout_finished(event)
+        pool_checkout_failures.inc(1, _address(event), str(event.reason))
+
+    def connection_checked_in(self, event):
+        pool_connections_in_use.dec(1, _address(event))
+
+    def connection_created(self, event):
+        pool_connections_open.inc(1, _address(event))
+
+    def connection_closed(self, event):
+        pool_connections_open.dec(1, _address(event))
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+
+def pool_stats() -> dict:
+    """Current pool gauges per server address"""
+    stats = {}
+    for gauge, key in (
+        (pool_connections_open, "open"),
+        (pool_connections_in_use, "in_use"),
+        (pool_checkout_waiters, "waiting"),
+    ):
+        for (address,), value in gauge.items():
+            stats.setdefault(address, {})[key] = int(value)
+    return stats
+
+
+def max_pool_size() -> int:
+    """This worker's maxPoolSize: its share of MONGO_TOTAL_POOL_SIZE, if set.
+
+    The worker count is resolved as app.server does (SERVER_WORKERS, then
+    WEB_CONCURRENCY, then the CPU count), since a worker cannot see the
+    --workers a plain uvicorn was started with.
+    """
+    if settings.MONGO_TOTAL_POOL_SIZE:
+        from app.server import worker_count
+        return max(1, settings.MONGO_TOTAL_POOL_SIZE // worker_count())
+    return settings.MONGO_MAX_POOL_SIZE
+
+
+def client_options() -> dict:
+    """AsyncIOMotorClient keyword arguments from Settings"""
+    options = {
+        "maxPoolSize": max_pool_size(),
+        "minPoolSize": settings.MONGO_MIN_POOL_SIZE,
+        "serverSelectionTimeoutMS": settings.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        "connectTimeoutMS": settings.MONGO_CONNECT_TIMEOUT_MS,
+        "readPreference": settings.MONGO_READ_PREFERENCE,
+        "event_listeners": [PoolMetricsListener(), CommandMetricsListener()],
+    }
+    if settings.MONGO_MAX_IDLE_TIME_MS is not None:
+        options["maxIdleTimeMS"] = settings.MONGO_MAX_IDLE_TIME_MS
+    if settings.MONGO_WAIT_QUEUE_TIMEOUT_MS is not None:
+        options["waitQueueTimeoutMS"] = settings.MONGO_WAIT_QUEUE_TIMEOUT_MS
+    if settings.MONGO_COMPRESSORS:
+        options["compressors"] = settings.MONGO_COMPRESSORS
+    return options
+
+
 async def get_database():
     return db.client[settings.DATABASE_NAME]
 
 
 async def connect_to_mongo():
-    """Connect to MongoDB"""
-    db.client = AsyncIOMotorClient(settings.MONGODB_URL)
-    print(f"✅ Connected to MongoDB at {settings.MONGODB_URL}")
+    """Connect to MongoDB, verify with a ping and pre-warm the pool"""
+    db.client = AsyncIOMotorClient(settings.MONGODB_URL, **client_options())
+    await db.client.admin.command("ping")
+    
+    # Concurrent pings make the pool open up to that many connections now
+    # rather than during the first requests
+    warm = settings.MONGO_WARM_CONNECTIONS
+    pool_size = max_pool_size()
+    if pool_size:
+        warm = min(warm, pool_size)
+    if warm > 1:
+        await asyncio.gather(*[db.client.admin.command("ping") for _ in range(warm)])
+    
+    print(f"✅ Connected to MongoDB at {settings.MONGODB_URL} "
+          f"(worker {os.getpid()}, maxPoolSize={pool_size}, pool={pool_stats()})")
     
 
 async def close_mongo_connection():
     """Close MongoDB connection"""
     db.client.close()
-    print("❌ Closed MongoDB connection")
+    print(f"❌ Closed MongoDB connection (worker {os.getpid()})")
 
 
 async def get_db():
@@ -0,0 +1,95 @@
+"""
+HTTP caching for catalog reads: ETags, conditional GETs and Cache-Control
+"""
+import time
+from typing import Optional
+
+from fastapi import Depends, Request, Response
+
+from app.cache import catalog_cache
+from app.config import settings
+from app.database import get_db
+
+# Counter document bumped on every product write
+VERSION_COLLECTION = "catalog_meta"
+VERSION_ID = "version"
+
+
+async def bump_catalog_version(db):
+    """Record a product write; call it after the write, next to the cache invalidation"""
+    await db[VERSION_COLLECTION].update_one({"_id": VERSION_ID}, {"$inc": {"version": 1}}, upsert=True)
+
+
+class CatalogVersion:
+    """The catalog's version, shared by every worker through a counter document.
+
+    Product writes increment the counter, so all workers issue the same ETag
+    for the same catalog and restarts do not invalidate clients' copies. The
+    counter is re-read after an invalidation this worker sees, or once it is
+    `check_interval` seconds old; when another worker moved it, the catalog
+    cache is cleared so the ETag never labels older content.
+    """
+
+    def __init__(self, check_interval: float):
+        self.check_interval = check_interval
+        self._version: Optional[int] = None
+        self._checked_at = 0.0
+
+    def on_catalog_change(self, product_id: Optional[str] = None):
+        self._version = None
+
+    async def current(self, db) -> int:
+        if self._version is not None and time.monotonic() - self._checked_at <= self.check_interval:
+            return self._version
+        known = self._version
+        document = await db[VERSION_COLLECTION].find_one({"_id": VERSION_ID})
+        version = document["version"] if document else 0
+        if known is not None and version != known:
+            catalog_cache.invalidate_product(None)
+        self._version, self._checked_at = version, time.monotonic()
+        return version
+
+
+catalog_version = CatalogVersion(check_interval=settings.CATALOG_VERSION_CHECK_SECONDS)
+catalog_cache.subscribe(catalog_version.on_catalog_change)
+
+
+def _cache_control() -> str:
+    directives = [f"public, max-age={settings.CATALOG_HTTP_MAX_AGE_SECONDS}"]
+    if settings.CATALOG_HTTP_STALE_WHILE_REVALIDATE_SECONDS:
+        directives.append(f"stale-while-revalidate={settings.CATALOG_HTTP_STALE_WHILE_REVALIDATE_SECONDS}")
+    return ", ".join(directives)
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    # If-None-Match uses the weak comparison function
+    return "*" in candidates or etag in [tag[2:] if tag.startswith("W/") else tag for tag in candidates]
+
+
+class CatalogValidators:
+    """ETag and Cache-Control for a catalog read, and whether the client's copy is current"""
+
+    def __init__(self, headers: dict, fresh: bool):
+        self.headers = headers
+        self.fresh = fresh
+
+    def not_modified(self) -> Response:
+        return Response(status_code=304, headers=self.headers)
+
+
+async def catalog_http_cache(request: Request, response: Response, db = Depends(get_db)) -> CatalogValidators:
+    """Dependency for catalog reads.
+
+    Routes answer `not_modified()` straight away when `fresh`, so the
+    catalog is never queried. The validators are set on the response, and
+    kept in `headers` for routes that build their own Response.
+    """
+    headers = {
+        "ETag": f'"catalog-{await catalog_version.current(db)}"',
+        "Cache-Control": _cache_control(),
+    }
+    response.headers.update(headers)
+    return CatalogValidators(headers, _etag_matches(request.headers.get("if-none-match"), headers["ETag"]))
@@ -0,0 +1,108 @@
+"""
+Index declarations, startup bootstrap and query-plan verification.
+
+Route modules declare the indexes their queries rely on with
+declare_index(), and the queries that must never scan a whole collection
+with hot_query(). ensure_indexes() creates every declared index (a no-op
+for indexes that already exist) and find_collscans() explains every hot
+query and reports the ones whose winning plan contains a COLLSCAN.
+"""
+import importlib
+from typing import List, Optional, Tuple
+
+from pymongo import IndexModel
+from pymongo.errors import OperationFailure
+
+Keys = List[Tuple[str, int]]
+
+DUPLICATE_KEY = 11000
+
+
+class IndexSpec:
+    def __init__(self, collection: str, keys: Keys, migration: Optional[str] = None, **options):
+        self.collection = collection
+        self.keys = keys
+        # Command that removes legacy duplicates blocking a unique index
+        self.migration = migration
+        self.options = options
+
+    def __repr__(self):
+        return f"{self.collection}{self.keys}"
+
+
+class HotQuery:
+    def __init__(self, name: str, collection: str, filter: dict, sort: Optional[Keys] = None):
+        self.name = name
+        self.collection = collection
+        self.filter = filter
+        self.sort = sort
+
+
+REQUIRED_INDEXES: List[IndexSpec] = []
+HOT_QUERIES: List[HotQuery] = []
+
+
+def declare_index(collection: str, keys: Keys, migration: Optional[str] = None, **options):
+    """Register an index (IndexModel options such as unique=True allowed).
+
+    `migration` names the command to run when existing duplicates keep a
+    unique index from being built.
+    """
+    REQUIRED_INDEXES.append(IndexSpec(collection, keys, migration, **options))
+
+
+def hot_query(name: str, collection: str, filter: dict, sort: Optional[Keys] = None):
+    """Register a query that must be served by an index"""
+    HOT_QUERIES.append(HotQuery(name, collection, filter, sort))
+
+
+def load_declarations():
+    """Import every router so their declarations are registered"""
+    importlib.import_module("app.main")
+
+
+async def ensure_indexes(db) -> List[str]:
+    """Create all declared indexes. Returns a list of problems (empty if none)"""
+    load_declarations()
+    problems = []
+    for spec in REQUIRED_INDEXES:
+        try:
+            await db[spec.collection].create_indexes([IndexModel(spec.keys, **spec.options)])
+        except OperationFailure as e:
+            # e.g. an index on the same keys with other options, or
+            # duplicate values blocking a unique index
+            problem = f"{spec}: {e.details.get('errmsg', e) if e.details else e}"
+            if e.code == DUPLICATE_KEY and spec.migration:
+                problem = f"{spec}: existing duplicates must be merged first, run `{spec.migration}` ({problem})"
+            problems.append(problem)
+    return problems
+
+
+def _stages(plan: dict):
+    yield plan.get("stage")
+    for key in ("inputStage", "queryPlan", "outerStage", "innerStage"):
+        if isinstance(plan.get(key), dict):
+            yield from _stages(plan[key])
+    for child in plan.get("inputStages", []):
+        yield from _stages(child)
+
+
+async def explain_hot_query(db, query: HotQuery) -> List[str]:
+    """Stages of the winning plan for a hot query"""
+    cursor = db[query.collection].find(query.filter)
+    if query.sort:
+        cursor = cursor.sort(query.sort)
+    explanation = await cursor.explain()
+    winning_plan = explanation["queryPlanner"]["winningPlan"]
+    return [stage for stage in _stages(winning_plan) if stage]
+
+
+async def find_collscans(db) -> List[Tuple[str, List[str]]]:
+    """Hot queries whose winning plan scans a whole collection"""
+    load_declarations()
+    failures = []
+    for query in HOT_QUERIES:
+        stages = await explain_hot_query(db, query)
+        if "COLLSCAN" in stages:
+            failures.append((query.name, stages))
+    return failures
@@ -0,0 +1,194 @@
+"""
+Streaming helpers for the database viewer scripts.
+
+Documents are read through an async cursor in batches and written out one
+at a time, so memory stays bounded by the batch size whatever the size of
+the collection. Counts and summaries are computed by the server with
+aggregation instead of client-side loops.
+"""
+import argparse
+import csv
+import sys
+from datetime import datetime
+from typing import AsyncIterator, List, Optional, TextIO, Tuple
+
+from bson import ObjectId, json_util
+
+from app.serialization import dumps
+
+COLLECTIONS = ["users", "products", "carts", "orders"]
+
+# Default columns for table and CSV output
+COLUMNS = {
+    "users": ["_id", "email", "first_name", "last_name", "country", "created_at"],
+    "products": ["_id", "name", "price", "category", "stock", "description"],
+    "carts": ["_id", "user_id", "items", "total", "updated_at"],
+    "orders": ["_id", "user_id", "total", "status", "items", "created_at"],
+}
+
+# Never printed unless asked for with --fields
+HIDDEN_FIELDS = {"users": ["hashed_password", "tokens_valid_after"]}
+
+
+def _item_count(field: str) -> dict:
+    return {"$size": {"$ifNull": [f"${field}", []]}}
+
+
+# Summary mode: group key and extra accumulators per collection
+SUMMARIES = {
+    "users": ("$country", {}),
+    "products": ("$category", {
+        "stock": {"$sum": "$stock"},
+        "min_price": {"$min": "$price"},
+        "avg_price": {"$avg": "$price"},
+        "max_price": {"$max": "$price"},
+    }),
+    "carts": ({"$cond": [{"$gt": [_item_count("items"), 0]}, "with items", "empty"]}, {
+        "items": {"$sum": _item_count("items")},
+        "value": {"$sum": "$total"},
+    }),
+    "orders": ("$status", {
+        "items": {"$sum": _item_count("items")},
+        "revenue": {"$sum": "$total"},
+    }),
+}
+
+
+def add_arguments(parser: argparse.ArgumentParser, formats: List[str]):
+    parser.add_argument("collections", nargs="*", default=COLLECTIONS,
+                        help=f"Collections to show (default: {' '.join(COLLECTIONS)})")
+    parser.add_argument("--filter", default="{}",
+                        help='Extended JSON filter, e.g. \'{"status": "pending"}\'')
+    parser.add_argument("--fields", help="Comma-separated fields to show")
+    parser.add_argument("--sort", default="_id", help="Sort field, e.g. --sort=-created_at for descending")
+    parser.add_argument("--limit", type=int, default=0, help="Documents per collection (0 = all)")
+    parser.add_argument("--skip", type=int, default=0)
+    parser.add_argument("--after", help="Only _ids after this one (keyset paging; needs --sort=_id)")
+    parser.add_argument("--batch-size", type=int, default=500, help="Documents fetched per round trip")
+    parser.add_argument("--format", choices=formats, default=formats[0])
+    parser.add_argument("--summary", action="store_true",
+                        help="Counts and totals per group, computed with aggregation")
+    parser.add_argument("--group-by", help="Field to group the summary by")
+
+
+def build_query(args, collection: str):
+    """Filter, projection and sort for a collection from the CLI arguments"""
+    query = json_util.loads(args.filter)
+    if not isinstance(query, dict):
+        raise SystemExit("--filter must be a JSON object")
+
+    direction = -1 if args.sort.startswith("-") else 1
+    sort_field = args.sort.lstrip("-+")
+
+    if args.after:
+        if sort_field != "_id":
+            raise SystemExit("--after only works with --sort=_id or --sort=-_id")
+        after = ObjectId(args.after) if ObjectId.is_valid(args.after) else args.after
+        op = "$gt" if direction == 1 else "$lt"
+        query = {"$and": [query, {"_id": {op: after}}]} if query else {"_id": {op: after}}
+
+    if args.fields:
+        projection = {name.strip(): 1 for name in args.fields.split(",") if name.strip()}
+    elif collection in HIDDEN_FIELDS:
+        projection = {name: 0 for name in HIDDEN_FIELDS[collection]}
+    else:
+        projection = None
+
+    return query, projection, [(sort_field, direction)]
+
+
+def find(db, collection: str, args):
+    query, projection, sort = build_query(args, collection)
+    cursor = db[collection].find(query, projection).sort(sort).batch_size(args.batch_size)
+    if args.skip:
+        cursor = cursor.skip(args.skip)
+    if args.limit:
+        cursor = cursor.limit(args.limit)
+    return cursor
+
+
+def columns_for(collection: str, args) -> List[str]:
+    if args.fields:
+        return [name.strip() for name in args.fields.split(",") if name.strip()]
+    return COLUMNS.get(collection, ["_id"])
+
+
+async def pages(cursor, size: int) -> AsyncIterator[List[dict]]:
+    """Group a cursor's documents into lists of at most `size`"""
+    page = []
+    async for document in cursor:
+        page.append(document)
+        if len(page) >= size:
+            yield page
+            page = []
+    if page:
+        yield page
+
+
+def cell(value, width: Optional[int] = None) -> str:
+    """Short display text for a field value"""
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        text = value.strftime("%Y-%m-%d %H:%M")
+    elif isinstance(value, list):
+        text = f"[{len(value)}]"
+    elif isinstance(value, float):
+        text = f"{value:.2f}"
+    else:
+        text = str(value)
+    if width and len(text) > width:
+        text = text[:width - 3] + "..."
+    return text
+
+
+async def write_ndjson(cursor, out: TextIO = sys.stdout) -> Tuple[int, Optional[dict]]:
+    """Write one JSON document per line. Returns (documents written, last document)"""
+    written, last = 0, None
+    async for document in cursor:
+        out.write(dumps(document).decode("utf-8") + "\n")
+        written, last = written + 1, document
+    return written, last
+
+
+async def write_csv(cursor, columns: List[str], out: TextIO = sys.stdout) -> Tuple[int, Optional[dict]]:
+    """Write a header and one CSV row per document. Returns (documents written, last document)"""
+    writer = csv.writer(out)
+    writer.writerow(columns)
+    written, last = 0, None
+    async for document in cursor:
+        row = []
+        for name in columns:
+            value = document.get(name)
+            if isinstance(value, (list, dict)):
+                value = dumps(value).decode("utf-8")
+            elif isinstance(value, datetime):
+                value = value.isoformat()
+            row.append("" if value is None else value)
+        writer.writerow(row)
+        written, last = written + 1, document
+    return written, last
+
+
+def next_page_hint(collection: str, last: Optional[dict], written: int, args) -> Optional[str]:
+    """Command-line hint for the next page, if --limit cut the output short"""
+    if not args.limit or last is None or written < args.limit or args.sort.lstrip("-+") != "_id":
+        return None
+    return f"{collection}: next page with --after {last['_id']}"
+
+
+async def summarize(db, collection: str, query: dict, group_by: Optional[str] = None) -> dict:
+    """Document count plus per-group counts and totals, via aggregation"""
+    group_key, accumulators = SUMMARIES.get(collection, (None, {}))
+    if group_by:
+        group_key = f"${group_by}"
+    pipeline = [{"$match": query}] if query else []
+    pipeline.append({"$group": {"_id": group_key, "count": {"$sum": 1}, **accumulators}})
+    pipeline.append({"$sort": {"count": -1}})
+
+    groups = await db[collection].aggregate(pipeline).to_list(length=None)
+    return {
+        "collection": collection,
+        "count": sum(group["count"] for group in groups),
+        "groups": groups,
+    }
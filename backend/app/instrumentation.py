@@ -0,0 +1,255 @@
+"""
+Request timing, MongoDB command monitoring and the Server-Timing header.
+
+TimingMiddleware starts a RequestTimings for every HTTP request and keeps
+it in a context variable. Everything the request does adds to it:
+
+- auth: functions decorated with @timed_phase("auth") (token checks and
+  password hashing; includes their own DB lookups)
+- db: every MongoDB command, also split per collection. Motor runs
+  commands on its executor with a copy of the caller's context, so the
+  command listener sees the request that issued them.
+- app: the endpoint function itself
+- serialize: response model validation and encoding after the endpoint
+  returns (routes must use TimedRoute)
+
+The totals go to Prometheus histograms and, when SERVER_TIMING_ENABLED,
+to a Server-Timing response header browsers show in their dev tools.
+"""
+import functools
+import threading
+import time
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+from fastapi.routing import APIRoute
+from pymongo import monitoring
+from starlette.datastructures import Headers, MutableHeaders
+
+from app.metrics import BYTES_BUCKETS, registry
+
+request_duration = registry.histogram(
+    "http_request_duration_seconds", "Time to handle a request, up to the last body byte",
+    ["method", "route", "status"],
+)
+request_phase_duration = registry.histogram(
+    "http_request_phase_seconds", "Time a request spent in auth, db, app and serialize",
+    ["route", "phase"],
+)
+request_size = registry.histogram(
+    "http_request_size_bytes", "Request body size from Content-Length", ["route"], BYTES_BUCKETS,
+)
+response_size = registry.histogram(
+    "http_response_size_bytes", "Response body bytes sent, after any compression", ["route"], BYTES_BUCKETS,
+)
+requests_in_flight = registry.gauge(
+    "http_requests_in_flight", "Requests being handled"
+)
+command_duration = registry.histogram(
+    "mongo_command_duration_seconds", "MongoDB command round-trip time", ["collection", "command"],
+)
+command_failures = registry.counter(
+    "mongo_command_failures_total", "MongoDB commands that returned an error", ["collection", "command"],
+)
+
+PHASES = ("auth", "db", "app", "serialize")
+
+# Commands the driver sends on its own; they are not attributed to requests
+_DRIVER_COMMANDS = {"hello", "ismaster", "isMaster", "ping", "endSessions", "saslStart", "saslContinue"}
+
+
+class RequestTimings:
+    """Seconds spent per phase while handling one request"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases: Dict[str, float] = {}
+        self.collections: Dict[str, float] = {}
+        self.db_operations = 0
+        self.endpoint_started: Optional[float] = None
+        self.endpoint_finished: Optional[float] = None
+        # Commands are reported from Motor's executor threads
+        self._lock = threading.Lock()
+
+    def add(self, phase: str, seconds: float):
+        with self._lock:
+            self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def add_command(self, collection: str, seconds: float):
+        with self._lock:
+            self.phases["db"] = self.phases.get("db", 0.0) + seconds
+            self.collections[collection] = self.collections.get(collection, 0.0) + seconds
+            self.db_operations += 1
+
+    def server_timing(self) -> str:
+        entries = []
+        for phase in PHASES:
+            if phase in self.phases:
+                entry = f"{phase};dur={self.phases[phase] * 1000:.2f}"
+                if phase == "db":
+                    entry += f';desc="{self.db_operations} ops"'
+                entries.append(entry)
+        entries += [
+            f"db.{collection};dur={seconds * 1000:.2f}"
+            for collection, seconds in sorted(self.collections.items())
+        ]
+        entries.append(f"total;dur={(time.perf_counter() - self.started) * 1000:.2f}")
+        return ", ".join(entries)
+
+
+_current: ContextVar[Optional[RequestTimings]] = ContextVar("request_timings", default=None)
+
+
+def current_timings() -> Optional[RequestTimings]:
+    return _current.get()
+
+
+def timed_phase(phase: str):
+    """Decorator adding an async function's run time to the current request's `phase`"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            timings = _current.get()
+            if timings is None:
+                return await fn(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return await fn(*args, **kwargs)
+            finally:
+                timings.add(phase, time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+
+# Routes
+
+def _timed_endpoint(endpoint):
+    @functools.wraps(endpoint)
+    async def wrapper(*args, **kwargs):
+        timings = _current.get()
+        if timings is not None:
+            timings.endpoint_started = time.perf_counter()
+        try:
+            return await endpoint(*args, **kwargs)
+        finally:
+            if timings is not None:
+                timings.endpoint_finished = time.perf_counter()
+                timings.add("app", timings.endpoint_finished - timings.endpoint_started)
+    return wrapper
+
+
+class TimedRoute(APIRoute):
+    """APIRoute that separates endpoint time from response serialization.
+
+    Everything the handler does after the endpoint returns (response model
+    validation, encoding, rendering) counts as "serialize". Endpoints that
+    return a Response object encode inside the endpoint, so that time shows
+    up under "app" instead.
+    """
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        super().__init__(path, _timed_endpoint(endpoint), **kwargs)
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def timed_handler(request):
+            response = await handler(request)
+            timings = _current.get()
+            if timings is not None and timings.endpoint_finished is not None:
+                timings.add("serialize", time.perf_counter() - timings.endpoint_finished)
+            return response
+
+        return timed_handler
+
+
+# MongoDB commands
+
+def _collection(event) -> str:
+    key = "collection" if event.command_name == "getMore" else event.command_name
+    target = event.command.get(key)
+    return target if isinstance(target, str) else "-"
+
+
+class CommandMetricsListener(monitoring.CommandListener):
+    """Per-collection command counts and latencies, attributed to the current request"""
+
+    def __init__(self):
+        # Succeeded/failed events carry no command body; remember the
+        # collection from the started event
+        self._collections: Dict[tuple, str] = {}
+        self._lock = threading.Lock()
+
+    def started(self, event):
+        if event.command_name in _DRIVER_COMMANDS:
+            return
+        with self._lock:
+            self._collections[(event.connection_id, event.request_id)] = _collection(event)
+
+    def _finished(self, event, failed: bool):
+        with self._lock:
+            collection = self._collections.pop((event.connection_id, event.request_id), None)
+        if collection is None:
+            return
+        seconds = event.duration_micros / 1e6
+        command_duration.observe(seconds, collection, event.command_name)
+        if failed:
+            command_failures.inc(1, collection, event.command_name)
+        timings = _current.get()
+        if timings is not None:
+            timings.add_command(collection, seconds)
+
+    def succeeded(self, event):
+        self._finished(event, failed=False)
+
+    def failed(self, event):
+        self._finished(event, failed=True)
+
+
+# Middleware
+
+class TimingMiddleware:
+    """Times each HTTP request, records its metrics and adds Server-Timing"""
+
+    def __init__(self, app, server_timing: bool = True):
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+        token = _current.set(timings)
+        status_code = 500
+        sent = 0
+
+        async def send_wrapper(message):
+            nonlocal status_code, sent
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if self.server_timing:
+                    headers = MutableHeaders(scope=message)
+                    headers.append("Server-Timing", timings.server_timing())
+            elif message["type"] == "http.response.body":
+                sent += len(message.get("body", b""))
+            await send(message)
+
+        requests_in_flight.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            requests_in_flight.dec()
+            _current.reset(token)
+            self._record(scope, timings, status_code, sent)
+
+    def _record(self, scope, timings: RequestTimings, status_code: int, sent: int):
+        route = getattr(scope.get("route"), "path", "unmatched")
+        request_duration.observe(time.perf_counter() - timings.started, scope["method"], route, str(status_code))
+        for phase, seconds in timings.phases.items():
+            request_phase_duration.observe(seconds, route, phase)
+        length = Headers(scope=scope).get("content-length")
+        if length and length.isdigit():
+            request_size.observe(int(length), route)
+        response_size.observe(sent, route)
@@ -0,0 +1,365 @@
+"""
+Inventory reservations with sharded stock for hot SKUs.
+
+A reservation holds stock for a short time. Holding takes the stock out
+immediately with conditional updates, so stock can never go negative;
+confirming turns the hold into a sale, and releasing (explicitly or when
+the hold expires) puts the stock back. Every transition is a single
+find_one_and_update on the reservation's status, so stock is returned at
+most once.
+
+The reservation is inserted as pending before any stock is taken, and each
+take is pushed onto it as soon as it succeeds. A hold that fails part-way
+(short stock, a driver error, cancellation) is released like any other, and
+one abandoned by a crashed worker is released by the sweeper once expired.
+
+Stock normally lives in `products.stock`. A hot SKU can be split into
+`stock_shards` documents (`products.stock_shards` holds the count): holds
+then pick shards in random order and take what each can give, spreading
+concurrent writes over several documents instead of one. The product keeps
+`stocked_shards`, the number of shards with stock left, for the in-stock
+filter; it is only written when a shard runs out or is refilled.
+
+Whenever a hold or release writes the product document, the catalog
+version is bumped and the product invalidated like any other product
+write, so cached and conditional catalog reads show the new stock. Takes
+that only move sharded counters leave the catalog alone.
+"""
+import asyncio
+import random
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Iterable, List, Optional
+
+from bson import ObjectId
+from fastapi import HTTPException, status
+from pymongo import ReturnDocument
+
+from app.cache import catalog_cache
+from app.config import settings
+from app.http_cache import bump_catalog_version
+from app.indexes import declare_index, hot_query
+
+PENDING = "pending"
+HELD = "held"
+CONFIRMED = "confirmed"
+RELEASED = "released"
+
+# Finished reservations are kept this long for auditing, then TTL-deleted
+FINISHED_RETENTION = timedelta(days=1)
+
+declare_index("stock_shards", [("product_id", 1), ("shard", 1)], unique=True)
+declare_index("reservations", [("status", 1), ("expires_at", 1)])
+declare_index("reservations", [("purge_at", 1)], expireAfterSeconds=0)
+hot_query("stock shards: by product", "stock_shards", {"product_id": "000000000000000000000000"})
+hot_query("reservations: expired holds", "reservations",
+          {"status": {"$in": [PENDING, HELD]}, "expires_at": {"$lt": datetime(2000, 1, 1)}})
+
+# Called with each take ({"shard", "quantity"}) once the stock is out
+RecordTake = Callable[[dict], Awaitable[None]]
+
+
+def insufficient_stock(product_id: str):
+    return HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail=f"Insufficient stock for product {product_id}"
+    )
+
+
+def reservation_gone():
+    return HTTPException(status_code=status.HTTP_410_GONE, detail="Reservation is no longer held")
+
+
+# Stock
+
+async def _record(db, product_id: str, take: dict, record: RecordTake):
+    try:
+        await record(take)
+    except BaseException:
+        # Not on the reservation, so nothing else would give it back
+        await _return_stock(db, product_id, [take])
+        raise
+
+
+async def _take_from_shards(db, product_id: str, quantity: int, record: RecordTake) -> bool:
+    shards = [s["shard"] async for s in db.stock_shards.find(
+        {"product_id": product_id, "available": {"$gt": 0}}, {"shard": 1}
+    )]
+    random.shuffle(shards)
+
+    remaining, emptied = quantity, False
+    for shard in shards:
+        before = await db.stock_shards.find_one_and_update(
+            {"product_id": product_id, "shard": shard, "available": {"$gt": 0}},
+            [{"$set": {"available": {"$max": [0, {"$subtract": ["$available", remaining]}]}}}],
+            projection={"available": 1}
+        )
+        if before is None:
+            continue
+        taken = min(before["available"], remaining)
+        if taken == before["available"]:
+            await _count_stocked_shards(db, product_id, -1)
+            emptied = True
+        await _record(db, product_id, {"shard": shard, "quantity": taken}, record)
+        remaining -= taken
+        if remaining == 0:
+            return emptied
+
+    # What was taken is on the reservation, which the caller releases
+    raise insufficient_stock(product_id)
+
+
+async def take_stock(db, product_id: str, quantity: int, record: RecordTake) -> bool:
+    """Take `quantity` units out of stock, recording where they came from. 409 if short.
+
+    Returns whether the product document changed.
+    """
+    result = await db.products.update_one(
+        {"_id": ObjectId(product_id), "stock_shards": {"$exists": False}, "stock": {"$gte": quantity}},
+        {"$inc": {"stock": -quantity}}
+    )
+    if result.modified_count == 1:
+        await _record(db, product_id, {"shard": None, "quantity": quantity}, record)
+        return True
+    return await _take_from_shards(db, product_id, quantity, record)
+
+
+async def _count_stocked_shards(db, product_id: str, change: int):
+    # Shards only go empty or get refilled through the atomic updates that
+    # report it, so the count stays exact without re-reading the shards
+    await db.products.update_one(
+        {"_id": ObjectId(product_id), "stock_shards": {"$exists": True}},
+        {"$inc": {"stocked_shards": change}}
+    )
+
+
+async def _return_stock(db, product_id: str, takes: List[dict]) -> bool:
+    """Put takes back. Returns whether the product document changed"""
+    changed = False
+    for take in takes:
+        if take["shard"] is None:
+            await db.products.update_one(
+                {"_id": ObjectId(product_id)}, {"$inc": {"stock": take["quantity"]}}
+            )
+            changed = True
+            continue
+        # Upsert in case the product was re-sharded meanwhile
+        before = await db.stock_shards.find_one_and_update(
+            {"product_id": product_id, "shard": take["shard"]},
+            {"$inc": {"available": take["quantity"]}},
+            projection={"available": 1},
+            upsert=True
+        )
+        if take["quantity"] > 0 and (before is None or before["available"] <= 0):
+            await _count_stocked_shards(db, product_id, 1)
+            changed = True
+    return changed
+
+
+async def _publish_stock_changes(db, product_ids: Iterable[str]):
+    product_ids = set(product_ids)
+    if not product_ids:
+        return
+    await bump_catalog_version(db)
+    for product_id in product_ids:
+        catalog_cache.invalidate_product(product_id)
+
+
+async def stock_level(db, product_id: str) -> dict:
+    """Live available stock for a product, per shard if sharded"""
+    product = await db.products.find_one(
+        {"_id": ObjectId(product_id)}, {"stock": 1, "stock_shards": 1}
+    )
+    if product is None:
+        raise HTTPException(status_code=404, detail="Product not found")
+
+    if not product.get("stock_shards"):
+        return {"product_id": product_id, "sharded": False, "available": product.get("stock", 0)}
+
+    shards = await db.stock_shards.find(
+        {"product_id": product_id}, {"_id": 0, "shard": 1, "available": 1}
+    ).sort("shard", 1).to_list(length=None)
+    return {
+        "product_id": product_id,
+        "sharded": True,
+        "available": sum(s["available"] for s in shards),
+        "shards": shards,
+    }
+
+
+async def set_stock_shards(db, product_id: str, count: int) -> dict:
+    """Split a product's stock over `count` shards (0 merges it back).
+
+    Meant to be run before a drop, not during one: holds racing with the
+    move may briefly see the product as out of stock.
+    """
+    object_id = ObjectId(product_id)
+
+    # Merge existing shards back into products.stock
+    product = await db.products.find_one_and_update(
+        {"_id": object_id, "stock_shards": {"$exists": True}},
+        {"$unset": {"stock_shards": "", "stocked_shards": ""}, "$set": {"stock": 0}}
+    )
+    if product is not None:
+        while True:
+            shard = await db.stock_shards.find_one_and_delete({"product_id": product_id})
+            if shard is None:
+                break
+            await db.products.update_one({"_id": object_id}, {"$inc": {"stock": shard["available"]}})
+
+    if count > 0:
+        product = await db.products.find_one_and_update(
+            {"_id": object_id, "stock_shards": {"$exists": False}},
+            {"$set": {"stock_shards": count, "stock": 0}},
+            projection={"stock": 1}
+        )
+        if product is None:
+            raise HTTPException(status_code=404, detail="Product not found")
+        total = product.get("stock", 0)
+        await db.products.update_one({"_id": object_id}, {"$set": {"stocked_shards": min(total, count)}})
+        await db.stock_shards.insert_many([
+            {
+                "product_id": product_id,
+                "shard": shard,
+                "available": total // count + (1 if shard < total % count else 0),
+            }
+            for shard in range(count)
+        ])
+
+    return await stock_level(db, product_id)
+
+
+# Reservations
+
+async def reserve(db, user_id: str, lines: List[dict], ttl_seconds: Optional[int] = None) -> dict:
+    """Hold stock for order lines ({"product_id", "quantity"}). 409 if any line is short"""
+    now = datetime.utcnow()
+    reservation = {
+        "user_id": user_id,
+        "status": PENDING,
+        "lines": [
+            {"product_id": line["product_id"], "quantity": line["quantity"], "takes": []}
+            for line in lines
+        ],
+        "created_at": now,
+        "expires_at": now + timedelta(seconds=ttl_seconds or settings.RESERVATION_TTL_SECONDS),
+    }
+    await db.reservations.insert_one(reservation)
+    reservation_id = reservation["_id"]
+
+    def recorder(index: int) -> RecordTake:
+        async def record(take: dict):
+            result = await db.reservations.update_one(
+                {"_id": reservation_id, "status": PENDING}, {"$push": {f"lines.{index}.takes": take}}
+            )
+            if result.modified_count == 0:
+                raise reservation_gone()
+        return record
+
+    changed = set()
+    try:
+        for index, line in enumerate(lines):
+            if await take_stock(db, line["product_id"], line["quantity"], recorder(index)):
+                changed.add(line["product_id"])
+        held = await db.reservations.find_one_and_update(
+            {"_id": reservation_id, "status": PENDING},
+            {"$set": {"status": HELD}},
+            return_document=ReturnDocument.AFTER
+        )
+        if held is None:
+            raise reservation_gone()
+    except BaseException:
+        await release(db, reservation_id)
+        raise
+    finally:
+        await _publish_stock_changes(db, changed)
+    return held
+
+
+async def get_reservation(db, reservation_id: str, user_id: str) -> dict:
+    if not ObjectId.is_valid(reservation_id):
+        raise HTTPException(status_code=400, detail="Invalid reservation ID")
+    reservation = await db.reservations.find_one({"_id": ObjectId(reservation_id), "user_id": user_id})
+    if reservation is None:
+        raise HTTPException(status_code=404, detail="Reservation not found")
+    return reservation
+
+
+async def confirm(db, reservation_id, user_id: str, session=None) -> dict:
+    """Turn a live hold into a sale. 410 if it expired or was released"""
+    now = datetime.utcnow()
+    reservation = await db.reservations.find_one_and_update(
+        {"_id": ObjectId(reservation_id), "user_id": user_id, "status": HELD, "expires_at": {"$gt": now}},
+        {"$set": {"status": CONFIRMED, "confirmed_at": now, "purge_at": now + FINISHED_RETENTION}},
+        return_document=ReturnDocument.AFTER,
+        session=session
+    )
+    if reservation is None:
+        raise reservation_gone()
+    return reservation
+
+
+async def release(db, reservation_id, user_id: Optional[str] = None) -> bool:
+    """Give a hold's stock back. False if it was not held any more"""
+    query = {"_id": ObjectId(reservation_id), "status": {"$in": [PENDING, HELD]}}
+    if user_id is not None:
+        query["user_id"] = user_id
+    now = datetime.utcnow()
+    reservation = await db.reservations.find_one_and_update(
+        query, {"$set": {"status": RELEASED, "released_at": now, "purge_at": now + FINISHED_RETENTION}}
+    )
+    if reservation is None:
+        return False
+    changed = set()
+    try:
+        for line in reservation["lines"]:
+            if await _return_stock(db, line["product_id"], line["takes"]):
+                changed.add(line["product_id"])
+    finally:
+        await _publish_stock_changes(db, changed)
+    return True
+
+
+async def release_expired(db) -> int:
+    """Release every hold past its expiry. Returns how many were released"""
+    released = 0
+    cursor = db.reservations.find(
+        {"status": {"$in": [PENDING, HELD]}, "expires_at": {"$lte": datetime.utcnow()}}, {"_id": 1}
+    )
+    async for reservation in cursor:
+        if await release(db, reservation["_id"]):
+            released += 1
+    return released
+
+
+# Expiry sweeper
+
+_sweeper_task: Optional[asyncio.Task] = None
+
+
+async def _sweep(database):
+    while True:
+        try:
+            await release_expired(database)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"⚠️  Reservation sweep failed: {e}")
+        await asyncio.sleep(settings.RESERVATION_SWEEP_INTERVAL_SECONDS)
+
+
+def start_reservation_sweeper(database):
+    global _sweeper_task
+    if settings.RESERVATION_SWEEP_INTERVAL_SECONDS > 0:
+        _sweeper_task = asyncio.create_task(_sweep(database))
+
+
+async def stop_reservation_sweeper():
+    global _sweeper_task
+    if _sweeper_task is None:
+        return
+    _sweeper_task.cancel()
+    try:
+        await _sweeper_task
+    except asyncio.CancelledError:
+        pass
+    _sweeper_task = None
@@ -1,13 +1,53 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from app.config import settings
-from app.database import connect_to_mongo, close_mongo_connection
-from app.routes import auth, products, cart, orders
+from app.database import connect_to_mongo, close_mongo_connection, get_database, pool_stats
+from app.cache import start_invalidation_feed, stop_invalidation_feed
+from app.auth import shutdown_hashing_pool
+from app.compression import CompressionMiddleware
+from app.instrumentation import TimingMiddleware
+from app.metrics import registry
+from app.indexes import ensure_indexes
+from app.inventory import start_reservation_sweeper, stop_reservation_sweeper
+from app.analytics import stop_rebuild
+from app.recommendations import recommendations, start_recommendations_refresher, stop_recommendations_refresher
+from app.routes import analytics, auth, products, cart, favorites, orders, reservations
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Connect and start background tasks; stop them and close on shutdown.
+
+    uvicorn runs the shutdown half only once it has stopped listening and
+    in-flight requests finished (or SERVER_GRACEFUL_SHUTDOWN_SECONDS ran out).
+    """
+    await connect_to_mongo()
+    database = await get_database()
+    if settings.ENSURE_INDEXES_ON_STARTUP:
+        for problem in await ensure_indexes(database):
+            print(f"⚠️  Index could not be created: {problem}")
+    start_invalidation_feed(database)
+    start_reservation_sweeper(database)
+    await recommendations.load()
+    start_recommendations_refresher(database)
+    
+    yield
+    
+    await stop_rebuild()
+    await stop_recommendations_refresher()
+    await stop_reservation_sweeper()
+    await stop_invalidation_feed()
+    await close_mongo_connection()
+    shutdown_hashing_pool()
+
 
 app = FastAPI(
     title="Nike Store API",
     description="Backend API for Nike E-commerce Store",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
 )
 
 # CORS Configuration - Must be before routes
@@ -20,22 +60,20 @@ app.add_middleware(
     expose_headers=["*"],
 )
 
-# Event handlers
-@app.on_event("startup")
-async def startup_db_client():
-    await connect_to_mongo()
-
-
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    await close_mongo_connection()
+if settings.COMPRESSION_ENABLED:
+    app.add_middleware(CompressionMiddleware, minimum_size=settings.COMPRESSION_MINIMUM_SIZE)
 
+# Outermost, so timings cover the other middleware and count bytes on the wire
+app.add_middleware(TimingMiddleware, server_timing=settings.SERVER_TIMING_ENABLED)
 
 # Include routers
 app.include_router(auth.router)
 app.include_router(products.router)
 app.include_router(cart.router)
+app.include_router(favorites.router)
 app.include_router(orders.router)
+app.include_router(reservations.router)
+app.include_router(analytics.router)
 
 
 @app.get("/")
@@ -49,10 +87,17 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy"}
+    return {"status": "healthy", "mongo_pool": pool_stats()}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus metrics"""
+    return registry.render()
 
 
 if __name__ == "__main__":
+    # Development server with auto-reload; production uses `python -m app.server`
     import uvicorn
     uvicorn.run(
         "app.main:app",
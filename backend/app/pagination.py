@@ -0,0 +1,72 @@
+"""
+Keyset pagination over (sort field, _id) with opaque continuation cursors.
+
+The sort field is `created_at` unless a route sorts by something else
+(e.g. price); a cursor only works with the sort order that issued it.
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Optional, Tuple
+
+from bson import ObjectId
+from fastapi import HTTPException
+from pymongo import ASCENDING
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+DEFAULT_FIELD = "created_at"
+
+
+def encode_cursor(document: dict, field: str = DEFAULT_FIELD) -> str:
+    """Continuation cursor pointing just after `document`"""
+    if field == DEFAULT_FIELD:
+        payload = {"t": document[field].isoformat(), "id": str(document["_id"])}
+    else:
+        payload = {"k": field, "v": document.get(field), "id": str(document["_id"])}
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, field: str = DEFAULT_FIELD) -> Tuple[Any, ObjectId]:
+    """Position encoded in a cursor; 400 if it was not issued by encode_cursor for `field`"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        if field == DEFAULT_FIELD:
+            return datetime.fromisoformat(payload["t"]), ObjectId(payload["id"])
+        if payload["k"] != field:
+            raise ValueError(field)
+        return payload["v"], ObjectId(payload["id"])
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def keyset_sort(direction: int = ASCENDING, field: str = DEFAULT_FIELD) -> List[Tuple[str, int]]:
+    return [(field, direction), ("_id", direction)]
+
+
+def keyset_query(query: dict, cursor: Optional[str], direction: int = ASCENDING,
+                 field: str = DEFAULT_FIELD) -> dict:
+    """Add the "after this cursor" condition to a find filter"""
+    if not cursor:
+        return query
+    value, object_id = decode_cursor(cursor, field)
+    op = "$gt" if direction == ASCENDING else "$lt"
+    after = {
+        "$or": [
+            {field: {op: value}},
+            {field: value, "_id": {op: object_id}},
+        ]
+    }
+    return {"$and": [query, after]} if query else after
+
+
+def next_cursor(page: List[dict], limit: int, field: str = DEFAULT_FIELD) -> Optional[str]:
+    """Cursor for the page after `page`, or None if this was the last one.
+
+    Must be called before `_id` is converted to a string.
+    """
+    if len(page) < limit:
+        return None
+    return encode_cursor(page[-1], field)
+
@@ -0,0 +1,87 @@
+"""
+Field selection for list endpoints.
+
+A request may ask for a named view (`?view=card`) or an explicit field list
+(`?fields=name,price,image_url`). The selection becomes a MongoDB projection
+and a response model containing only those fields, so neither the database
+nor Pydantic handles data the client did not ask for.
+"""
+from functools import lru_cache
+from typing import Dict, Optional, Tuple, Type
+
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, ConfigDict, create_model
+
+from app.config import settings
+from app.serialization import render_documents
+
+# Keys needed to build pagination cursors, always fetched from Mongo
+_CURSOR_FIELDS = ("_id", "created_at")
+
+
+class FieldSelection:
+    """The model a response is rendered with and the projection to fetch it"""
+
+    def __init__(self, model: Type[BaseModel]):
+        self.model = model
+        self.projection = {name: 1 for name in _model_keys(model) if name != "_id"}
+        self.projection.update({name: 1 for name in _CURSOR_FIELDS})
+
+    def dump(self, document: dict) -> dict:
+        return self.model.model_validate(document).model_dump(mode="json", by_alias=True)
+
+    def render(self, documents: list, headers: Optional[dict] = None) -> JSONResponse:
+        if settings.FAST_JSON_RESPONSES:
+            return render_documents(self.model, documents, headers)
+        return JSONResponse(content=[self.dump(document) for document in documents], headers=headers)
+
+
+def _model_keys(model: Type[BaseModel]):
+    return [info.alias or name for name, info in model.model_fields.items()]
+
+
+@lru_cache(maxsize=256)
+def _subset_model(full_model: Type[BaseModel], fields: Tuple[str, ...]) -> Type[BaseModel]:
+    definitions = {
+        name: (info.annotation, info)
+        for name, info in full_model.model_fields.items()
+        if name == "id" or name in fields
+    }
+    return create_model(
+        f"{full_model.__name__}Fields",
+        __config__=ConfigDict(populate_by_name=True),
+        **definitions
+    )
+
+
+def select_fields(
+    full_model: Type[BaseModel],
+    views: Dict[str, Type[BaseModel]],
+    view: Optional[str] = None,
+    fields: Optional[str] = None,
+) -> Optional[FieldSelection]:
+    """Resolve ?view= / ?fields= for a list endpoint.
+
+    Returns None when the full documents were asked for. `fields` wins over
+    `view`; unknown views or fields are a 400.
+    """
+    if fields:
+        wanted = tuple(sorted({f.strip() for f in fields.split(",") if f.strip()} - {"id", "_id"}))
+        allowed = set(full_model.model_fields) - {"id"}
+        unknown = [f for f in wanted if f not in allowed]
+        if unknown:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unknown fields: {unknown}. Must be among: {sorted(allowed)}"
+            )
+        return FieldSelection(_subset_model(full_model, wanted))
+
+    if view:
+        if view not in views:
+            raise HTTPException(status_code=400, detail=f"Invalid view. Must be one of: {list(views)}")
+        if views[view] is full_model:
+            return None
+        return FieldSelection(views[view])
+
+    return None
@@ -0,0 +1,578 @@
+"""
+"Frequently bought together": each product's most co-purchased products.
+
+A periodic job streams the orders collection, counts for every pair of
+distinct products how many orders contain both, and keeps each product's
+top RECOMMENDATIONS_TOP_K partners. The result is one snapshot file of
+flat arrays (native byte order):
+
+- ids: 24-byte product ids; a product's position is its index
+- by_id: positions in product id order, for binary search
+- orders: how many orders contain each product
+- indptr/neighbors/counts: the top-K lists, CSR style
+- pair_keys/pair_counts: every pair count, keyed a << 32 | b and sorted,
+  kept so a refresh can add newer orders without rescanning
+
+Workers mmap the snapshot, so they share one copy through the page cache
+and build no per-process structures: a lookup is a binary search over
+by_id plus two array slices. Snapshots are written to a temporary file
+and renamed over the old one; workers map it at startup and pick a new
+one up within RECOMMENDATIONS_RELOAD_SECONDS, off the event loop.
+
+    python -m app.recommendations build     # every order
+    python -m app.recommendations refresh   # orders since the last snapshot
+
+A refresh counts the orders with an _id past the snapshot's watermark.
+Orders from the last RECOMMENDATIONS_SETTLE_SECONDS are left for the next
+run, since ObjectIds from different processes are only roughly in order.
+Cancelled orders are skipped, but an order cancelled after a refresh
+counted it stays counted until the next full build.
+
+Pair counting uses NumPy when it is installed (np.unique over the pair
+keys of each chunk of orders) and plain dicts otherwise; both write the
+same snapshot.
+"""
+import argparse
+import array
+import asyncio
+import heapq
+import json
+import mmap
+import os
+import struct
+import time
+from datetime import datetime, timedelta
+from itertools import chain, permutations
+from typing import Dict, List, Optional, Tuple
+
+from bson import ObjectId
+
+from app.config import settings
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: every worker refreshes on its own schedule
+    fcntl = None
+
+MAGIC = b"NSRECS2\n"
+ID_BYTES = 24
+EXCLUDED_STATUSES = ["cancelled"]
+# Orders per counting chunk, and pending NumPy pair keys before they are merged
+CHUNK_ORDERS = 50_000
+MERGE_KEYS = 8_000_000
+
+_SHIFT = 32
+_LOW = (1 << _SHIFT) - 1
+
+
+def _empty(typecode: str):
+    if numpy is not None:
+        return numpy.zeros(0, dtype=numpy.dtype(typecode))
+    return array.array(typecode)
+
+
+# Counting
+
+class ProductIndex:
+    """Dense indexes for product ids, and how many orders contain each product"""
+
+    def __init__(self, ids: Optional[List[str]] = None, orders: Optional[List[int]] = None):
+        self.ids = list(ids or [])
+        self.orders = list(orders or [0] * len(self.ids))
+        self.positions = {product_id: i for i, product_id in enumerate(self.ids)}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add_order(self, items: List[dict]) -> List[int]:
+        """Indexes of the distinct (well-formed) products in an order's items"""
+        indexes = set()
+        for item in items:
+            product_id = item.get("product_id")
+            if not isinstance(product_id, str) or len(product_id) != ID_BYTES or not product_id.isascii():
+                continue
+            index = self.positions.get(product_id)
+            if index is None:
+                index = self.positions[product_id] = len(self.ids)
+                self.ids.append(product_id)
+                self.orders.append(0)
+            indexes.add(index)
+        for index in indexes:
+            self.orders[index] += 1
+        return sorted(indexes)
+
+
+class PairCounter:
+    """Co-occurrence counts of product index pairs, both directions"""
+
+    def __init__(self, vectorized: Optional[bool] = None):
+        self.vectorized = numpy is not None if vectorized is None else vectorized
+        if self.vectorized and numpy is None:
+            raise RuntimeError("NumPy is not installed")
+        self._counts: Dict[int, int] = {}
+        self._parts: List[tuple] = []
+        self._pending = 0
+
+    def add_orders(self, orders: List[List[int]]):
+        """Count the pairs in orders of two or more distinct product indexes"""
+        if not orders:
+            return
+        if not self.vectorized:
+            counts = self._counts
+            for indexes in orders:
+                for a, b in permutations(indexes, 2):
+                    key = a << _SHIFT | b
+                    counts[key] = counts.get(key, 0) + 1
+            return
+
+        sizes = numpy.fromiter((len(indexes) for indexes in orders), dtype=numpy.int64, count=len(orders))
+        products = numpy.fromiter(chain.from_iterable(orders), dtype=numpy.uint64, count=int(sizes.sum()))
+        owner = numpy.repeat(numpy.arange(len(orders)), sizes)
+        shift = numpy.uint64(_SHIFT)
+        # Each order's products are contiguous, so comparing the arrays with
+        # themselves offset by d pairs every product with the one d after it
+        keys = []
+        for offset in range(1, int(sizes.max())):
+            same = owner[:-offset] == owner[offset:]
+            a, b = products[:-offset][same], products[offset:][same]
+            keys.append((a << shift) | b)
+            keys.append((b << shift) | a)
+        unique, counts = numpy.unique(numpy.concatenate(keys), return_counts=True)
+        self._parts.append((unique, counts.astype(numpy.uint32)))
+        self._pending += len(unique)
+        if self._pending > MERGE_KEYS:
+            self._merge()
+
+    def add_pairs(self, keys, counts):
+        """Add existing (sorted, unique) pair counts, e.g. from a snapshot"""
+        if not self.vectorized:
+            for key, count in zip(keys, counts):
+                self._counts[key] = self._counts.get(key, 0) + count
+            return
+        self._parts.append((numpy.asarray(keys, dtype=numpy.uint64), numpy.asarray(counts, dtype=numpy.uint32)))
+        self._pending += len(keys)
+
+    def _merge(self):
+        if len(self._parts) > 1:
+            keys = numpy.concatenate([part[0] for part in self._parts])
+            counts = numpy.concatenate([part[1] for part in self._parts])
+            unique, inverse = numpy.unique(keys, return_inverse=True)
+            totals = numpy.bincount(inverse, weights=counts, minlength=len(unique))
+            self._parts = [(unique, totals.astype(numpy.uint32))]
+        self._pending = len(self._parts[0][0]) if self._parts else 0
+
+    def pairs(self):
+        """(keys, counts) sorted by key, as uint64/uint32 arrays"""
+        if not self.vectorized:
+            keys = sorted(self._counts)
+            return array.array("Q", keys), array.array("I", (self._counts[key] for key in keys))
+        self._merge()
+        if not self._parts:
+            return _empty("Q"), _empty("I")
+        return self._parts[0]
+
+
+def top_k(keys, counts, products: int, k: int):
+    """CSR arrays (indptr, neighbors, counts) of each product's k most co-purchased products.
+
+    Ties go to the lower index, so both counting paths agree.
+    """
+    if numpy is not None and isinstance(keys, numpy.ndarray):
+        rows = (keys >> numpy.uint64(_SHIFT)).astype(numpy.int64)
+        cols = (keys & numpy.uint64(_LOW)).astype(numpy.uint32)
+        order = numpy.lexsort((cols, -counts.astype(numpy.int64), rows))
+        rows, cols, scores = rows[order], cols[order], counts[order]
+        rank = numpy.arange(len(rows)) - numpy.searchsorted(rows, rows)
+        keep = rank < k
+        rows, cols, scores = rows[keep], cols[keep], scores[keep]
+        indptr = numpy.zeros(products + 1, dtype=numpy.uint32)
+        indptr[1:] = numpy.cumsum(numpy.bincount(rows, minlength=products))
+        return indptr, cols, scores.astype(numpy.uint32)
+
+    indptr, neighbors, scores = array.array("I", [0]), array.array("I"), array.array("I")
+    position, total = 0, len(keys)
+    for row in range(products):
+        candidates = []
+        # keys are sorted, so a row's pairs are contiguous
+        while position < total and keys[position] >> _SHIFT == row:
+            candidates.append((-counts[position], keys[position] & _LOW))
+            position += 1
+        for count, col in heapq.nsmallest(k, candidates):
+            neighbors.append(col)
+            scores.append(-count)
+        indptr.append(len(neighbors))
+    return indptr, neighbors, scores
+
+
+async def count_orders(db, index: ProductIndex, counter: PairCounter, after: Optional[ObjectId] = None,
+                       progress: Optional[dict] = None) -> Tuple[int, Optional[ObjectId]]:
+    """Count orders after `after` (up to the settle cutoff) into index/counter.
+
+    Returns (orders counted, last order _id seen).
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=settings.RECOMMENDATIONS_SETTLE_SECONDS)
+    bounds = {"$lt": ObjectId.from_datetime(cutoff)}
+    if after is not None:
+        bounds["$gt"] = after
+    query = {"_id": bounds, "status": {"$nin": EXCLUDED_STATUSES}}
+    cursor = db.orders.find(query, {"items.product_id": 1}).sort("_id", 1).batch_size(10_000)
+
+    chunk, counted, last = [], 0, after
+    async for order in cursor:
+        indexes = index.add_order(order.get("items") or [])
+        if len(indexes) > 1:
+            chunk.append(indexes)
+        counted += 1
+        last = order["_id"]
+        if len(chunk) >= CHUNK_ORDERS:
+            # Off the event loop, so a refresh inside a worker keeps serving
+            await asyncio.to_thread(counter.add_orders, chunk)
+            chunk = []
+            if progress is not None:
+                progress["orders_counted"] = counted
+    await asyncio.to_thread(counter.add_orders, chunk)
+    return counted, last
+
+
+# Snapshots
+
+SECTIONS = [
+    ("ids", "B"),
+    ("by_id", "I"),
+    ("orders", "I"),
+    ("indptr", "I"),
+    ("neighbors", "I"),
+    ("counts", "I"),
+    ("pair_keys", "Q"),
+    ("pair_counts", "I"),
+]
+
+
+def write_snapshot(path: str, index: ProductIndex, pair_keys, pair_counts, k: int, meta: dict) -> int:
+    """Write a snapshot atomically; returns its size in bytes"""
+    indptr, neighbors, counts = top_k(pair_keys, pair_counts, len(index), k)
+    arrays = {
+        "ids": "".join(index.ids).encode("ascii"),
+        "by_id": array.array("I", sorted(range(len(index)), key=index.ids.__getitem__)),
+        "orders": array.array("I", index.orders),
+        "indptr": indptr,
+        "neighbors": neighbors,
+        "counts": counts,
+        "pair_keys": pair_keys,
+        "pair_counts": pair_counts,
+    }
+
+    sections, offset = {}, 0
+    for name, typecode in SECTIONS:
+        size = memoryview(arrays[name]).nbytes
+        sections[name] = [offset, size, typecode]
+        # 8-byte alignment, so every section can be cast in place
+        offset += size + (-size % 8)
+    header = json.dumps({
+        **meta,
+        "k": k,
+        "products": len(index),
+        "entries": len(neighbors),
+        "pairs": len(pair_keys),
+        "sections": sections,
+    }).encode("utf-8")
+    header += b" " * (-(len(MAGIC) + 4 + len(header)) % 8)
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<I", len(header)))
+        f.write(header)
+        for name, _ in SECTIONS:
+            data = memoryview(arrays[name]).cast("B")
+            f.write(data)
+            f.write(b"\0" * (-len(data) % 8))
+        size = f.tell()
+    os.replace(temporary, path)
+    return size
+
+
+class Snapshot:
+    """A memory-mapped snapshot file"""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._mmap)
+        if view[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a recommendations snapshot")
+        (header_size,) = struct.unpack_from("<I", self._mmap, len(MAGIC))
+        start = len(MAGIC) + 4
+        self.meta = json.loads(bytes(view[start:start + header_size]))
+        start += header_size
+        sections = self.meta.pop("sections")
+        self.arrays = {
+            name: view[start + offset:start + offset + size].cast(typecode)
+            for name, (offset, size, typecode) in sections.items()
+        }
+        self.products = self.meta["products"]
+        # Slicing the mmap (not a memoryview) gives comparable bytes
+        self._ids_start = start + sections["ids"][0]
+
+    def _id(self, index: int) -> bytes:
+        start = self._ids_start + index * ID_BYTES
+        return self._mmap[start:start + ID_BYTES]
+
+    def product_id(self, index: int) -> str:
+        return self._id(index).decode("ascii")
+
+    def product_ids(self) -> List[str]:
+        """Every product id, by index (a copy; not for the request path)"""
+        return [self.product_id(index) for index in range(self.products)]
+
+    def position(self, product_id: str) -> Optional[int]:
+        """A product's index, by binary search over by_id; None if unknown"""
+        if len(product_id) != ID_BYTES or not product_id.isascii():
+            return None
+        key = product_id.encode("ascii")
+        by_id = self.arrays["by_id"]
+        low, high = 0, len(by_id)
+        while low < high:
+            middle = (low + high) // 2
+            if self._id(by_id[middle]) < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low < len(by_id) and self._id(by_id[low]) == key:
+            return by_id[low]
+        return None
+
+    def recommend(self, product_id: str, limit: int) -> List[dict]:
+        """Up to `limit` products most often bought with `product_id`"""
+        index = self.position(product_id)
+        if index is None:
+            return []
+        indptr, neighbors, counts = self.arrays["indptr"], self.arrays["neighbors"], self.arrays["counts"]
+        start = indptr[index]
+        end = min(indptr[index + 1], start + limit)
+        orders = self.arrays["orders"][index]
+        return [
+            {
+                "product_id": self.product_id(neighbors[i]),
+                "orders": counts[i],
+                # Share of this product's orders that also had the other one
+                "confidence": round(counts[i] / orders, 4),
+            }
+            for i in range(start, end)
+        ]
+
+    def counted(self) -> Tuple[ProductIndex, tuple]:
+        """The snapshot's counts as a ProductIndex and (pair keys, pair counts)"""
+        index = ProductIndex(self.product_ids(), self.arrays["orders"].tolist())
+        keys, counts = self.arrays["pair_keys"], self.arrays["pair_counts"]
+        if numpy is not None:
+            return index, (numpy.frombuffer(keys, dtype=numpy.uint64), numpy.frombuffer(counts, dtype=numpy.uint32))
+        return index, (keys, counts)
+
+
+# Jobs
+
+async def build(db, path: Optional[str] = None, k: Optional[int] = None, vectorized: Optional[bool] = None,
+                progress: Optional[dict] = None) -> dict:
+    """Count every order and write a fresh snapshot"""
+    path = path or settings.RECOMMENDATIONS_SNAPSHOT_PATH
+    k = k or settings.RECOMMENDATIONS_TOP_K
+    started = time.perf_counter()
+
+    index, counter = ProductIndex(), PairCounter(vectorized)
+    counted, last = await count_orders(db, index, counter, progress=progress)
+    keys, counts = await asyncio.to_thread(counter.pairs)
+    meta = {"orders": counted, "watermark": str(last) if last else None, "built_at": datetime.utcnow().isoformat()}
+    size = await asyncio.to_thread(write_snapshot, path, index, keys, counts, k, meta)
+    return {
+        "orders": counted,
+        "products": len(index),
+        "pairs": len(keys),
+        "bytes": size,
+        "seconds": round(time.perf_counter() - started, 2),
+    }
+
+
+async def refresh(db, path: Optional[str] = None, k: Optional[int] = None, vectorized: Optional[bool] = None,
+                  progress: Optional[dict] = None) -> dict:
+    """Add the orders placed since the snapshot to it (a full build if there is none)"""
+    path = path or settings.RECOMMENDATIONS_SNAPSHOT_PATH
+    if not os.path.exists(path):
+        return await build(db, path, k, vectorized, progress)
+    try:
+        snapshot = Snapshot(path)
+    except ValueError:
+        # Unreadable, e.g. written by an older version
+        return await build(db, path, k, vectorized, progress)
+    k = k or settings.RECOMMENDATIONS_TOP_K
+    started = time.perf_counter()
+
+    index, (keys, counts) = snapshot.counted()
+    watermark = snapshot.meta["watermark"]
+    counter = PairCounter(vectorized)
+    added, last = await count_orders(
+        db, index, counter, ObjectId(watermark) if watermark else None, progress=progress
+    )
+    if added:
+        counter.add_pairs(keys, counts)
+        keys, counts = await asyncio.to_thread(counter.pairs)
+    if added or k != snapshot.meta["k"]:
+        meta = {
+            "orders": snapshot.meta["orders"] + added,
+            "watermark": str(last) if last else None,
+            "built_at": snapshot.meta["built_at"],
+            "refreshed_at": datetime.utcnow().isoformat(),
+        }
+        await asyncio.to_thread(write_snapshot, path, index, keys, counts, k, meta)
+    return {
+        "orders_added": added,
+        "orders": snapshot.meta["orders"] + added,
+        "products": len(index),
+        "pairs": len(keys),
+        "seconds": round(time.perf_counter() - started, 2),
+    }
+
+
+# Serving
+
+class Recommendations:
+    """This worker's view of the snapshot, remapped when the file is replaced.
+
+    Checking for and mapping a new file runs in the default executor, so
+    requests keep being served from the current snapshot meanwhile.
+    """
+
+    def __init__(self, path: str, reload_seconds: float):
+        self.path = path
+        self.reload_seconds = reload_seconds
+        self.snapshot: Optional[Snapshot] = None
+        self._stamp = None
+        self._checked_at: Optional[float] = None
+        self._reloading: Optional[asyncio.Future] = None
+
+    async def load(self):
+        """Map the snapshot now; called at startup"""
+        self._checked_at = time.monotonic()
+        await asyncio.get_running_loop().run_in_executor(None, self._reload)
+
+    def current(self) -> Optional[Snapshot]:
+        now = time.monotonic()
+        due = self._checked_at is None or now - self._checked_at >= self.reload_seconds
+        if due and (self._reloading is None or self._reloading.done()):
+            self._checked_at = now
+            self._reloading = asyncio.get_running_loop().run_in_executor(None, self._reload)
+        return self.snapshot
+
+    def _reload(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            self.snapshot, self._stamp = None, None
+            return
+        stamp = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if stamp == self._stamp:
+            return
+        try:
+            self.snapshot = Snapshot(self.path)
+            self._stamp = stamp
+        except (OSError, ValueError) as e:
+            print(f"⚠️  Recommendations snapshot not loaded: {e}")
+
+    def recommend(self, product_id: str, limit: int) -> List[dict]:
+        snapshot = self.current()
+        return snapshot.recommend(product_id, limit) if snapshot is not None else []
+
+
+recommendations = Recommendations(
+    settings.RECOMMENDATIONS_SNAPSHOT_PATH, settings.RECOMMENDATIONS_RELOAD_SECONDS
+)
+
+
+# In-app refresher, for deployments without a scheduler. Workers take
+# turns through a lock file, so only one of them refreshes at a time.
+
+_refresher_task: Optional[asyncio.Task] = None
+
+
+def _try_lock(path: str):
+    f = open(f"{path}.lock", "w")
+    if fcntl is None:
+        return f
+    try:
+        fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        f.close()
+        return None
+    return f
+
+
+async def _refresh_periodically(database):
+    directory = os.path.dirname(settings.RECOMMENDATIONS_SNAPSHOT_PATH)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    while True:
+        await asyncio.sleep(settings.RECOMMENDATIONS_REFRESH_SECONDS)
+        lock = _try_lock(settings.RECOMMENDATIONS_SNAPSHOT_PATH)
+        if lock is None:
+            continue
+        try:
+            await refresh(database)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"⚠️  Recommendations refresh failed: {e}")
+        finally:
+            lock.close()
+
+
+def start_recommendations_refresher(database):
+    global _refresher_task
+    if settings.RECOMMENDATIONS_REFRESH_SECONDS > 0:
+        _refresher_task = asyncio.create_task(_refresh_periodically(database))
+
+
+async def stop_recommendations_refresher():
+    global _refresher_task
+    if _refresher_task is None:
+        return
+    _refresher_task.cancel()
+    try:
+        await _refresher_task
+    except asyncio.CancelledError:
+        pass
+    _refresher_task = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or refresh the frequently-bought-together snapshot")
+    parser.add_argument("job", choices=["build", "refresh"])
+    parser.add_argument("--path", help=f"Default: RECOMMENDATIONS_SNAPSHOT_PATH "
+                                       f"({settings.RECOMMENDATIONS_SNAPSHOT_PATH})")
+    parser.add_argument("--k", type=int, help=f"Default: RECOMMENDATIONS_TOP_K ({settings.RECOMMENDATIONS_TOP_K})")
+    args = parser.parse_args()
+
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    async def run():
+        client = AsyncIOMotorClient(settings.MONGODB_URL)
+        try:
+            job = build if args.job == "build" else refresh
+            return await job(client[settings.DATABASE_NAME], args.path, args.k)
+        finally:
+            client.close()
+
+    result = asyncio.run(run())
+    print(f"✅ Recommendations {args.job}: " + ", ".join(f"{key}={value}" for key, value in result.items()))
+
+
+if __name__ == "__main__":
+    main()
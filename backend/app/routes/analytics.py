@@ -0,0 +1,56 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from typing import Optional
+from app.database import get_db
+from app.instrumentation import TimedRoute
+from app.routes.auth import get_current_user
+from app import analytics
+from datetime import datetime
+
+router = APIRouter(prefix="/analytics", tags=["Analytics"], route_class=TimedRoute)
+
+
+def _check_day(value: Optional[str], name: str):
+    if value is None:
+        return
+    try:
+        datetime.strptime(value, analytics.DAY_FORMAT)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"{name} must be a date like 2024-01-31")
+
+
+@router.get("/sales")
+async def get_sales(
+    start: Optional[str] = Query(None, description="First day (UTC), YYYY-MM-DD"),
+    end: Optional[str] = Query(None, description="Last day (UTC), YYYY-MM-DD"),
+    category: Optional[str] = None,
+    status: Optional[str] = None,
+    group_by: str = Query("day,category", description="Comma-separated: day, category, status"),
+    db = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """Units, revenue and order count from the sales rollups (admin only).
+    
+    Orders count under the day they were placed and their current status.
+    """
+    _check_day(start, "start")
+    _check_day(end, "end")
+    groups = tuple(name.strip() for name in group_by.split(",") if name.strip())
+    unknown = [name for name in groups if name not in analytics.GROUPS]
+    if not groups or unknown:
+        raise HTTPException(status_code=400, detail=f"Invalid group_by. Must be among: {list(analytics.GROUPS)}")
+    
+    return await analytics.sales(db, start, end, category, status, groups)
+
+
+@router.post("/rollups/rebuild", status_code=status.HTTP_202_ACCEPTED)
+async def rebuild_rollups(db = Depends(get_db), current_user = Depends(get_current_user)):
+    """Recompute the sales rollups from all orders in the background (admin only)"""
+    if not await analytics.start_rebuild(db):
+        raise HTTPException(status_code=409, detail="A rebuild is already running")
+    return {"message": "Rebuild started"}
+
+
+@router.get("/rollups/rebuild")
+async def get_rebuild_status(current_user = Depends(get_current_user)):
+    """Progress of the last rollup rebuild in this worker (admin only)"""
+    return analytics.rebuild_status()
@@ -2,14 +2,22 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from datetime import timedelta
 from app.database import get_db
-from app.schemas.schemas import UserCreate, UserLogin, UserResponse, Token
-from app.auth import get_password_hash, verify_password, create_access_token, verify_token
+from app.instrumentation import TimedRoute, timed_phase
+from app.schemas.schemas import PasswordChange, UserCreate, UserLogin, UserResponse, Token
+from app.auth import get_password_hash_async, verify_password_async, create_access_token, decode_token
+from app.cache import cart_summary_cache, principal_cache
+from app.indexes import declare_index, hot_query
 from app.config import settings
 from datetime import datetime
+from bson import ObjectId
+import time
 
-router = APIRouter(prefix="/auth", tags=["Authentication"])
+router = APIRouter(prefix="/auth", tags=["Authentication"], route_class=TimedRoute)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
+declare_index("users", [("email", 1)], unique=True)
+hot_query("users: by email", "users", {"email": "someone@example.com"})
+
 
 @router.post("/signup", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
 async def signup(user: UserCreate, db = Depends(get_db)):
@@ -23,7 +31,7 @@ async def signup(user: UserCreate, db = Depends(get_db)):
         )
     
     # Hash password
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await get_password_hash_async(user.password)
     
     # Create user document
     user_dict = user.dict(exclude={"password"})
@@ -43,7 +51,7 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends(), db = Depends(g
     # Find user by email
     user = await db.users.find_one({"email": form_data.username})
     
-    if not user or not verify_password(form_data.password, user["hashed_password"]):
+    if not user or not await verify_password_async(form_data.password, user["hashed_password"]):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
@@ -53,7 +61,7 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends(), db = Depends(g
     # Create access token
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user["email"]}, expires_delta=access_token_expires
+        data={"sub": user["email"], "uid": str(user["_id"])}, expires_delta=access_token_expires
     )
     
     return {"access_token": access_token, "token_type": "bearer"}
@@ -64,7 +72,7 @@ async def login_json(user_login: UserLogin, db = Depends(get_db)):
     """Login with JSON body (for React app)"""
     user = await db.users.find_one({"email": user_login.email})
     
-    if not user or not verify_password(user_login.password, user["hashed_password"]):
+    if not user or not await verify_password_async(user_login.password, user["hashed_password"]):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password"
@@ -72,31 +80,125 @@ async def login_json(user_login: UserLogin, db = Depends(get_db)):
     
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user["email"]}, expires_delta=access_token_expires
+        data={"sub": user["email"], "uid": str(user["_id"])}, expires_delta=access_token_expires
     )
     
     return {"access_token": access_token, "token_type": "bearer"}
 
 
+def _credentials_exception():
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
+def _token_revoked(user: dict, payload: dict) -> bool:
+    valid_after = user.get("tokens_valid_after")
+    return valid_after is not None and payload.get("iat", 0) < valid_after
+
+
+@timed_phase("auth")
 async def get_current_user(token: str = Depends(oauth2_scheme), db = Depends(get_db)):
     """Get current authenticated user"""
-    email = verify_token(token)
-    if email is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Could not validate credentials",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
+    payload = decode_token(token)
+    if payload is None:
+        raise _credentials_exception()
     
-    user = await db.users.find_one({"email": email})
+    user = await db.users.find_one({"email": payload["sub"]})
     if user is None:
         raise HTTPException(status_code=404, detail="User not found")
     
+    if _token_revoked(user, payload):
+        raise _credentials_exception()
+    
     return user
 
 
+@timed_phase("auth")
+async def get_current_principal(token: str = Depends(oauth2_scheme), db = Depends(get_db)):
+    """Get the authenticated user's id and email, cached per token"""
+    payload = decode_token(token)
+    if payload is None:
+        raise _credentials_exception()
+    
+    token_id = payload.get("jti") or token
+    principal = principal_cache.get(token_id)
+    if principal is not None:
+        return principal
+    
+    # First use of this token on this worker: confirm the user still exists
+    # and the token has not been revoked
+    user_id = payload.get("uid")
+    if user_id and ObjectId.is_valid(user_id):
+        query = {"_id": ObjectId(user_id)}
+    else:
+        query = {"email": payload["sub"]}
+    
+    user = await db.users.find_one(query, {"email": 1, "tokens_valid_after": 1})
+    if user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    if _token_revoked(user, payload):
+        raise _credentials_exception()
+    
+    principal = {"_id": str(user["_id"]), "email": user["email"]}
+    principal_cache.set(token_id, principal, expires_at=payload["exp"])
+    return principal
+
+
+async def revoke_user_tokens(db, user_id: str):
+    """Reject every token issued to a user so far (password change, account deletion)"""
+    if ObjectId.is_valid(user_id):
+        await db.users.update_one(
+            {"_id": ObjectId(user_id)},
+            {"$set": {"tokens_valid_after": time.time()}}
+        )
+    principal_cache.invalidate_user(user_id)
+
+
 @router.get("/me", response_model=UserResponse)
 async def get_current_user_info(current_user = Depends(get_current_user)):
     """Get current user information"""
     current_user["_id"] = str(current_user["_id"])
     return current_user
+
+
+@router.put("/password", response_model=Token)
+async def change_password(
+    passwords: PasswordChange,
+    current_user = Depends(get_current_user),
+    db = Depends(get_db)
+):
+    """Change the password, signing out every other session.
+    
+    Returns a fresh token, since the one used for this request is revoked.
+    """
+    if not await verify_password_async(passwords.current_password, current_user["hashed_password"]):
+        raise HTTPException(status_code=400, detail="Current password is incorrect")
+    
+    hashed_password = await get_password_hash_async(passwords.new_password)
+    await db.users.update_one(
+        {"_id": current_user["_id"]},
+        {"$set": {"hashed_password": hashed_password, "updated_at": datetime.utcnow()}}
+    )
+    await revoke_user_tokens(db, str(current_user["_id"]))
+    
+    access_token = create_access_token(
+        data={"sub": current_user["email"], "uid": str(current_user["_id"])},
+        expires_delta=timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    )
+    return {"access_token": access_token, "token_type": "bearer"}
+
+
+@router.delete("/me", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_account(current_user = Depends(get_current_user), db = Depends(get_db)):
+    """Delete the account with its cart and favorites (orders are kept)"""
+    user_id = str(current_user["_id"])
+    await revoke_user_tokens(db, user_id)
+    await db.carts.delete_many({"user_id": user_id})
+    await db.favorites.delete_many({"user_id": user_id})
+    await db.users.delete_one({"_id": current_user["_id"]})
+    cart_summary_cache.invalidate(user_id)
+    return None
@@ -1,39 +1,185 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from typing import Optional
 from app.database import get_db
-from app.schemas.schemas import CartResponse, CartItem
-from app.routes.auth import get_current_user
+from app.instrumentation import TimedRoute
+from app.schemas.schemas import CartExpandedResponse, CartResponse, CartItem
+from app.routes.auth import get_current_principal
+from app.routes.products import check_expand, inline_products
+from app.serialization import render_model
+from app.cache import cart_summary_cache, catalog_cache
+from app.indexes import declare_index, hot_query
 from datetime import datetime
 from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
 
-router = APIRouter(prefix="/cart", tags=["Cart"])
+router = APIRouter(prefix="/cart", tags=["Cart"], route_class=TimedRoute)
+
+declare_index("carts", [("user_id", 1)], unique=True, migration="python dedupe_carts.py")
+hot_query("carts: by user", "carts", {"user_id": "000000000000000000000000"})
+
+
+# Carts are created lazily: reads never write, and a user who has not added
+# anything yet gets an empty cart that is not stored. The first add creates
+# the document (add_cart_item upserts).
+
+EMPTY_SUMMARY = {"count": 0, "total": 0.0}
+SUMMARY_PROJECTION = {"_id": 0, "items.quantity": 1, "total": 1}
+
+
+def _summary(cart) -> dict:
+    """Item count and total of a cart document (None for no cart)"""
+    if not cart:
+        return dict(EMPTY_SUMMARY)
+    return {
+        "count": sum(item.get("quantity", 0) for item in cart.get("items") or []),
+        "total": cart.get("total", 0.0),
+    }
 
 
 @router.get("/", response_model=CartResponse)
-async def get_cart(current_user = Depends(get_current_user), db = Depends(get_db)):
-    """Get user's cart"""
+async def get_cart(
+    expand: Optional[str] = Query(None, description="`products` inlines each item's current product"),
+    current_user = Depends(get_current_principal),
+    db = Depends(get_db)
+):
+    """Get user's cart (an unsaved empty cart, without an id, if there is none yet)"""
+    expand_products = check_expand(expand)
     user_id = str(current_user["_id"])
     cart = await db.carts.find_one({"user_id": user_id})
     
     if not cart:
-        # Create empty cart if doesn't exist
         cart = {
+            "_id": None,
             "user_id": user_id,
             "items": [],
             "total": 0.0,
             "updated_at": datetime.utcnow()
         }
-        result = await db.carts.insert_one(cart)
-        cart["_id"] = str(result.inserted_id)
     else:
         cart["_id"] = str(cart["_id"])
     
+    cart_summary_cache.set(user_id, _summary(cart))
+    if expand_products:
+        await inline_products(db, cart["items"])
+        return render_model(CartExpandedResponse, cart)
     return cart
 
 
+@router.get("/summary")
+async def get_cart_summary(current_user = Depends(get_current_principal), db = Depends(get_db)):
+    """Number of items in the cart and its total, for the cart badge"""
+    user_id = str(current_user["_id"])
+    summary = cart_summary_cache.get(user_id)
+    if summary is None:
+        cart = await db.carts.find_one({"user_id": user_id}, SUMMARY_PROJECTION)
+        summary = _summary(cart)
+        cart_summary_cache.set(user_id, summary)
+    return summary
+
+
+# Cart mutations run as single update pipelines so concurrent requests can
+# never overwrite each other's items, and the total is recomputed from the
+# items inside the same atomic write.
+
+def _cart_total_stage():
+    return {
+        "$set": {
+            "total": {
+                "$sum": {
+                    "$map": {
+                        "input": "$items",
+                        "as": "item",
+                        "in": {"$multiply": ["$$item.price", "$$item.quantity"]}
+                    }
+                }
+            }
+        }
+    }
+
+
+async def add_cart_item(db, user_id: str, item: CartItem) -> float:
+    """Add an item to a user's cart, creating the cart if needed. Returns the new total"""
+    product_id = {"$literal": item.product_id}
+    items = {"$ifNull": ["$items", []]}
+    
+    update = [
+        {
+            "$set": {
+                "items": {
+                    "$cond": {
+                        "if": {"$in": [product_id, {"$ifNull": ["$items.product_id", []]}]},
+                        "then": {
+                            "$map": {
+                                "input": items,
+                                "as": "item",
+                                "in": {
+                                    "$cond": [
+                                        {"$eq": ["$$item.product_id", product_id]},
+                                        {"$mergeObjects": [
+                                            "$$item",
+                                            {"quantity": {"$add": ["$$item.quantity", item.quantity]}}
+                                        ]},
+                                        "$$item"
+                                    ]
+                                }
+                            }
+                        },
+                        "else": {"$concatArrays": [items, [{"$literal": item.dict()}]]}
+                    }
+                },
+                "updated_at": datetime.utcnow()
+            }
+        },
+        _cart_total_stage()
+    ]
+    
+    try:
+        cart = await db.carts.find_one_and_update(
+            {"user_id": user_id}, update,
+            projection=SUMMARY_PROJECTION, upsert=True, return_document=ReturnDocument.AFTER
+        )
+    except DuplicateKeyError:
+        # Another request created the cart first; it now exists, so update it
+        cart = await db.carts.find_one_and_update(
+            {"user_id": user_id}, update,
+            projection=SUMMARY_PROJECTION, return_document=ReturnDocument.AFTER
+        )
+    cart_summary_cache.set(user_id, _summary(cart))
+    return cart["total"]
+
+
+async def remove_cart_item(db, user_id: str, product_id: str) -> Optional[float]:
+    """Remove a product from a user's cart. Returns the new total, or None if there is no cart"""
+    cart = await db.carts.find_one_and_update(
+        {"user_id": user_id},
+        [
+            {
+                "$set": {
+                    "items": {
+                        "$filter": {
+                            "input": {"$ifNull": ["$items", []]},
+                            "as": "item",
+                            "cond": {"$ne": ["$$item.product_id", {"$literal": product_id}]}
+                        }
+                    },
+                    "updated_at": datetime.utcnow()
+                }
+            },
+            _cart_total_stage()
+        ],
+        projection=SUMMARY_PROJECTION,
+        return_document=ReturnDocument.AFTER
+    )
+    summary = _summary(cart)
+    cart_summary_cache.set(user_id, summary)
+    return summary["total"] if cart else None
+
+
 @router.post("/add")
 async def add_to_cart(
     item: CartItem,
-    current_user = Depends(get_current_user),
+    current_user = Depends(get_current_principal),
     db = Depends(get_db)
 ):
     """Add item to cart"""
@@ -43,47 +189,12 @@ async def add_to_cart(
     if not ObjectId.is_valid(item.product_id):
         raise HTTPException(status_code=400, detail="Invalid product ID")
     
-    product = await db.products.find_one({"_id": ObjectId(item.product_id)})
-    if not product:
-        raise HTTPException(status_code=404, detail="Product not found")
-    
-    # Get or create cart
-    cart = await db.carts.find_one({"user_id": user_id})
-    
-    if not cart:
-        cart = {
-            "user_id": user_id,
-            "items": [],
-            "total": 0.0,
-            "updated_at": datetime.utcnow()
-        }
-        await db.carts.insert_one(cart)
-    
-    # Check if item already in cart
-    item_exists = False
-    for cart_item in cart.get("items", []):
-        if cart_item["product_id"] == item.product_id:
-            cart_item["quantity"] += item.quantity
-            item_exists = True
-            break
+    if catalog_cache.get_product(item.product_id) is None:
+        product = await db.products.find_one({"_id": ObjectId(item.product_id)}, {"_id": 1})
+        if not product:
+            raise HTTPException(status_code=404, detail="Product not found")
     
-    if not item_exists:
-        cart.setdefault("items", []).append(item.dict())
-    
-    # Calculate new total
-    total = sum(item["price"] * item["quantity"] for item in cart["items"])
-    
-    # Update cart
-    await db.carts.update_one(
-        {"user_id": user_id},
-        {
-            "$set": {
-                "items": cart["items"],
-                "total": total,
-                "updated_at": datetime.utcnow()
-            }
-        }
-    )
+    total = await add_cart_item(db, user_id, item)
     
     return {"message": "Item added to cart", "total": total}
 
@@ -91,42 +202,25 @@ async def add_to_cart(
 @router.delete("/remove/{product_id}")
 async def remove_from_cart(
     product_id: str,
-    current_user = Depends(get_current_user),
+    current_user = Depends(get_current_principal),
     db = Depends(get_db)
 ):
     """Remove item from cart"""
     user_id = str(current_user["_id"])
     
-    cart = await db.carts.find_one({"user_id": user_id})
-    if not cart:
+    total = await remove_cart_item(db, user_id, product_id)
+    if total is None:
         raise HTTPException(status_code=404, detail="Cart not found")
     
-    # Remove item
-    cart["items"] = [item for item in cart["items"] if item["product_id"] != product_id]
-    
-    # Calculate new total
-    total = sum(item["price"] * item["quantity"] for item in cart["items"])
-    
-    # Update cart
-    await db.carts.update_one(
-        {"user_id": user_id},
-        {
-            "$set": {
-                "items": cart["items"],
-                "total": total,
-                "updated_at": datetime.utcnow()
-            }
-        }
-    )
-    
     return {"message": "Item removed from cart", "total": total}
 
 
 @router.delete("/clear")
-async def clear_cart(current_user = Depends(get_current_user), db = Depends(get_db)):
+async def clear_cart(current_user = Depends(get_current_principal), db = Depends(get_db)):
     """Clear entire cart"""
     user_id = str(current_user["_id"])
     
+    # No upsert: clearing a cart that was never created leaves nothing to store
     await db.carts.update_one(
         {"user_id": user_id},
         {
@@ -137,5 +231,6 @@ async def clear_cart(current_user = Depends(get_current_user), db = Depends(get_
             }
         }
     )
+    cart_summary_cache.set(user_id, dict(EMPTY_SUMMARY))
     
     return {"message": "Cart cleared"}
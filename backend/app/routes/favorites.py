@@ -0,0 +1,133 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import Dict
+from app.database import get_db
+from app.instrumentation import TimedRoute
+from app.schemas.schemas import FavoritesResponse
+from app.routes.auth import get_current_principal
+from app.routes.products import load_products
+from app.cache import catalog_cache
+from app.config import settings
+from app.indexes import declare_index, hot_query
+from datetime import datetime
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+router = APIRouter(prefix="/favorites", tags=["Favorites"], route_class=TimedRoute)
+
+declare_index("favorites", [("user_id", 1)], unique=True)
+hot_query("favorites: by user", "favorites", {"user_id": "000000000000000000000000"})
+
+# Grids render at most this many products at once
+MAX_CHECK_IDS = 100
+
+
+# Each user's favorites are one document holding a set of product ids,
+# changed only with $addToSet/$pull so concurrent requests never lose
+# each other's updates. Like carts, the document is created by the first
+# add. Membership checks read the document (one indexed find_one) rather
+# than a per-worker cache, so every worker sees a change at once.
+
+async def favorite_ids(db, user_id: str) -> frozenset:
+    """The user's favorited product ids"""
+    favorites = await db.favorites.find_one({"user_id": user_id}, {"_id": 0, "product_ids": 1})
+    return frozenset(favorites["product_ids"] if favorites else [])
+
+
+async def add_favorite(db, user_id: str, product_id: str) -> int:
+    """Favorite a product (a no-op if it already is). Returns the new count"""
+    update = {"$addToSet": {"product_ids": product_id}, "$set": {"updated_at": datetime.utcnow()}}
+    # Only matches while there is room, so the limit holds under concurrency
+    full = f"product_ids.{settings.FAVORITES_MAX_ITEMS - 1}"
+    try:
+        favorites = await db.favorites.find_one_and_update(
+            {"user_id": user_id, full: {"$exists": False}}, update,
+            projection={"_id": 0, "product_ids": 1}, upsert=True, return_document=ReturnDocument.AFTER
+        )
+    except DuplicateKeyError:
+        # The document exists but did not match: it is full (or another
+        # request created it first, so retry without the upsert)
+        favorites = await db.favorites.find_one_and_update(
+            {"user_id": user_id, full: {"$exists": False}}, update,
+            projection={"_id": 0, "product_ids": 1}, return_document=ReturnDocument.AFTER
+        )
+        if favorites is None:
+            favorites = await db.favorites.find_one({"user_id": user_id}, {"_id": 0, "product_ids": 1})
+            if product_id not in favorites["product_ids"]:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Favorites are limited to {settings.FAVORITES_MAX_ITEMS} products"
+                )
+
+    return len(favorites["product_ids"])
+
+
+async def remove_favorite(db, user_id: str, product_id: str) -> int:
+    """Unfavorite a product. Returns the new count"""
+    favorites = await db.favorites.find_one_and_update(
+        {"user_id": user_id},
+        {"$pull": {"product_ids": product_id}, "$set": {"updated_at": datetime.utcnow()}},
+        projection={"_id": 0, "product_ids": 1}, return_document=ReturnDocument.AFTER
+    )
+    return len(favorites["product_ids"]) if favorites else 0
+
+
+@router.get("/", response_model=FavoritesResponse)
+async def get_favorites(current_user = Depends(get_current_principal), db = Depends(get_db)):
+    """Get the user's favorites with their product cards"""
+    user_id = str(current_user["_id"])
+    favorites = await db.favorites.find_one({"user_id": user_id})
+
+    if not favorites:
+        favorites = {"_id": None, "user_id": user_id, "product_ids": [], "updated_at": None}
+    else:
+        favorites["_id"] = str(favorites["_id"])
+
+    # $addToSet appends, so the newest favorite is last
+    favorites["products"] = await load_products(db, favorites["product_ids"][::-1])
+    return favorites
+
+
+@router.get("/check", response_model=Dict[str, bool])
+async def check_favorites(
+    ids: str = Query(..., description=f"Comma-separated product ids (up to {MAX_CHECK_IDS})"),
+    current_user = Depends(get_current_principal),
+    db = Depends(get_db)
+):
+    """Which of the given products the user has favorited, for product grids"""
+    product_ids = [product_id for product_id in ids.split(",") if product_id]
+    if len(product_ids) > MAX_CHECK_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_CHECK_IDS} ids can be checked at once")
+
+    favorited = await favorite_ids(db, str(current_user["_id"]))
+    return {product_id: product_id in favorited for product_id in product_ids}
+
+
+@router.post("/{product_id}")
+async def favorite_product(
+    product_id: str,
+    current_user = Depends(get_current_principal),
+    db = Depends(get_db)
+):
+    """Add a product to favorites"""
+    if not ObjectId.is_valid(product_id):
+        raise HTTPException(status_code=400, detail="Invalid product ID")
+
+    if catalog_cache.get_product(product_id) is None:
+        product = await db.products.find_one({"_id": ObjectId(product_id)}, {"_id": 1})
+        if not product:
+            raise HTTPException(status_code=404, detail="Product not found")
+
+    count = await add_favorite(db, str(current_user["_id"]), product_id)
+    return {"message": "Added to favorites", "count": count}
+
+
+@router.delete("/{product_id}")
+async def unfavorite_product(
+    product_id: str,
+    current_user = Depends(get_current_principal),
+    db = Depends(get_db)
+):
+    """Remove a product from favorites"""
+    count = await remove_favorite(db, str(current_user["_id"]), product_id)
+    return {"message": "Removed from favorites", "count": count}
@@ -1,34 +1,85 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from typing import List, Optional
 from app.database import get_db
-from app.schemas.schemas import OrderCreate, OrderResponse
-from app.routes.auth import get_current_user
+from app.instrumentation import TimedRoute
+from app.schemas.schemas import OrderCreate, OrderExpandedResponse, OrderItemCreate, OrderResponse, OrderSummary
+from app.routes.auth import get_current_principal
+from app.routes.products import check_expand, inline_products
+from app.pagination import NEXT_CURSOR_HEADER, keyset_query, keyset_sort, next_cursor
+from app.projections import select_fields
+from app.indexes import declare_index, hot_query
+from app.serialization import render_documents, render_model
+from app.config import settings
+from app.cache import cart_summary_cache
+from app import analytics
+from app import inventory
 from datetime import datetime
 from bson import ObjectId
+from pymongo import DESCENDING, ReturnDocument
 
-router = APIRouter(prefix="/orders", tags=["Orders"])
+router = APIRouter(prefix="/orders", tags=["Orders"], route_class=TimedRoute)
+
+ORDER_VIEWS = {"summary": OrderSummary, "detail": OrderResponse}
+
+declare_index("orders", [("user_id", 1)] + keyset_sort(DESCENDING))
+hot_query("orders: history", "orders", {"user_id": "000000000000000000000000"}, keyset_sort(DESCENDING))
 
 
 @router.get("/", response_model=List[OrderResponse])
-async def get_orders(current_user = Depends(get_current_user), db = Depends(get_db)):
-    """Get all orders for current user"""
+async def get_orders(
+    response: Response,
+    limit: int = Query(100, ge=1, le=100),
+    cursor: Optional[str] = None,
+    view: Optional[str] = None,
+    fields: Optional[str] = None,
+    expand: Optional[str] = Query(None, description="`products` inlines each item's current product"),
+    current_user = Depends(get_current_principal),
+    db = Depends(get_db)
+):
+    """Get orders for current user, newest first.
+    
+    Pass the X-Next-Cursor header of a page as `cursor` to get older orders.
+    `view=summary` or `fields=total,status,...` return only those fields;
+    `expand=products` adds the current product to every line item.
+    """
+    selection = select_fields(OrderResponse, ORDER_VIEWS, view, fields)
+    expand_products = check_expand(expand)
+    if selection and expand_products:
+        raise HTTPException(status_code=400, detail="expand cannot be combined with view or fields")
+    projection = selection.projection if selection else None
+    
     user_id = str(current_user["_id"])
-    cursor = db.orders.find({"user_id": user_id}).sort("created_at", -1)
-    orders = await cursor.to_list(length=100)
+    query = keyset_query({"user_id": user_id}, cursor, DESCENDING)
+    orders = await db.orders.find(query, projection).sort(keyset_sort(DESCENDING)).limit(limit).to_list(length=limit)
+    
+    next_page = next_cursor(orders, limit)
+    headers = {NEXT_CURSOR_HEADER: next_page} if next_page else {}
     
     for order in orders:
         order["_id"] = str(order["_id"])
     
+    if selection:
+        return selection.render(orders, headers)
+    if expand_products:
+        # One lookup for the products of the whole page
+        await inline_products(db, [item for order in orders for item in order["items"]])
+        return render_model(OrderExpandedResponse, orders, headers)
+    if settings.FAST_JSON_RESPONSES:
+        return render_documents(OrderResponse, orders, headers)
+    
+    response.headers.update(headers)
     return orders
 
 
 @router.get("/{order_id}", response_model=OrderResponse)
 async def get_order(
     order_id: str,
-    current_user = Depends(get_current_user),
+    expand: Optional[str] = Query(None, description="`products` inlines each item's current product"),
+    current_user = Depends(get_current_principal),
     db = Depends(get_db)
 ):
     """Get specific order"""
+    expand_products = check_expand(expand)
     if not ObjectId.is_valid(order_id):
         raise HTTPException(status_code=400, detail="Invalid order ID")
     
@@ -42,46 +93,165 @@ async def get_order(
         raise HTTPException(status_code=404, detail="Order not found")
     
     order["_id"] = str(order["_id"])
+    if expand_products:
+        await inline_products(db, order["items"])
+        return render_model(OrderExpandedResponse, order)
     return order
 
 
-@router.post("/", response_model=OrderResponse, status_code=status.HTTP_201_CREATED)
-async def create_order(
-    order_data: OrderCreate,
-    current_user = Depends(get_current_user),
-    db = Depends(get_db)
-):
-    """Create a new order"""
-    user_id = str(current_user["_id"])
+# Order placement
+#
+# Prices and names come from the products collection, never the client.
+# Stock is taken by an inventory reservation (app.inventory) before the
+# order is written, so a product can never go below zero and hot SKUs with
+# sharded stock go through the same path. Confirming the reservation,
+# inserting the order and clearing the cart commit in one transaction on
+# replica sets and sharded clusters; if placing the order fails, a
+# reservation made for it is released again.
+
+TRANSACTIONAL_TOPOLOGIES = {"ReplicaSetWithPrimary", "Sharded", "LoadBalanced"}
+
+
+def supports_transactions(client) -> bool:
+    if settings.ORDER_TRANSACTIONS == "auto":
+        return client.topology_description.topology_type_name in TRANSACTIONAL_TOPOLOGIES
+    return settings.ORDER_TRANSACTIONS == "always"
+
+
+async def price_order_items(db, items: List[OrderItemCreate]):
+    """Server-side priced order lines (duplicates merged) and their total"""
+    quantities = {}
+    for item in items:
+        if not ObjectId.is_valid(item.product_id):
+            raise HTTPException(status_code=400, detail=f"Invalid product ID: {item.product_id}")
+        if item.quantity < 1:
+            raise HTTPException(status_code=400, detail="Quantity must be at least 1")
+        quantities[item.product_id] = quantities.get(item.product_id, 0) + item.quantity
     
-    # Calculate total
-    total = sum(item.price * item.quantity for item in order_data.items)
+    if not quantities:
+        raise HTTPException(status_code=400, detail="Order has no items")
     
-    # Create order
-    order = {
+    cursor = db.products.find(
+        {"_id": {"$in": [ObjectId(pid) for pid in quantities]}},
+        {"name": 1, "price": 1, "category": 1}
+    )
+    products = {str(product["_id"]): product async for product in cursor}
+    
+    missing = [pid for pid in quantities if pid not in products]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Products not found: {missing}")
+    
+    lines = [
+        {
+            "product_id": pid,
+            "product_name": products[pid]["name"],
+            "quantity": quantity,
+            "price": products[pid]["price"],
+            # Kept for sales rollups (app.analytics)
+            "category": products[pid].get("category"),
+        }
+        for pid, quantity in quantities.items()
+    ]
+    total = sum(line["price"] * line["quantity"] for line in lines)
+    return lines, total
+
+
+def _new_order(user_id: str, lines, total: float, shipping_address: str, reservation_id) -> dict:
+    return {
         "user_id": user_id,
-        "items": [item.dict() for item in order_data.items],
+        "items": lines,
         "total": total,
         "status": "pending",
-        "shipping_address": order_data.shipping_address,
+        "shipping_address": shipping_address,
+        "reservation_id": str(reservation_id),
         "created_at": datetime.utcnow()
     }
+
+
+def _clear_cart_update():
+    return {"$set": {"items": [], "total": 0.0, "updated_at": datetime.utcnow()}}
+
+
+async def _place_order_in_transaction(db, user_id, lines, total, shipping_address, reservation_id) -> dict:
+    async def place(session):
+        await inventory.confirm(db, reservation_id, user_id, session=session)
+        order = _new_order(user_id, lines, total, shipping_address, reservation_id)
+        await db.orders.insert_one(order, session=session)
+        await db.carts.update_one({"user_id": user_id}, _clear_cart_update(), session=session)
+        return order
     
-    result = await db.orders.insert_one(order)
-    order["_id"] = str(result.inserted_id)
+    async with await db.client.start_session() as session:
+        return await session.with_transaction(place)
+
+
+async def _place_order_standalone(db, user_id, lines, total, shipping_address, reservation_id) -> dict:
+    # The hold is confirmed only once the order is stored: if the insert
+    # fails the stock is still held and can be released, and if the hold
+    # expired meanwhile the order is taken back out
+    order = _new_order(user_id, lines, total, shipping_address, reservation_id)
+    await db.orders.insert_one(order)
+    try:
+        await inventory.confirm(db, reservation_id, user_id)
+    except BaseException:
+        await db.orders.delete_one({"_id": order["_id"]})
+        raise
+    await db.carts.update_one({"user_id": user_id}, _clear_cart_update())
+    return order
+
+
+async def place_order(db, user_id: str, lines, total: float, shipping_address: str,
+                      reservation_id=None) -> dict:
+    """Confirm (or reserve and confirm) stock, insert the order and clear the cart"""
+    reserved_here = reservation_id is None
+    if reserved_here:
+        reservation = await inventory.reserve(db, user_id, lines)
+        reservation_id = reservation["_id"]
     
-    # Clear cart after order
-    await db.carts.update_one(
-        {"user_id": user_id},
-        {
-            "$set": {
-                "items": [],
-                "total": 0.0,
-                "updated_at": datetime.utcnow()
-            }
-        }
+    try:
+        if supports_transactions(db.client):
+            order = await _place_order_in_transaction(db, user_id, lines, total, shipping_address, reservation_id)
+        else:
+            order = await _place_order_standalone(db, user_id, lines, total, shipping_address, reservation_id)
+    except Exception:
+        if reserved_here:
+            await inventory.release(db, reservation_id)
+        raise
+    
+    # The cart was cleared with the order
+    cart_summary_cache.invalidate(user_id)
+    return order
+
+
+@router.post("/", response_model=OrderResponse, status_code=status.HTTP_201_CREATED)
+async def create_order(
+    order_data: OrderCreate,
+    current_user = Depends(get_current_principal),
+    db = Depends(get_db)
+):
+    """Create a new order, priced from the current catalog.
+    
+    With `reservation_id` the order is placed from that held reservation
+    (see /reservations) and `items` is ignored; otherwise stock for `items`
+    is reserved and confirmed in one go.
+    """
+    user_id = str(current_user["_id"])
+    
+    items = order_data.items
+    if order_data.reservation_id:
+        reservation = await inventory.get_reservation(db, order_data.reservation_id, user_id)
+        items = [
+            OrderItemCreate(product_id=line["product_id"], quantity=line["quantity"])
+            for line in reservation["lines"]
+        ]
+    
+    lines, total = await price_order_items(db, items)
+    order = await place_order(
+        db, user_id, lines, total, order_data.shipping_address,
+        reservation_id=order_data.reservation_id
     )
+    await analytics.record_order(db, order)
     
+    order["_id"] = str(order["_id"])
     return order
 
 
@@ -89,7 +259,7 @@ async def create_order(
 async def update_order_status(
     order_id: str,
     status: str,
-    current_user = Depends(get_current_user),
+    current_user = Depends(get_current_principal),
     db = Depends(get_db)
 ):
     """Update order status"""
@@ -100,12 +270,18 @@ async def update_order_status(
     if status not in valid_statuses:
         raise HTTPException(status_code=400, detail=f"Invalid status. Must be one of: {valid_statuses}")
     
-    result = await db.orders.update_one(
+    # The previous status comes back with the same atomic update, so the
+    # rollups move the order from the right status even under concurrency
+    before = await db.orders.find_one_and_update(
         {"_id": ObjectId(order_id)},
-        {"$set": {"status": status}}
+        {"$set": {"status": status}},
+        projection={"status": 1, "created_at": 1, "items": 1},
+        return_document=ReturnDocument.BEFORE
     )
     
-    if result.matched_count == 0:
+    if before is None:
         raise HTTPException(status_code=404, detail="Order not found")
     
+    await analytics.record_status_change(db, before, status)
+    
     return {"message": "Order status updated", "status": status}
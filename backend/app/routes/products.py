@@ -1,46 +1,308 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from typing import Dict, List, Optional
 from app.database import get_db
-from app.schemas.schemas import ProductCreate, ProductUpdate, ProductResponse
+from app.instrumentation import TimedRoute
+from app.schemas.schemas import (
+    ProductBatchRequest, ProductBatchResponse, ProductCard, ProductCreate, ProductResponse, ProductUpdate,
+    RecommendationsResponse, StockShardsUpdate,
+)
 from app.routes.auth import get_current_user
+from app.cache import catalog_cache
+from app.search import catalog_search
+from app.pagination import NEXT_CURSOR_HEADER, keyset_query, keyset_sort, next_cursor
+from app.projections import select_fields
+from app.indexes import declare_index, hot_query
+from app.serialization import render_documents
+from app.config import settings
+from app.http_cache import CatalogValidators, bump_catalog_version, catalog_http_cache
+from app.recommendations import recommendations
+from app import browse
+from app import inventory
+from app import bulk
 from datetime import datetime
 from bson import ObjectId
 
-router = APIRouter(prefix="/products", tags=["Products"])
+router = APIRouter(prefix="/products", tags=["Products"], route_class=TimedRoute)
+
+PRODUCT_VIEWS = {"card": ProductCard, "detail": ProductResponse}
+
+declare_index("products", keyset_sort())
+declare_index("products", [("category", 1)] + keyset_sort())
+hot_query("products: list", "products", {}, keyset_sort())
+hot_query("products: list by category", "products", {"category": "Running"}, keyset_sort())
 
 
 @router.get("/", response_model=List[ProductResponse])
 async def get_products(
+    response: Response,
     skip: int = 0,
-    limit: int = 100,
+    limit: int = Query(100, ge=1, le=500),
     category: str = None,
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    in_stock: bool = False,
+    sort: str = "created",
+    cursor: Optional[str] = None,
+    view: Optional[str] = None,
+    fields: Optional[str] = None,
+    http_cache: CatalogValidators = Depends(catalog_http_cache),
     db = Depends(get_db)
 ):
-    """Get all products with optional filtering"""
-    query = {}
-    if category:
-        query["category"] = category
+    """Get all products with optional filtering.
+    
+    Filter by `category`, `min_price`/`max_price` and `in_stock`, and sort
+    by `created` (default), `newest`, `price_asc` or `price_desc`.
+    Pass the X-Next-Cursor header of a page as `cursor` to get the next one
+    (with the same sort); `skip` is only honoured without a cursor.
+    `view=card` or `fields=name,price,...` return only those fields.
+    """
+    if http_cache.fresh:
+        return http_cache.not_modified()
+    sort_field, direction = browse.resolve_sort(sort)
+    selection = select_fields(ProductResponse, PRODUCT_VIEWS, view, fields)
+    projection = {**selection.projection, sort_field: 1} if selection else None
     
-    cursor = db.products.find(query).skip(skip).limit(limit)
-    products = await cursor.to_list(length=limit)
+    params = (skip, limit, category, min_price, max_price, in_stock, sort, cursor,
+              selection.model if selection else None)
+    cached = catalog_cache.get_list(params)
+    if cached is None:
+        generation = catalog_cache.generation
+        query = browse.catalog_filter(category, min_price, max_price, in_stock)
+        order = keyset_sort(direction, sort_field)
+        
+        cursor_query = db.products.find(keyset_query(query, cursor, direction, sort_field), projection).sort(order)
+        if skip and not cursor:
+            cursor_query = cursor_query.skip(skip)
+        products = await cursor_query.limit(limit).to_list(length=limit)
+        
+        cached = (products, next_cursor(products, limit, sort_field))
+        for product in products:
+            product["_id"] = str(product["_id"])
+        
+        catalog_cache.set_list(params, cached, generation)
     
-    for product in products:
-        product["_id"] = str(product["_id"])
+    products, next_page = cached
+    headers = dict(http_cache.headers)
+    if next_page:
+        headers[NEXT_CURSOR_HEADER] = next_page
+    if selection:
+        return selection.render(products, headers)
+    if settings.FAST_JSON_RESPONSES:
+        return render_documents(ProductResponse, products, headers)
     
+    response.headers.update(headers)
+    return products
+
+
+@router.get("/facets")
+async def get_product_facets(
+    category: Optional[str] = None,
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    in_stock: bool = False,
+    http_cache: CatalogValidators = Depends(catalog_http_cache),
+    db = Depends(get_db)
+):
+    """Product counts per category and per price bucket for the given filters.
+    
+    Category counts ignore `category` and price bucket counts ignore the
+    price range, so they show what choosing another value would return.
+    """
+    if http_cache.fresh:
+        return http_cache.not_modified()
+    return await browse.facet_counts(db, category, min_price, max_price, in_stock)
+
+
+@router.get("/cache/stats")
+async def get_catalog_cache_stats():
+    """Catalog cache hit/miss/eviction counters"""
+    return catalog_cache.stats()
+
+
+@router.get("/export")
+async def export_products(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    category: Optional[str] = None,
+    db = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """Stream the whole catalog as NDJSON or CSV (admin only)"""
+    query = {"category": category} if category else {}
+    return StreamingResponse(
+        bulk.export_products(db, format, query),
+        media_type=bulk.FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="products.{format}"'}
+    )
+
+
+@router.post("/bulk")
+async def import_products(
+    request: Request,
+    format: Optional[str] = Query(None, pattern="^(ndjson|csv)$"),
+    db = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """Upsert products from an NDJSON or CSV request body of any size (admin only).
+    
+    Rows are matched by `sku`, then `_id`; others are inserted. Invalid
+    rows are skipped and listed in the report with their row number.
+    """
+    fmt = format or bulk.format_from_content_type(request.headers.get("content-type", ""))
+    if fmt is None:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Send application/x-ndjson or text/csv, or pass ?format="
+        )
+    
+    report = await bulk.import_products(db, bulk.iter_lines(request.stream()), fmt)
+    if report.inserted or report.updated:
+        await bump_catalog_version(db)
+        catalog_cache.clear()
+    return report.as_dict()
+
+
+# Batch lookups
+#
+# Cart, order and favorites pages only hold product ids. These resolve any
+# number of ids with catalog cache hits plus one `$in` query for the rest,
+# instead of a request and a find_one per product.
+
+MAX_BATCH_IDS = 500
+
+
+async def find_products(db, product_ids: List[str]) -> Dict[str, dict]:
+    """Products by id for `product_ids`; unknown and invalid ids are left out.
+    
+    Served from the catalog cache where possible; the rest come from one
+    `$in` query and are cached for next time.
+    """
+    found = {}
+    missing = []
+    for product_id in dict.fromkeys(product_ids):
+        product = catalog_cache.get_product(product_id)
+        if product is not None:
+            found[product_id] = product
+        elif ObjectId.is_valid(product_id):
+            missing.append(ObjectId(product_id))
+    
+    if missing:
+        generation = catalog_cache.generation
+        async for product in db.products.find({"_id": {"$in": missing}}):
+            product["_id"] = str(product["_id"])
+            catalog_cache.set_product(product["_id"], product, generation)
+            found[product["_id"]] = product
+    
+    return found
+
+
+async def load_products(db, product_ids: List[str]) -> List[dict]:
+    """Products for `product_ids`, in that order, skipping unknown ids"""
+    found = await find_products(db, product_ids)
+    return [found[product_id] for product_id in product_ids if product_id in found]
+
+
+async def inline_products(db, items: List[dict]):
+    """Set each item's `product` to the current product (None if it is gone)"""
+    found = await find_products(db, [item["product_id"] for item in items])
+    for item in items:
+        item["product"] = found.get(item["product_id"])
+
+
+def check_expand(expand: Optional[str]) -> bool:
+    """Whether ?expand=products was asked for"""
+    if expand is None:
+        return False
+    if expand != "products":
+        raise HTTPException(status_code=400, detail="Invalid expand. Must be one of: ['products']")
+    return True
+
+
+async def _batch(db, product_ids: List[str]) -> dict:
+    product_ids = list(dict.fromkeys(product_ids))
+    if len(product_ids) > MAX_BATCH_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_IDS} ids can be fetched at once")
+    
+    found = await find_products(db, product_ids)
+    return {
+        "products": [found[product_id] for product_id in product_ids if product_id in found],
+        "missing": [product_id for product_id in product_ids if product_id not in found],
+    }
+
+
+@router.get("/batch", response_model=ProductBatchResponse)
+async def get_products_batch(
+    ids: str = Query(..., description=f"Comma-separated product ids (up to {MAX_BATCH_IDS})"),
+    http_cache: CatalogValidators = Depends(catalog_http_cache),
+    db = Depends(get_db)
+):
+    """Get several products by ID in one request.
+    
+    Products come back in the order asked for (duplicates once); ids that
+    are invalid or do not exist are listed in `missing`.
+    """
+    if http_cache.fresh:
+        return http_cache.not_modified()
+    return await _batch(db, [product_id for product_id in ids.split(",") if product_id])
+
+
+@router.post("/batch", response_model=ProductBatchResponse)
+async def post_products_batch(batch: ProductBatchRequest, db = Depends(get_db)):
+    """Same as GET /products/batch, for id lists too long for a URL"""
+    return await _batch(db, batch.ids)
+
+
+# Declared before the /{product_id}/... routes, which would otherwise take
+# searches for their own names (/search/stock is not product "search")
+@router.get("/search/{query}")
+async def search_products(
+    query: str,
+    response: Response,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=100),
+    view: Optional[str] = None,
+    fields: Optional[str] = None,
+    http_cache: CatalogValidators = Depends(catalog_http_cache),
+    db = Depends(get_db)
+):
+    """Search products by name, description or category, best matches first"""
+    if http_cache.fresh:
+        return http_cache.not_modified()
+    selection = select_fields(ProductResponse, PRODUCT_VIEWS, view, fields)
+    total, products = await catalog_search.search(db, query, skip=skip, limit=limit)
+    headers = {**http_cache.headers, "X-Total-Count": str(total)}
+    if selection:
+        return selection.render(products, headers)
+    if settings.FAST_JSON_RESPONSES:
+        return render_documents(ProductResponse, products, headers)
+    
+    response.headers.update(headers)
     return products
 
 
 @router.get("/{product_id}", response_model=ProductResponse)
-async def get_product(product_id: str, db = Depends(get_db)):
+async def get_product(
+    product_id: str,
+    http_cache: CatalogValidators = Depends(catalog_http_cache),
+    db = Depends(get_db)
+):
     """Get a single product by ID"""
     if not ObjectId.is_valid(product_id):
         raise HTTPException(status_code=400, detail="Invalid product ID")
+    if http_cache.fresh:
+        return http_cache.not_modified()
+    
+    cached = catalog_cache.get_product(product_id)
+    if cached is not None:
+        return cached
     
+    generation = catalog_cache.generation
     product = await db.products.find_one({"_id": ObjectId(product_id)})
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
     
     product["_id"] = str(product["_id"])
+    catalog_cache.set_product(product_id, product, generation)
     return product
 
 
@@ -56,6 +318,8 @@ async def create_product(
     
     result = await db.products.insert_one(product_dict)
     product_dict["_id"] = str(result.inserted_id)
+    await bump_catalog_version(db)
+    catalog_cache.invalidate_product(product_dict["_id"])
     
     return product_dict
 
@@ -76,14 +340,23 @@ async def update_product(
     if not update_data:
         raise HTTPException(status_code=400, detail="No data to update")
     
-    result = await db.products.update_one(
-        {"_id": ObjectId(product_id)},
-        {"$set": update_data}
-    )
+    query = {"_id": ObjectId(product_id)}
+    if "stock" in update_data:
+        # Sharded stock lives in the shards; set it through /stock/shards
+        query["stock_shards"] = {"$exists": False}
+    result = await db.products.update_one(query, {"$set": update_data})
     
     if result.matched_count == 0:
+        if "stock" in update_data and await db.products.count_documents({"_id": ObjectId(product_id)}, limit=1):
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Product stock is sharded; merge its shards before setting stock"
+            )
         raise HTTPException(status_code=404, detail="Product not found")
     
+    await bump_catalog_version(db)
+    catalog_cache.invalidate_product(product_id)
+    
     updated_product = await db.products.find_one({"_id": ObjectId(product_id)})
     updated_product["_id"] = str(updated_product["_id"])
     
@@ -105,23 +378,62 @@ async def delete_product(
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Product not found")
     
+    await bump_catalog_version(db)
+    catalog_cache.invalidate_product(product_id)
     return None
 
 
-@router.get("/search/{query}")
-async def search_products(query: str, db = Depends(get_db)):
-    """Search products by name or description"""
-    cursor = db.products.find({
-        "$or": [
-            {"name": {"$regex": query, "$options": "i"}},
-            {"description": {"$regex": query, "$options": "i"}},
-            {"category": {"$regex": query, "$options": "i"}}
-        ]
-    })
+@router.get("/{product_id}/stock")
+async def get_product_stock(product_id: str, db = Depends(get_db)):
+    """Live available stock, per shard for hot SKUs"""
+    if not ObjectId.is_valid(product_id):
+        raise HTTPException(status_code=400, detail="Invalid product ID")
+    
+    return await inventory.stock_level(db, product_id)
+
+
+@router.put("/{product_id}/stock/shards")
+async def set_product_stock_shards(
+    product_id: str,
+    shards: StockShardsUpdate,
+    db = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """Split a hot SKU's stock over several counters, or merge it back with 0 (admin only).
+    
+    While a product is sharded its `stock` field reads 0 and product updates
+    that set it are rejected; merge it back before restocking.
+    """
+    if not ObjectId.is_valid(product_id):
+        raise HTTPException(status_code=400, detail="Invalid product ID")
     
-    products = await cursor.to_list(length=100)
+    stock = await inventory.set_stock_shards(db, product_id, shards.count)
+    await bump_catalog_version(db)
+    catalog_cache.invalidate_product(product_id)
+    return stock
+
+
+@router.get("/{product_id}/recommendations", response_model=RecommendationsResponse)
+async def get_product_recommendations(
+    product_id: str,
+    limit: int = Query(10, ge=1, le=settings.RECOMMENDATIONS_TOP_K),
+    expand: Optional[str] = Query(None, description="'products' to include the product cards"),
+    db = Depends(get_db)
+):
+    """Products most often bought together with this one.
     
-    for product in products:
-        product["_id"] = str(product["_id"])
+    Served from the precomputed snapshot (see app.recommendations), so no
+    database query is made unless products are expanded. Products without
+    enough orders yet get an empty list.
+    """
+    if not ObjectId.is_valid(product_id):
+        raise HTTPException(status_code=400, detail="Invalid product ID")
     
-    return products
+    recommended = recommendations.recommend(product_id, limit)
+    result = {"product_id": product_id, "recommendations": recommended}
+    if check_expand(expand):
+        found = await find_products(db, [item["product_id"] for item in recommended])
+        # The snapshot can name products deleted since it was built
+        result["recommendations"] = [item for item in recommended if item["product_id"] in found]
+        result["products"] = [found[item["product_id"]] for item in result["recommendations"]]
+    return result
@@ -0,0 +1,67 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from app.database import get_db
+from app.instrumentation import TimedRoute
+from app.schemas.schemas import (
+    OrderCreate, OrderResponse, ReservationConfirm, ReservationCreate, ReservationResponse
+)
+from app.routes.auth import get_current_principal
+from app.routes.orders import create_order, price_order_items
+from app import inventory
+
+router = APIRouter(prefix="/reservations", tags=["Reservations"], route_class=TimedRoute)
+
+
+@router.post("/", response_model=ReservationResponse, status_code=status.HTTP_201_CREATED)
+async def create_reservation(
+    reservation_data: ReservationCreate,
+    current_user = Depends(get_current_principal),
+    db = Depends(get_db)
+):
+    """Hold stock for the given items until the reservation expires"""
+    user_id = str(current_user["_id"])
+
+    lines, _ = await price_order_items(db, reservation_data.items)
+    reservation = await inventory.reserve(db, user_id, lines)
+
+    reservation["_id"] = str(reservation["_id"])
+    return reservation
+
+
+@router.get("/{reservation_id}", response_model=ReservationResponse)
+async def get_reservation(
+    reservation_id: str,
+    current_user = Depends(get_current_principal),
+    db = Depends(get_db)
+):
+    """Get a reservation of the current user"""
+    reservation = await inventory.get_reservation(db, reservation_id, str(current_user["_id"]))
+    reservation["_id"] = str(reservation["_id"])
+    return reservation
+
+
+@router.post("/{reservation_id}/confirm", response_model=OrderResponse, status_code=status.HTTP_201_CREATED)
+async def confirm_reservation(
+    reservation_id: str,
+    confirm_data: ReservationConfirm,
+    current_user = Depends(get_current_principal),
+    db = Depends(get_db)
+):
+    """Place an order from a held reservation"""
+    order_data = OrderCreate(shipping_address=confirm_data.shipping_address, reservation_id=reservation_id)
+    return await create_order(order_data, current_user, db)
+
+
+@router.post("/{reservation_id}/release")
+async def release_reservation(
+    reservation_id: str,
+    current_user = Depends(get_current_principal),
+    db = Depends(get_db)
+):
+    """Give the held stock back"""
+    user_id = str(current_user["_id"])
+    await inventory.get_reservation(db, reservation_id, user_id)
+
+    if not await inventory.release(db, reservation_id, user_id):
+        raise HTTPException(status_code=status.HTTP_410_GONE, detail="Reservation is no longer held")
+
+    return {"message": "Reservation released"}
@@ -49,6 +49,11 @@ class UserResponse(UserBase):
         json_encoders = {ObjectId: str}
 
 
+class PasswordChange(BaseModel):
+    current_password: str
+    new_password: str
+
+
 class Token(BaseModel):
     access_token: str
     token_type: str
@@ -66,6 +71,7 @@ class ProductBase(BaseModel):
     category: str
     image_url: Optional[str] = None
     stock: int = 0
+    sku: Optional[str] = None
     
 
 class ProductCreate(ProductBase):
@@ -79,6 +85,7 @@ class ProductUpdate(BaseModel):
     category: Optional[str] = None
     image_url: Optional[str] = None
     stock: Optional[int] = None
+    sku: Optional[str] = None
 
 
 class ProductResponse(ProductBase):
@@ -90,6 +97,42 @@ class ProductResponse(ProductBase):
         json_encoders = {ObjectId: str}
 
 
+class ProductCard(BaseModel):
+    """Slim product view for catalog grids"""
+    id: str = Field(alias="_id")
+    name: str
+    price: float
+    category: str
+    image_url: Optional[str] = None
+    
+    class Config:
+        populate_by_name = True
+
+
+class ProductBatchRequest(BaseModel):
+    ids: List[str]
+
+
+class ProductBatchResponse(BaseModel):
+    products: List[ProductResponse]
+    missing: List[str] = []
+
+
+class Recommendation(BaseModel):
+    product_id: str
+    # Orders containing both products
+    orders: int
+    # Share of the viewed product's orders that also contain this one
+    confidence: float
+
+
+class RecommendationsResponse(BaseModel):
+    product_id: str
+    recommendations: List[Recommendation]
+    # With ?expand=products, in the same order (deleted products left out)
+    products: Optional[List[ProductCard]] = None
+
+
 # Cart Schemas
 class CartItem(BaseModel):
     product_id: str
@@ -97,6 +140,11 @@ class CartItem(BaseModel):
     price: float
 
 
+class CartLine(CartItem):
+    """Cart item with the current product inlined (?expand=products)"""
+    product: Optional[ProductCard] = None
+
+
 class CartBase(BaseModel):
     user_id: str
     items: List[CartItem] = []
@@ -104,7 +152,8 @@ class CartBase(BaseModel):
 
 
 class CartResponse(CartBase):
-    id: str = Field(alias="_id")
+    # None until the first item is added (carts are created lazily)
+    id: Optional[str] = Field(None, alias="_id")
     updated_at: datetime
     
     class Config:
@@ -112,6 +161,10 @@ class CartResponse(CartBase):
         json_encoders = {ObjectId: str}
 
 
+class CartExpandedResponse(CartResponse):
+    items: List[CartLine] = []
+
+
 # Order Schemas
 class OrderItem(BaseModel):
     product_id: str
@@ -120,6 +173,11 @@ class OrderItem(BaseModel):
     price: float
 
 
+class OrderLine(OrderItem):
+    """Order item with the current product inlined (?expand=products)"""
+    product: Optional[ProductCard] = None
+
+
 class OrderBase(BaseModel):
     user_id: str
     items: List[OrderItem]
@@ -128,9 +186,18 @@ class OrderBase(BaseModel):
     shipping_address: Optional[str] = None
 
 
+class OrderItemCreate(BaseModel):
+    product_id: str
+    quantity: int = 1
+    # Accepted for compatibility; orders are priced from the catalog
+    product_name: Optional[str] = None
+    price: Optional[float] = None
+
+
 class OrderCreate(BaseModel):
-    items: List[OrderItem]
+    items: List[OrderItemCreate] = []
     shipping_address: str
+    reservation_id: Optional[str] = None
 
 
 class OrderResponse(OrderBase):
@@ -142,6 +209,51 @@ class OrderResponse(OrderBase):
         json_encoders = {ObjectId: str}
 
 
+class OrderExpandedResponse(OrderResponse):
+    items: List[OrderLine]
+
+
+class OrderSummary(BaseModel):
+    """Order history view without line items"""
+    id: str = Field(alias="_id")
+    total: float
+    status: str
+    shipping_address: Optional[str] = None
+    created_at: datetime
+    
+    class Config:
+        populate_by_name = True
+
+
+# Reservation Schemas
+class ReservationCreate(BaseModel):
+    items: List[OrderItemCreate]
+
+
+class ReservationConfirm(BaseModel):
+    shipping_address: str
+
+
+class ReservationLine(BaseModel):
+    product_id: str
+    quantity: int
+
+
+class ReservationResponse(BaseModel):
+    id: str = Field(alias="_id")
+    status: str  # pending, held, confirmed, released
+    lines: List[ReservationLine]
+    created_at: datetime
+    expires_at: datetime
+    
+    class Config:
+        populate_by_name = True
+
+
+class StockShardsUpdate(BaseModel):
+    count: int = Field(ge=0, le=64)
+
+
 # Favorites Schema
 class FavoritesBase(BaseModel):
     user_id: str
@@ -149,8 +261,11 @@ class FavoritesBase(BaseModel):
 
 
 class FavoritesResponse(FavoritesBase):
-    id: str = Field(alias="_id")
-    updated_at: datetime
+    # None until the first product is favorited
+    id: Optional[str] = Field(None, alias="_id")
+    updated_at: Optional[datetime] = None
+    # Most recently favorited first; deleted products are left out
+    products: List[ProductCard] = []
     
     class Config:
         populate_by_name = True
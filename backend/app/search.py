@@ -0,0 +1,321 @@
+"""
+In-process full-text search over the product catalog
+"""
+import asyncio
+import bisect
+import heapq
+import math
+import re
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Set, Tuple
+
+from bson import ObjectId
+
+from app.cache import catalog_cache
+from app.config import settings
+
+# How much a hit in each field counts towards a product's score
+FIELD_WEIGHTS = {"name": 3.0, "category": 2.0, "description": 1.0}
+
+# How much each kind of term match counts, relative to an exact match
+PREFIX_MATCH_WEIGHT = 0.7
+FUZZY_MATCH_WEIGHT = 0.5
+MAX_PREFIX_EXPANSIONS = 50
+
+# Products tokenized per worker-thread call during a rebuild
+REBUILD_BATCH_SIZE = 1000
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase alphanumeric tokens of a string"""
+    return _TOKEN_RE.findall(text.lower()) if text else []
+
+
+def _trigrams(token: str) -> Set[str]:
+    padded = f"${token}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _max_typos(token: str) -> int:
+    if len(token) < 4:
+        return 0
+    if len(token) < 8:
+        return 1
+    return 2
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Levenshtein distance, or limit + 1 once it is known to exceed limit"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (ca != cb),
+            ))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+class SearchIndex:
+    """Inverted index of product tokens with prefix and typo-tolerant lookup"""
+
+    def __init__(self):
+        self._products: Dict[str, dict] = {}
+        self._doc_tokens: Dict[str, Dict[str, float]] = {}
+        self._postings: Dict[str, Dict[str, float]] = defaultdict(dict)
+        self._vocabulary: List[str] = []
+        self._trigram_index: Dict[str, Set[str]] = defaultdict(set)
+
+    def __len__(self):
+        return len(self._products)
+
+    # Maintenance
+
+    def clear(self):
+        self.__init__()
+
+    def upsert(self, product: dict):
+        """Index a product (with a string _id), replacing any previous version"""
+        product_id = product["_id"]
+        self.remove(product_id)
+
+        weights: Dict[str, float] = defaultdict(float)
+        for field, field_weight in FIELD_WEIGHTS.items():
+            for token in tokenize(str(product.get(field) or "")):
+                weights[token] += field_weight
+
+        self._products[product_id] = product
+        self._doc_tokens[product_id] = weights
+        for token, weight in weights.items():
+            postings = self._postings[token]
+            if not postings:
+                self._add_to_vocabulary(token)
+            postings[product_id] = weight
+
+    def upsert_many(self, products: List[dict]):
+        for product in products:
+            self.upsert(product)
+
+    def remove(self, product_id: str):
+        weights = self._doc_tokens.pop(product_id, None)
+        self._products.pop(product_id, None)
+        if not weights:
+            return
+        for token in weights:
+            postings = self._postings.get(token)
+            if postings is None:
+                continue
+            postings.pop(product_id, None)
+            if not postings:
+                del self._postings[token]
+                self._remove_from_vocabulary(token)
+
+    def _add_to_vocabulary(self, token: str):
+        bisect.insort(self._vocabulary, token)
+        for gram in _trigrams(token):
+            self._trigram_index[gram].add(token)
+
+    def _remove_from_vocabulary(self, token: str):
+        index = bisect.bisect_left(self._vocabulary, token)
+        if index < len(self._vocabulary) and self._vocabulary[index] == token:
+            del self._vocabulary[index]
+        for gram in _trigrams(token):
+            tokens = self._trigram_index.get(gram)
+            if tokens is not None:
+                tokens.discard(token)
+                if not tokens:
+                    del self._trigram_index[gram]
+
+    # Lookup
+
+    def _expand(self, term: str) -> List[Tuple[str, float]]:
+        """Index tokens a query term matches, with their match weight"""
+        matches = []
+        if term in self._postings:
+            matches.append((term, 1.0))
+
+        start = bisect.bisect_left(self._vocabulary, term)
+        for token in self._vocabulary[start:start + MAX_PREFIX_EXPANSIONS + 1]:
+            if not token.startswith(term):
+                break
+            if token != term:
+                matches.append((token, PREFIX_MATCH_WEIGHT))
+        if matches:
+            return matches
+
+        limit = _max_typos(term)
+        if limit == 0:
+            return matches
+        candidates: Set[str] = set()
+        for gram in _trigrams(term):
+            candidates.update(self._trigram_index.get(gram, ()))
+        for token in candidates:
+            if edit_distance(term, token, limit) <= limit:
+                matches.append((token, FUZZY_MATCH_WEIGHT))
+        return matches
+
+    def search(self, query: str, skip: int = 0, limit: int = 20) -> Tuple[int, List[dict]]:
+        """Ranked products matching every query term. Returns (total, page)"""
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return 0, []
+
+        total_docs = len(self._products) or 1
+        scores: Optional[Dict[str, float]] = None
+        for term in terms:
+            term_scores: Dict[str, float] = {}
+            for token, match_weight in self._expand(term):
+                postings = self._postings[token]
+                idf = math.log(1 + total_docs / len(postings))
+                for product_id, field_weight in postings.items():
+                    score = field_weight * match_weight * idf
+                    if score > term_scores.get(product_id, 0.0):
+                        term_scores[product_id] = score
+
+            if scores is None:
+                scores = term_scores
+            else:
+                scores = {pid: s + term_scores[pid] for pid, s in scores.items() if pid in term_scores}
+            if not scores:
+                return 0, []
+
+        ranked = heapq.nsmallest(
+            skip + limit, scores, key=lambda pid: (-scores[pid], self._products[pid].get("name", ""))
+        )
+        return len(scores), [self._products[pid] for pid in ranked[skip:]]
+
+
+class CatalogSearch:
+    """Keeps a SearchIndex in step with the products collection.
+
+    The index is built lazily on the first search. Catalog invalidations
+    (from product routes in this worker or from the invalidation feed) mark
+    individual products dirty; they are re-read in one $in query before the
+    next search. A full rebuild happens when everything was invalidated or
+    the index is older than SEARCH_INDEX_MAX_AGE_SECONDS. Invalidations that
+    arrive while a rebuild is scanning are kept for the next search.
+
+    Rebuilds run as a background task that tokenizes each batch in a worker
+    thread and swaps the new index in when done. Searches keep using the
+    old index meanwhile; only the very first search waits for a build.
+    """
+
+    def __init__(self, max_age: float):
+        self.index = SearchIndex()
+        self.max_age = max_age
+        self._built_at: Optional[float] = None
+        # Whether self.index holds a completed build
+        self._ready = False
+        self._dirty: Set[str] = set()
+        # Bumped by every full invalidation
+        self._generation = 0
+        self._lock = asyncio.Lock()
+        self._rebuild: Optional[asyncio.Task] = None
+        # Products refreshed in the live index while a rebuild is scanning
+        self._refreshed_during_rebuild: Set[str] = set()
+
+    def clear(self):
+        """Forget the index; the next search builds it again"""
+        self.index = SearchIndex()
+        self._built_at = None
+        self._ready = False
+        self._dirty = set()
+        self._generation += 1
+        self._rebuild = None
+
+    def on_catalog_change(self, product_id: Optional[str]):
+        if product_id is None:
+            self._built_at = None
+            self._generation += 1
+        else:
+            self._dirty.add(product_id)
+
+    async def rebuild(self, db):
+        # The scan reads everything dirtied so far; anything dirtied while
+        # it runs may have been read before the change, so it stays dirty
+        generation = self._generation
+        dirty, self._dirty = self._dirty, set()
+        self._refreshed_during_rebuild = set()
+        index = SearchIndex()
+        try:
+            batch = []
+            async for product in db.products.find({}).batch_size(REBUILD_BATCH_SIZE):
+                product["_id"] = str(product["_id"])
+                batch.append(product)
+                if len(batch) == REBUILD_BATCH_SIZE:
+                    await asyncio.to_thread(index.upsert_many, batch)
+                    batch = []
+            await asyncio.to_thread(index.upsert_many, batch)
+        except BaseException:
+            self._dirty |= dirty
+            raise
+        self.index = index
+        self._ready = True
+        # The scan may have read these before the change the old index got
+        self._dirty |= self._refreshed_during_rebuild
+        # A full invalidation during the scan means rebuilding again
+        if self._generation == generation:
+            self._built_at = time.monotonic()
+
+    async def _run_rebuild(self, db):
+        try:
+            await self.rebuild(db)
+        except Exception as e:
+            print(f"⚠️  Search index rebuild failed: {e}")
+            raise
+        finally:
+            self._rebuild = None
+
+    def _start_rebuild(self, db) -> asyncio.Task:
+        if self._rebuild is None:
+            self._rebuild = asyncio.create_task(self._run_rebuild(db))
+            # Failures are logged; the next search starts another rebuild
+            self._rebuild.add_done_callback(lambda task: task.cancelled() or task.exception())
+        return self._rebuild
+
+    async def wait_for_rebuild(self):
+        """Wait for the rebuild in progress, if any"""
+        if self._rebuild is not None:
+            await asyncio.shield(self._rebuild)
+
+    async def _refresh_dirty(self, db):
+        dirty, self._dirty = self._dirty, set()
+        if self._rebuild is not None:
+            self._refreshed_during_rebuild |= dirty
+        object_ids = [ObjectId(pid) for pid in dirty if ObjectId.is_valid(pid)]
+        found = set()
+        async for product in db.products.find({"_id": {"$in": object_ids}}):
+            product["_id"] = str(product["_id"])
+            self.index.upsert(product)
+            found.add(product["_id"])
+        for product_id in dirty - found:
+            self.index.remove(product_id)
+
+    async def ensure_fresh(self, db):
+        async with self._lock:
+            rebuild = None
+            if self._built_at is None or time.monotonic() - self._built_at > self.max_age:
+                rebuild = self._start_rebuild(db)
+            if self._dirty and self._ready:
+                await self._refresh_dirty(db)
+        # Nothing to search until the first build is in
+        if rebuild is not None and not self._ready:
+            await asyncio.shield(rebuild)
+
+    async def search(self, db, query: str, skip: int = 0, limit: int = 20) -> Tuple[int, List[dict]]:
+        await self.ensure_fresh(db)
+        return self.index.search(query, skip=skip, limit=limit)
+
+
+catalog_search = CatalogSearch(max_age=settings.SEARCH_INDEX_MAX_AGE_SECONDS)
+catalog_cache.subscribe(catalog_search.on_catalog_change)
@@ -0,0 +1,113 @@
+"""
+Fast JSON encoding for list endpoints.
+
+With FAST_JSON_RESPONSES enabled, list routes skip FastAPI's per-item
+Pydantic validation: documents are shaped to the response model's keys
+(filling defaults, dropping extras, recursing into nested models and
+turning integer prices into floats) and encoded once, straight to bytes.
+orjson is used when installed; the standard library otherwise.
+"""
+import json
+import types
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Any, Callable, List, Optional, Tuple, Type, Union, get_args, get_origin
+
+from bson import ObjectId
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _default(value):
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    """Encode content to JSON bytes, understanding ObjectId and datetime"""
+    if orjson is not None:
+        return orjson.dumps(content, default=_default)
+    return json.dumps(content, default=_default, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+Shaper = Callable[[Any], Any]
+
+
+def _to_float(value):
+    return float(value) if type(value) is int else value
+
+
+def _value_shaper(annotation) -> Optional[Shaper]:
+    """How to shape a non-None value of `annotation`; None to pass it through"""
+    origin = get_origin(annotation)
+    if origin is Union or origin is types.UnionType:
+        args = [arg for arg in get_args(annotation) if arg is not type(None)]
+        return _value_shaper(args[0]) if len(args) == 1 else None
+    if origin is list:
+        args = get_args(annotation)
+        item = _value_shaper(args[0]) if args else None
+        if item is None:
+            return None
+        return lambda values: [None if value is None else item(value) for value in values]
+    if annotation is float:
+        return _to_float
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return _model_shaper(annotation)
+    return None
+
+
+@lru_cache(maxsize=None)
+def _response_keys(model: Type[BaseModel]) -> Tuple[Tuple[str, Any, Optional[Shaper]], ...]:
+    keys = []
+    for name, info in model.model_fields.items():
+        default = None if info.is_required() else info.get_default(call_default_factory=True)
+        keys.append((info.alias or name, default, _value_shaper(info.annotation)))
+    return tuple(keys)
+
+
+@lru_cache(maxsize=None)
+def _model_shaper(model: Type[BaseModel]) -> Shaper:
+    keys = _response_keys(model)
+
+    def shape(document: dict) -> dict:
+        shaped = {}
+        for key, default, shaper in keys:
+            value = document.get(key, default)
+            shaped[key] = value if shaper is None or value is None else shaper(value)
+        return shaped
+    return shape
+
+
+def shape_documents(model: Type[BaseModel], documents: List[dict]) -> List[dict]:
+    """Keys of `model` (and of its nested models) for each document, without validation"""
+    shape = _model_shaper(model)
+    return [shape(document) for document in documents]
+
+
+def render_documents(model: Type[BaseModel], documents: List[dict], headers: Optional[dict] = None) -> FastJSONResponse:
+    return FastJSONResponse(content=shape_documents(model, documents), headers=headers)
+
+
+def render_model(model: Type[BaseModel], content: Any, headers: Optional[dict] = None) -> FastJSONResponse:
+    """Validate a document (or list of them) with `model` and encode it.
+
+    For routes that answer with a different shape than their response_model.
+    """
+    if isinstance(content, list):
+        content = [model.model_validate(item).model_dump(mode="json", by_alias=True) for item in content]
+    else:
+        content = model.model_validate(content).model_dump(mode="json", by_alias=True)
+    return FastJSONResponse(content=content, headers=headers)
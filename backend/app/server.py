@@ -0,0 +1,121 @@
+"""
+Production server entry point.
+
+    python -m app.server                 # SERVER_WORKERS processes, no reloader
+    python -m app.server --reload        # single process with the file watcher
+
+Runs app.main:app under uvicorn with one worker process per available CPU
+(or SERVER_WORKERS), uvloop and httptools when they are installed, and the
+keep-alive, backlog and graceful-shutdown settings from Settings. The
+resolved worker count is exported to the workers' environment so each of
+them sizes its MongoDB pool to its share of MONGO_TOTAL_POOL_SIZE.
+"""
+import argparse
+import math
+import os
+
+from app.config import settings
+
+
+def available_cpus() -> int:
+    """CPUs this process may actually use (affinity and cgroup quota)"""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+
+    # Containers usually see every host CPU; the cgroup v2 quota is the limit
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            cpus = min(cpus, max(1, math.ceil(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+    return cpus
+
+
+def worker_count() -> int:
+    """SERVER_WORKERS, or WEB_CONCURRENCY, or one worker per available CPU"""
+    if settings.SERVER_WORKERS > 0:
+        return settings.SERVER_WORKERS
+    web_concurrency = os.environ.get("WEB_CONCURRENCY", "")
+    if web_concurrency.isdigit() and int(web_concurrency) > 0:
+        return int(web_concurrency)
+    return available_cpus()
+
+
+def _installed(module: str) -> bool:
+    try:
+        __import__(module)
+    except ImportError:
+        return False
+    return True
+
+
+def server_options(workers: int) -> dict:
+    """uvicorn.run keyword arguments for the production profile"""
+    loop = settings.SERVER_LOOP
+    if loop == "auto":
+        loop = "uvloop" if _installed("uvloop") else "asyncio"
+    http = settings.SERVER_HTTP
+    if http == "auto":
+        http = "httptools" if _installed("httptools") else "h11"
+    return {
+        "host": settings.HOST,
+        "port": settings.PORT,
+        "workers": workers,
+        "loop": loop,
+        "http": http,
+        "backlog": settings.SERVER_BACKLOG,
+        "timeout_keep_alive": settings.SERVER_KEEPALIVE_SECONDS,
+        "timeout_graceful_shutdown": settings.SERVER_GRACEFUL_SHUTDOWN_SECONDS,
+        "limit_concurrency": settings.SERVER_LIMIT_CONCURRENCY,
+        "limit_max_requests": settings.SERVER_MAX_REQUESTS,
+        "access_log": settings.SERVER_ACCESS_LOG,
+        "proxy_headers": True,
+        "forwarded_allow_ips": settings.SERVER_FORWARDED_ALLOW_IPS,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the Nike Store API")
+    parser.add_argument("--host", help=f"Default: HOST ({settings.HOST})")
+    parser.add_argument("--port", type=int, help=f"Default: PORT ({settings.PORT})")
+    parser.add_argument("--workers", type=int, help="Default: SERVER_WORKERS, WEB_CONCURRENCY or CPU count")
+    parser.add_argument("--reload", action="store_true", help="Development: one process, restart on changes")
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+
+    import uvicorn
+
+    if args.reload:
+        uvicorn.run(
+            "app.main:app",
+            host=args.host or settings.HOST,
+            port=args.port or settings.PORT,
+            reload=True,
+            log_level=args.log_level,
+        )
+        return
+
+    workers = args.workers or worker_count()
+    # Workers load Settings from the environment; tell them how many there are
+    os.environ["SERVER_WORKERS"] = str(workers)
+    settings.SERVER_WORKERS = workers
+
+    options = server_options(workers)
+    if args.host:
+        options["host"] = args.host
+    if args.port:
+        options["port"] = args.port
+
+    from app.database import max_pool_size
+    print(f"🚀 Serving on {options['host']}:{options['port']} with {workers} worker(s), "
+          f"loop={options['loop']}, http={options['http']}, "
+          f"MongoDB pool {max_pool_size()} per worker")
+    uvicorn.run("app.main:app", log_level=args.log_level, **options)
+
+
+if __name__ == "__main__":
+    main()
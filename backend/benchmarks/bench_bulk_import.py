@@ -0,0 +1,113 @@
+"""
+Bulk import rows/sec and peak RSS, plus export throughput.
+
+Writes --rows synthetic products with SKUs to an NDJSON or CSV file,
+imports it into a scratch database through app.bulk (all inserts), imports
+it again (all SKU matches) and streams the catalog back out. RSS is
+sampled during each phase, so a flat peak across --rows values shows the
+pipeline runs in constant memory.
+
+    python -m benchmarks.bench_bulk_import --rows 1000000 --format ndjson
+"""
+import argparse
+import asyncio
+import csv
+import os
+import tempfile
+import time
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app import bulk
+from app.config import settings
+from app.indexes import ensure_indexes
+from app.serialization import dumps
+from benchmarks.common import measured, print_json
+from benchmarks.synthetic import make_products
+
+FIELDS = ["sku", "name", "description", "price", "category", "image_url", "stock"]
+
+
+def write_file(path, fmt, rows):
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f) if fmt == "csv" else None
+        if writer:
+            writer.writerow(FIELDS)
+        for index, product in enumerate(make_products(rows)):
+            product["sku"] = f"SKU-{index:08d}"
+            if writer:
+                writer.writerow([product[name] for name in FIELDS])
+            else:
+                f.write(dumps({name: product[name] for name in FIELDS}).decode("utf-8") + "\n")
+
+
+def phase(rows, elapsed, start_mb, peak_mb, **extra):
+    return {
+        "rows": rows,
+        "seconds": round(elapsed, 2),
+        "rows_per_sec": round(rows / elapsed) if elapsed else 0,
+        "rss_start_mb": round(start_mb, 1),
+        "rss_peak_mb": round(peak_mb, 1),
+        **extra,
+    }
+
+
+async def export(db, fmt):
+    rows = size = 0
+    async for chunk in bulk.export_products(db, fmt):
+        size += len(chunk)
+        rows += chunk.count(b"\n")
+    return rows, size
+
+
+async def main_async(args):
+    client = AsyncIOMotorClient(settings.MONGODB_URL)
+    await client.admin.command("ping")
+    db = client[f"{settings.DATABASE_NAME}_bench_bulk"]
+    await client.drop_database(db.name)
+
+    fd, path = tempfile.mkstemp(suffix=f".{args.format}")
+    os.close(fd)
+    try:
+        started = time.perf_counter()
+        write_file(path, args.format, args.rows)
+        generated = time.perf_counter() - started
+        await ensure_indexes(db)
+
+        results = {
+            "format": args.format,
+            "chunk_size": args.chunk_size,
+            "file_mb": round(os.path.getsize(path) / 2 ** 20, 1),
+            "generate_seconds": round(generated, 2),
+        }
+        for name in ("insert", "reimport"):
+            report, elapsed, start_mb, peak_mb = await measured(
+                bulk.import_products(db, bulk.iter_file_lines(path), args.format, args.chunk_size)
+            )
+            counts = report.as_dict()
+            results[name] = phase(
+                report.rows, elapsed, start_mb, peak_mb,
+                inserted=counts["inserted"], updated=counts["updated"],
+                unchanged=counts["unchanged"], failed=counts["failed"],
+            )
+
+        (rows, size), elapsed, start_mb, peak_mb = await measured(export(db, args.format))
+        results["export"] = phase(rows, elapsed, start_mb, peak_mb, bytes=size)
+        return results
+    finally:
+        os.remove(path)
+        await client.drop_database(db.name)
+        client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--format", choices=["ndjson", "csv"], default="ndjson")
+    parser.add_argument("--chunk-size", type=int, default=settings.BULK_IMPORT_CHUNK_SIZE)
+    args = parser.parse_args()
+    print_json(asyncio.run(main_async(args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Parallel add-to-cart: lost updates and throughput.
+
+Fires --adds concurrent adds into one user's cart, spread over
+--products products, first with the old read-modify-write sequence and
+then with app.routes.cart.add_cart_item, and checks every quantity
+arrived. Runs against a scratch database next to DATABASE_NAME.
+
+    python -m benchmarks.bench_cart_concurrency --adds 500 --products 5
+"""
+import argparse
+import asyncio
+import time
+from datetime import datetime
+
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.config import settings
+from app.routes.cart import add_cart_item
+from app.schemas.schemas import CartItem
+from benchmarks.common import print_json
+
+
+async def legacy_add_cart_item(db, user_id, item):
+    """The pre-atomic implementation: find, edit in Python, $set the array back"""
+    cart = await db.carts.find_one({"user_id": user_id})
+    if not cart:
+        cart = {"user_id": user_id, "items": [], "total": 0.0, "updated_at": datetime.utcnow()}
+        await db.carts.insert_one(cart)
+    for cart_item in cart.get("items", []):
+        if cart_item["product_id"] == item.product_id:
+            cart_item["quantity"] += item.quantity
+            break
+    else:
+        cart.setdefault("items", []).append(item.dict())
+    total = sum(i["price"] * i["quantity"] for i in cart["items"])
+    await db.carts.update_one(
+        {"user_id": user_id},
+        {"$set": {"items": cart["items"], "total": total, "updated_at": datetime.utcnow()}}
+    )
+    return total
+
+
+async def run(db, add, adds, product_ids):
+    user_id = str(ObjectId())
+    items = [CartItem(product_id=product_ids[i % len(product_ids)], quantity=1, price=100.0)
+             for i in range(adds)]
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*[add(db, user_id, item) for item in items], return_exceptions=True)
+    elapsed = time.perf_counter() - started
+
+    carts = await db.carts.find({"user_id": user_id}).to_list(length=None)
+    quantity = sum(i["quantity"] for cart in carts for i in cart.get("items", []))
+    total = sum(cart.get("total", 0.0) for cart in carts)
+    return {
+        "adds": adds,
+        "errors": sum(1 for r in results if isinstance(r, Exception)),
+        "cart_documents": len(carts),
+        "quantity_in_cart": quantity,
+        "lost_quantity": adds - quantity,
+        "total_consistent": abs(total - quantity * 100.0) < 1e-6,
+        "elapsed_sec": round(elapsed, 4),
+        "adds_per_sec": round(adds / elapsed, 1),
+    }
+
+
+async def main_async(args):
+    client = AsyncIOMotorClient(settings.MONGODB_URL)
+    db = client[f"{settings.DATABASE_NAME}_bench_cart"]
+    await db.carts.drop()
+    await db.carts.create_index("user_id", unique=True)
+    product_ids = [str(ObjectId()) for _ in range(args.products)]
+    try:
+        return {
+            "read_modify_write": await run(db, legacy_add_cart_item, args.adds, product_ids),
+            "atomic": await run(db, add_cart_item, args.adds, product_ids),
+        }
+    finally:
+        await client.drop_database(db.name)
+        client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--adds", type=int, default=500)
+    parser.add_argument("--products", type=int, default=5)
+    args = parser.parse_args()
+    print_json(asyncio.run(main_async(args)))
+
+
+if __name__ == "__main__":
+    main()
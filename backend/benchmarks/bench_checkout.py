@@ -0,0 +1,127 @@
+"""
+Checkout throughput and oversell race.
+
+Runs app.routes.orders' pricing and placement directly against a scratch
+database. Point MONGODB_URL at a local replica set to exercise the
+transactional path (e.g. mongodb://localhost:27017/?replicaSet=rs0); on a
+standalone server the non-transactional fallback is measured instead.
+
+1. Throughput: --buyers concurrent buyers each place --orders-per-buyer
+   three-line orders from a well-stocked catalog.
+2. Race: --racers buyers try to buy one pair of a product with --race-stock
+   pairs left; exactly --race-stock must succeed and stock must end at 0.
+
+    python -m benchmarks.bench_checkout --racers 1000 --race-stock 10
+"""
+import argparse
+import asyncio
+import random
+import sys
+import time
+
+from bson import ObjectId
+from fastapi import HTTPException
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.config import settings
+from app.routes.orders import place_order, price_order_items, supports_transactions
+from app.schemas.schemas import OrderItemCreate
+from benchmarks.common import print_json, summarize
+from benchmarks.synthetic import make_products
+
+
+async def checkout(db, user_id, items):
+    lines, total = await price_order_items(db, items)
+    return await place_order(db, user_id, lines, total, "1 Bench Street")
+
+
+async def throughput(db, product_ids, buyers, orders_per_buyer):
+    latencies = []
+    rng = random.Random(7)
+
+    async def buyer():
+        user_id = str(ObjectId())
+        for _ in range(orders_per_buyer):
+            items = [OrderItemCreate(product_id=pid, quantity=1) for pid in rng.sample(product_ids, 3)]
+            started = time.perf_counter()
+            await checkout(db, user_id, items)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[buyer() for _ in range(buyers)])
+    return summarize(latencies, time.perf_counter() - started)
+
+
+async def race(db, racers, stock):
+    product = next(make_products(1))
+    product["stock"] = stock
+    product_id = str((await db.products.insert_one(product)).inserted_id)
+    outcomes = {"confirmed": 0, "rejected": 0}
+
+    async def racer():
+        try:
+            await checkout(db, str(ObjectId()), [OrderItemCreate(product_id=product_id, quantity=1)])
+            outcomes["confirmed"] += 1
+        except HTTPException as e:
+            if e.status_code != 409:
+                raise
+            outcomes["rejected"] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*[racer() for _ in range(racers)])
+    elapsed = time.perf_counter() - started
+
+    final_stock = (await db.products.find_one({"_id": ObjectId(product_id)}))["stock"]
+    orders = await db.orders.count_documents({"items.product_id": product_id})
+    return {
+        **outcomes,
+        "racers": racers,
+        "initial_stock": stock,
+        "final_stock": final_stock,
+        "orders_written": orders,
+        "oversold": max(0, orders - stock),
+        "elapsed_sec": round(elapsed, 3),
+    }
+
+
+async def main_async(args):
+    client = AsyncIOMotorClient(settings.MONGODB_URL, maxPoolSize=args.pool_size)
+    await client.admin.command("ping")
+    db = client[f"{settings.DATABASE_NAME}_bench_checkout"]
+    await client.drop_database(db.name)
+    try:
+        products = list(make_products(args.products))
+        for product in products:
+            product["stock"] = 10 ** 9
+        result = await db.products.insert_many(products)
+        product_ids = [str(pid) for pid in result.inserted_ids]
+
+        return {
+            "topology": client.topology_description.topology_type_name,
+            "transactions": supports_transactions(client),
+            "throughput": await throughput(db, product_ids, args.buyers, args.orders_per_buyer),
+            "race": await race(db, args.racers, args.race_stock),
+        }
+    finally:
+        await client.drop_database(db.name)
+        client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--products", type=int, default=1000)
+    parser.add_argument("--buyers", type=int, default=50)
+    parser.add_argument("--orders-per-buyer", type=int, default=20)
+    parser.add_argument("--racers", type=int, default=1000)
+    parser.add_argument("--race-stock", type=int, default=10)
+    parser.add_argument("--pool-size", type=int, default=100)
+    args = parser.parse_args()
+    result = asyncio.run(main_async(args))
+    print_json(result)
+    race_result = result["race"]
+    if race_result["oversold"] or race_result["confirmed"] != args.race_stock or race_result["final_stock"] != 0:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Faceted browsing on a large catalog: server-side filters vs fetch-everything.
+
+Seeds --products synthetic products (500k by default) with the app's
+indexes and times, for a few category/price/stock/sort combinations:
+
+- client_side: what the category pages did before - fetch every product
+  card in the category and filter/sort in the browser (bytes included)
+- server_page: one filtered, sorted page (--limit) as GET /products/ runs
+  it, with the index the planner picked
+- facets_uncached: the $facet aggregation behind GET /products/facets
+- facets_cached: the same call served from the catalog cache
+
+    python -m benchmarks.bench_facets --products 500000
+"""
+import argparse
+import asyncio
+import time
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app import browse
+from app.cache import catalog_cache
+from app.config import settings
+from app.indexes import ensure_indexes
+from app.pagination import keyset_sort
+from app.serialization import dumps
+from benchmarks.common import print_json, summarize
+from benchmarks.synthetic import seed_products
+
+CARD = {"name": 1, "price": 1, "category": 1, "image_url": 1, "stock": 1, "created_at": 1}
+
+SCENARIOS = [
+    {"name": "category, newest", "category": "Running", "sort": "newest"},
+    {"name": "category, price 50-100, price asc", "category": "Running", "min_price": 50, "max_price": 100,
+     "sort": "price_asc"},
+    {"name": "price 100-150, in stock, price desc", "min_price": 100, "max_price": 150, "in_stock": True,
+     "sort": "price_desc"},
+    {"name": "category, in stock, price asc", "category": "Basketball", "in_stock": True, "sort": "price_asc"},
+]
+
+
+async def timed(fetch, rounds):
+    latencies = []
+    result = None
+    for _ in range(rounds):
+        started = time.perf_counter()
+        result = await fetch()
+        latencies.append(time.perf_counter() - started)
+    return summarize(latencies), result
+
+
+def _index_used(plan: dict) -> str:
+    """Name of the index in a winning plan (or COLLSCAN)"""
+    if plan.get("stage") == "COLLSCAN":
+        return "COLLSCAN"
+    if "indexName" in plan:
+        return plan["indexName"]
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            return _index_used(plan[key])
+    for child in plan.get("inputStages", []):
+        return _index_used(child)
+    return plan.get("stage", "?")
+
+
+async def run_scenario(db, scenario, args):
+    category = scenario.get("category")
+    min_price, max_price = scenario.get("min_price"), scenario.get("max_price")
+    in_stock = scenario.get("in_stock", False)
+    field, direction = browse.resolve_sort(scenario["sort"])
+    query = browse.catalog_filter(category, min_price, max_price, in_stock)
+    order = keyset_sort(direction, field)
+
+    async def client_side():
+        cards = await db.products.find({"category": category} if category else {}, CARD).to_list(length=None)
+        return len(dumps(cards)), len(cards)
+
+    async def server_page():
+        return await db.products.find(query, CARD).sort(order).limit(args.limit).to_list(length=args.limit)
+
+    async def facets_uncached():
+        catalog_cache.clear()
+        return await browse.facet_counts(db, category, min_price, max_price, in_stock)
+
+    async def facets_cached():
+        return await browse.facet_counts(db, category, min_price, max_price, in_stock)
+
+    client_timing, (client_bytes, client_rows) = await timed(client_side, args.client_rounds)
+    page_timing, _ = await timed(server_page, args.rounds)
+    explain = await db.products.find(query, CARD).sort(order).limit(args.limit).explain()
+    uncached_timing, facets = await timed(facets_uncached, args.client_rounds)
+    cached_timing, _ = await timed(facets_cached, args.rounds)
+
+    return {
+        "scenario": scenario["name"],
+        "client_side": {**client_timing, "rows": client_rows, "bytes": client_bytes},
+        "server_page": {**page_timing, "index": _index_used(explain["queryPlanner"]["winningPlan"])},
+        "facets_uncached": {**uncached_timing, "total": facets["total"]},
+        "facets_cached": cached_timing,
+    }
+
+
+async def main_async(args):
+    client = AsyncIOMotorClient(settings.MONGODB_URL)
+    db = client[f"{settings.DATABASE_NAME}_bench_facets"]
+    await client.drop_database(db.name)
+    try:
+        started = time.perf_counter()
+        await seed_products(db.products, args.products)
+        seed_seconds = time.perf_counter() - started
+        problems = await ensure_indexes(db)
+
+        results = [await run_scenario(db, scenario, args) for scenario in SCENARIOS]
+        return {
+            "products": args.products,
+            "limit": args.limit,
+            "seed_seconds": round(seed_seconds, 1),
+            "index_problems": problems,
+            "scenarios": results,
+        }
+    finally:
+        await client.drop_database(db.name)
+        client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--products", type=int, default=500_000)
+    parser.add_argument("--limit", type=int, default=24, help="Products per page")
+    parser.add_argument("--rounds", type=int, default=50)
+    parser.add_argument("--client-rounds", type=int, default=3, help="Rounds for the full-category and $facet runs")
+    args = parser.parse_args()
+    print_json(asyncio.run(main_async(args)))
+
+
+if __name__ == "__main__":
+    main()
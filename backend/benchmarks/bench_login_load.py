@@ -0,0 +1,72 @@
+"""
+p99 latency of GET /products/ while a login burst runs on the same worker.
+
+Starts the API twice: once with PASSWORD_HASH_WORKERS=0 (PBKDF2 on the
+event loop, the old behaviour) and once with the hashing pool, and
+reports /products/ latency for each run.
+
+    python -m benchmarks.bench_login_load --duration 10 --login-concurrency 32
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+
+from benchmarks.common import ensure_user, print_json, run_server, summarize
+
+EMAIL = "bench-login@example.com"
+PASSWORD = "bench-password"
+
+
+async def _login_loop(client, stop_at, counts):
+    while time.monotonic() < stop_at:
+        response = await client.post("/auth/login-json", json={"email": EMAIL, "password": PASSWORD})
+        counts[response.status_code] = counts.get(response.status_code, 0) + 1
+
+
+async def _browse_loop(client, stop_at, latencies):
+    while time.monotonic() < stop_at:
+        started = time.perf_counter()
+        response = await client.get("/products/")
+        response.raise_for_status()
+        latencies.append(time.perf_counter() - started)
+
+
+async def run_load(base_url, duration, login_concurrency, browse_concurrency):
+    limits = httpx.Limits(max_connections=login_concurrency + browse_concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        await ensure_user(client, EMAIL, PASSWORD)
+        stop_at = time.monotonic() + duration
+        latencies, login_counts = [], {}
+        await asyncio.gather(
+            *[_login_loop(client, stop_at, login_counts) for _ in range(login_concurrency)],
+            *[_browse_loop(client, stop_at, latencies) for _ in range(browse_concurrency)],
+        )
+    return {
+        "products": summarize(latencies, duration),
+        "login_status_counts": login_counts,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--login-concurrency", type=int, default=32)
+    parser.add_argument("--browse-concurrency", type=int, default=8)
+    parser.add_argument("--hash-workers", type=int, default=4)
+    parser.add_argument("--port", type=int, default=8100)
+    args = parser.parse_args()
+
+    results = {}
+    for label, workers in (("inline", 0), ("pool", args.hash_workers)):
+        env = {"PASSWORD_HASH_WORKERS": str(workers)}
+        with run_server(port=args.port, env=env) as base_url:
+            results[label] = asyncio.run(run_load(
+                base_url, args.duration, args.login_concurrency, args.browse_concurrency
+            ))
+    print_json(results)
+
+
+if __name__ == "__main__":
+    main()
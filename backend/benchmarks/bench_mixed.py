@@ -0,0 +1,238 @@
+"""
+Mixed-traffic load test: throughput and p50/p95/p99 per endpoint.
+
+Seeds (or reuses) a benchmark database at the requested scale, starts
+app.main:app against it under uvicorn and runs --concurrency virtual
+shoppers for --duration seconds. Each shopper logs in as its own seeded
+user, then picks actions from a weighted mix: browsing catalog pages
+(following the next-page cursor), opening products, searching, adding to
+the cart, viewing the cart, checking out and logging in again.
+
+Each shopper's choices come from --seed, so two runs at the same settings
+issue the same request mix. Results are JSON (stdout, and --output if given)
+tagged with the git commit, to compare regressions across commits.
+
+    python -m benchmarks.bench_mixed --products 100000 --users 100000 --duration 60 --output before.json
+"""
+import argparse
+import asyncio
+import json
+import random
+import subprocess
+import time
+from collections import defaultdict
+
+import httpx
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.config import settings
+from benchmarks import seed as seeding
+from benchmarks.common import BACKEND_DIR, print_json, run_server, summarize
+from benchmarks.synthetic import CATEGORIES, LINES, user_email
+
+DEFAULT_MIX = "browse=35,product=20,search=15,add_to_cart=12,view_cart=6,checkout=4,login=3,next_page=5"
+SEARCH_TERMS = [line.lower() for line in LINES] + [c.lower() for c in CATEGORIES] + ["air max running", "jordn"]
+
+
+def parse_mix(text: str) -> dict:
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = float(weight)
+    unknown = set(mix) - set(Shopper.ACTIONS)
+    if unknown:
+        raise SystemExit(f"Unknown actions in --mix: {sorted(unknown)}")
+    return mix
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+        self.recording = False
+
+    async def request(self, client, label, method, url, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+            status = response.status_code
+        except httpx.HTTPError as e:
+            response, status = None, type(e).__name__
+        if self.recording:
+            self.latencies[label].append(time.perf_counter() - started)
+            self.statuses[label][str(status)] += 1
+        return response
+
+    def report(self, elapsed):
+        endpoints = {}
+        for label in sorted(self.latencies):
+            statuses = dict(self.statuses[label])
+            errors = sum(n for s, n in statuses.items() if not s.isdigit() or int(s) >= 500)
+            endpoints[label] = {**summarize(self.latencies[label], elapsed), "status": statuses, "errors": errors}
+        everything = [latency for values in self.latencies.values() for latency in values]
+        return {"total": summarize(everything, elapsed), "endpoints": endpoints}
+
+
+class Shopper:
+    ACTIONS = ("browse", "next_page", "product", "search", "add_to_cart", "view_cart", "checkout", "login")
+
+    def __init__(self, client, recorder, rng, email, products):
+        self.client = client
+        self.recorder = recorder
+        self.rng = rng
+        self.email = email
+        self.products = products
+        self.headers = {}
+        self.cursor = None
+        self.cart = []
+
+    async def login(self):
+        response = await self.recorder.request(
+            self.client, "POST /auth/login-json", "POST", "/auth/login-json",
+            json={"email": self.email, "password": seeding.PASSWORD},
+        )
+        if response is not None and response.status_code == 200:
+            self.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    async def browse(self):
+        params = {"limit": 20, "view": "card"}
+        if self.rng.random() < 0.3:
+            params["category"] = self.rng.choice(CATEGORIES)
+        response = await self.recorder.request(self.client, "GET /products/", "GET", "/products/", params=params)
+        self.cursor = response.headers.get("X-Next-Cursor") if response is not None else None
+
+    async def next_page(self):
+        if not self.cursor:
+            return await self.browse()
+        response = await self.recorder.request(
+            self.client, "GET /products/ (cursor)", "GET", "/products/",
+            params={"limit": 20, "view": "card", "cursor": self.cursor},
+        )
+        self.cursor = response.headers.get("X-Next-Cursor") if response is not None else None
+
+    async def product(self):
+        product = self.rng.choice(self.products)
+        await self.recorder.request(
+            self.client, "GET /products/{product_id}", "GET", f"/products/{product['_id']}"
+        )
+
+    async def search(self):
+        term = self.rng.choice(SEARCH_TERMS)
+        await self.recorder.request(
+            self.client, "GET /products/search/{query}", "GET", f"/products/search/{term}", params={"limit": 20}
+        )
+
+    async def add_to_cart(self):
+        product = self.rng.choice(self.products)
+        response = await self.recorder.request(
+            self.client, "POST /cart/add", "POST", "/cart/add", headers=self.headers,
+            json={"product_id": str(product["_id"]), "quantity": 1, "price": product["price"]},
+        )
+        if response is not None and response.status_code == 200:
+            self.cart.append(str(product["_id"]))
+
+    async def view_cart(self):
+        await self.recorder.request(self.client, "GET /cart/", "GET", "/cart/", headers=self.headers)
+
+    async def checkout(self):
+        if not self.cart:
+            return await self.add_to_cart()
+        response = await self.recorder.request(
+            self.client, "POST /orders/", "POST", "/orders/", headers=self.headers,
+            json={
+                "items": [{"product_id": pid, "quantity": 1} for pid in self.cart],
+                "shipping_address": "1 Bench Street",
+            },
+        )
+        if response is not None and response.status_code == 201:
+            self.cart = []
+
+    async def run(self, stop_at, mix):
+        await self.login()
+        actions, weights = zip(*mix.items())
+        while time.monotonic() < stop_at:
+            action = self.rng.choices(actions, weights)[0]
+            await getattr(self, action)()
+
+
+async def sample_products(database, count):
+    """Random products (id and price) for the shoppers to open and buy"""
+    client = AsyncIOMotorClient(settings.MONGODB_URL)
+    try:
+        pipeline = [{"$sample": {"size": count}}, {"$project": {"price": 1}}]
+        return await client[database].products.aggregate(pipeline).to_list(length=None)
+    finally:
+        client.close()
+
+
+async def run_traffic(base_url, args, products):
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        shoppers = [
+            Shopper(client, recorder, random.Random(args.seed + i), user_email(i % args.users), products)
+            for i in range(args.concurrency)
+        ]
+        mix = parse_mix(args.mix)
+
+        if args.warmup > 0:
+            await asyncio.gather(*[s.run(time.monotonic() + args.warmup, mix) for s in shoppers])
+
+        recorder.recording = True
+        started = time.monotonic()
+        await asyncio.gather(*[s.run(started + args.duration, mix) for s in shoppers])
+        elapsed = time.monotonic() - started
+    return recorder.report(elapsed)
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    seeding.add_arguments(parser)
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--warmup", type=float, default=5.0)
+    parser.add_argument("--concurrency", type=int, default=50, help="Virtual shoppers")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Action weights, e.g. browse=50,search=50")
+    parser.add_argument("--sample-products", type=int, default=2000, help="Products the shoppers pick from")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--output", help="Also write the JSON result to this file")
+    args = parser.parse_args()
+
+    seeded = asyncio.run(seeding.seed(args.database, args.products, args.users, args.seed, args.stock, args.force))
+    products = asyncio.run(sample_products(args.database, args.sample_products))
+
+    env = {"DATABASE_NAME": args.database}
+    with run_server(port=args.port, env=env, workers=args.workers) as base_url:
+        report = asyncio.run(run_traffic(base_url, args, products))
+
+    result = {
+        "commit": git_commit(),
+        "config": {
+            "products": args.products,
+            "users": args.users,
+            "concurrency": args.concurrency,
+            "duration_sec": args.duration,
+            "workers": args.workers,
+            "mix": parse_mix(args.mix),
+            "seed": args.seed,
+        },
+        "seed": seeded,
+        **report,
+    }
+    print_json(result)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2, default=str)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Deep pagination: skip/limit vs keyset cursors.
+
+Seeds --products synthetic products and times fetching page 1 and page
+--deep-page with both the old .skip().limit() query and the
+(created_at, _id) keyset query used by GET /products/.
+
+    python -m benchmarks.bench_pagination --products 500000 --deep-page 5000
+"""
+import argparse
+import asyncio
+import time
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.config import settings
+from app.pagination import encode_cursor, keyset_query, keyset_sort
+from benchmarks.common import print_json, summarize
+from benchmarks.synthetic import seed_products
+
+
+async def timed(fetch, rounds):
+    latencies = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        await fetch()
+        latencies.append(time.perf_counter() - started)
+    return summarize(latencies)
+
+
+async def main_async(args):
+    client = AsyncIOMotorClient(settings.MONGODB_URL)
+    db = client[f"{settings.DATABASE_NAME}_bench_pagination"]
+    await db.products.drop()
+    try:
+        await seed_products(db.products, args.products)
+        await db.products.create_index(keyset_sort())
+        await db.products.create_index([("category", 1)] + keyset_sort())
+
+        limit = args.limit
+        deep_skip = (args.deep_page - 1) * limit
+        # Position of the last product on the page before the deep page (not timed)
+        boundary = await db.products.find({}, {"created_at": 1}).sort(keyset_sort()) \
+            .skip(deep_skip - 1).limit(1).to_list(length=1)
+        deep_cursor = encode_cursor(boundary[0])
+
+        def skip_page(skip):
+            return lambda: db.products.find({}).skip(skip).limit(limit).to_list(length=limit)
+
+        def keyset_page(cursor):
+            return lambda: db.products.find(keyset_query({}, cursor)).sort(keyset_sort()) \
+                .limit(limit).to_list(length=limit)
+
+        return {
+            "products": args.products,
+            "limit": limit,
+            "deep_page": args.deep_page,
+            "skip_page_1": await timed(skip_page(0), args.rounds),
+            "skip_deep_page": await timed(skip_page(deep_skip), args.rounds),
+            "keyset_page_1": await timed(keyset_page(None), args.rounds),
+            "keyset_deep_page": await timed(keyset_page(deep_cursor), args.rounds),
+        }
+    finally:
+        await client.drop_database(db.name)
+        client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--products", type=int, default=500_000)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--deep-page", type=int, default=5000)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+    if (args.deep_page - 1) * args.limit >= args.products:
+        parser.error("--deep-page is past the end of the catalog")
+    print_json(asyncio.run(main_async(args)))
+
+
+if __name__ == "__main__":
+    main()
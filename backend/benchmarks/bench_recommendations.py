@@ -0,0 +1,191 @@
+"""
+Frequently-bought-together snapshot: build time and memory, refresh, lookups.
+
+Seeds --products products and synthetic orders up to --order-lines order
+lines (10M by default; reused across runs unless --force), then:
+
+- build: app.recommendations.build() over every order, once per counting
+  path (NumPy if installed, pure Python), each in a fresh process so its
+  peak RSS is its own
+- load: mapping the snapshot, and the worker's RSS once it is mapped
+- lookup: Snapshot.recommend() latency for random products, in microseconds
+- refresh: adding --new-orders orders with refresh() vs the full build
+
+    python -m benchmarks.bench_recommendations --order-lines 10000000
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app import recommendations
+from app.config import settings
+from benchmarks.common import BACKEND_DIR, measured, percentile, print_json, rss_mb
+from benchmarks.synthetic import make_orders, seed_products
+
+DATABASE = f"{settings.DATABASE_NAME}_bench_recommendations"
+
+
+async def insert_orders(collection, lines: int, products: list, seed: int, batch_size: int = 10_000) -> dict:
+    """Insert synthetic orders until they hold `lines` order lines"""
+    batch, orders, total = [], 0, 0
+    # Every order has at least one line, so `lines` orders is enough
+    for order in make_orders(lines, products, seed=seed):
+        batch.append(order)
+        orders += 1
+        total += len(order["items"])
+        if len(batch) >= batch_size or total >= lines:
+            await collection.insert_many(batch, ordered=False)
+            batch = []
+        if total >= lines:
+            break
+    return {"orders": orders, "order_lines": total}
+
+
+async def seed(db, args) -> dict:
+    scale = {"products": args.products, "order_lines": args.order_lines, "seed": args.seed}
+    meta = await db.bench_meta.find_one({"_id": "scale"})
+    if not args.force and meta is not None and meta.get("scale") == scale:
+        return {"reused": True, **meta["seeded"]}
+
+    await db.client.drop_database(db.name)
+    await seed_products(db.products, args.products, seed=args.seed)
+    products = await db.products.find({}, {"name": 1, "price": 1, "category": 1}) \
+        .sort("category", 1).to_list(length=None)
+    started = time.perf_counter()
+    seeded = await insert_orders(db.orders, args.order_lines, products, args.seed)
+    seeded["seconds"] = round(time.perf_counter() - started, 1)
+    await db.bench_meta.replace_one({"_id": "scale"}, {"scale": scale, "seeded": seeded}, upsert=True)
+    return {"reused": False, **seeded}
+
+
+def build_in_subprocess(backend: str, path: str, k: int) -> dict:
+    """Run one build in a fresh interpreter and return its JSON report"""
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_recommendations", "--build-only", backend,
+         "--path", path, "--k", str(k)],
+        cwd=BACKEND_DIR, check=True, capture_output=True, text=True,
+        env={**os.environ, "RECOMMENDATIONS_SETTLE_SECONDS": "0"},
+    ).stdout
+    return json.loads(output)
+
+
+async def build_only(args) -> dict:
+    client = AsyncIOMotorClient(settings.MONGODB_URL)
+    try:
+        report, elapsed, start_mb, peak_mb = await measured(recommendations.build(
+            client[DATABASE], args.path, args.k, vectorized=args.build_only == "numpy"
+        ))
+    finally:
+        client.close()
+    return {
+        "backend": args.build_only,
+        **report,
+        "orders_per_sec": round(report["orders"] / elapsed) if elapsed else None,
+        "start_rss_mb": round(start_mb, 1),
+        "peak_rss_mb": round(peak_mb, 1),
+        "rss_growth_mb": round(peak_mb - start_mb, 1),
+    }
+
+
+def lookups(snapshot, count: int, limit: int) -> dict:
+    rng = random.Random(0)
+    product_ids = [snapshot.product_id(rng.randrange(snapshot.products)) for _ in range(count)]
+    latencies = []
+    for product_id in product_ids:
+        started = time.perf_counter()
+        snapshot.recommend(product_id, limit)
+        latencies.append(time.perf_counter() - started)
+    return {
+        "count": count,
+        "limit": limit,
+        "p50_us": round(percentile(latencies, 50) * 1e6, 2),
+        "p99_us": round(percentile(latencies, 99) * 1e6, 2),
+        "max_us": round(max(latencies) * 1e6, 2),
+    }
+
+
+async def main_async(args):
+    settings.RECOMMENDATIONS_SETTLE_SECONDS = 0
+    client = AsyncIOMotorClient(settings.MONGODB_URL)
+    db = client[DATABASE]
+    directory = tempfile.mkdtemp(prefix="bench-recommendations-")
+    try:
+        seeded = await seed(db, args)
+
+        backends = (["numpy"] if recommendations.numpy is not None else []) + ["python"]
+        builds = []
+        for backend in backends:
+            path = os.path.join(directory, f"{backend}.snapshot")
+            builds.append(build_in_subprocess(backend, path, args.k))
+        path = os.path.join(directory, f"{backends[0]}.snapshot")
+
+        before_mb = rss_mb()
+        started = time.perf_counter()
+        snapshot = recommendations.Snapshot(path)
+        load = {
+            "seconds": round(time.perf_counter() - started, 3),
+            "rss_growth_mb": round(rss_mb() - before_mb, 1),
+            "products": snapshot.products,
+        }
+        lookup = lookups(snapshot, args.lookups, min(args.limit, args.k))
+        del snapshot
+
+        # New orders on top of the seeded ones, then put the collection back
+        products = await db.products.find({}, {"name": 1, "price": 1, "category": 1}) \
+            .sort("category", 1).to_list(length=None)
+        first_new = (await db.orders.find({}, {"_id": 1}).sort("_id", -1).limit(1).to_list(length=1))[0]["_id"]
+        new_orders = list(make_orders(args.new_orders, products, seed=args.seed + 1))
+        await db.orders.insert_many(new_orders, ordered=False)
+        # The settle cutoff has whole-second precision
+        await asyncio.sleep(1)
+        try:
+            refresh = await recommendations.refresh(db, path, args.k)
+        finally:
+            await db.orders.delete_many({"_id": {"$gt": first_new}})
+
+        return {
+            "seed": seeded,
+            "k": args.k,
+            "snapshot_bytes": os.path.getsize(path),
+            "build": builds,
+            "load": load,
+            "lookup": lookup,
+            "refresh": {**refresh, "full_build_seconds": builds[0]["seconds"]},
+        }
+    finally:
+        for name in os.listdir(directory):
+            os.remove(os.path.join(directory, name))
+        os.rmdir(directory)
+        client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--products", type=int, default=10_000)
+    parser.add_argument("--order-lines", type=int, default=10_000_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--force", action="store_true", help="Reseed even if the scale matches")
+    parser.add_argument("--k", type=int, default=settings.RECOMMENDATIONS_TOP_K)
+    parser.add_argument("--limit", type=int, default=10, help="Recommendations per lookup")
+    parser.add_argument("--lookups", type=int, default=100_000)
+    parser.add_argument("--new-orders", type=int, default=10_000, help="Orders added before the refresh")
+    # Internal: one build in this process (see build_in_subprocess)
+    parser.add_argument("--build-only", choices=["numpy", "python"], help=argparse.SUPPRESS)
+    parser.add_argument("--path", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.build_only:
+        print(json.dumps(asyncio.run(build_only(args))))
+        return
+    print_json(asyncio.run(main_async(args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Confirmed orders/sec on a single hot SKU, unsharded vs sharded stock.
+
+Simulates a drop: --buyers concurrent buyers each repeatedly reserve one
+pair of the same product and place the order from the reservation, until
+the product sells out. Runs once per --shards value (1 = plain
+products.stock) against a scratch database and checks that exactly
+--stock orders were confirmed and nothing was left held.
+
+    python -m benchmarks.bench_reservations --stock 20000 --buyers 200 --shards 1 4 16
+"""
+import argparse
+import asyncio
+import sys
+import time
+
+from bson import ObjectId
+from fastapi import HTTPException
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app import inventory
+from app.config import settings
+from app.routes.orders import place_order, price_order_items, supports_transactions
+from app.schemas.schemas import OrderItemCreate
+from benchmarks.common import print_json, summarize
+from benchmarks.synthetic import make_products
+
+
+async def drop(db, shards, stock, buyers):
+    product = next(make_products(1))
+    product["stock"] = stock
+    product_id = str((await db.products.insert_one(product)).inserted_id)
+    if shards > 1:
+        await inventory.set_stock_shards(db, product_id, shards)
+
+    items = [OrderItemCreate(product_id=product_id, quantity=1)]
+    latencies = []
+    outcomes = {"confirmed": 0, "sold_out": 0, "expired": 0}
+
+    async def buyer():
+        user_id = str(ObjectId())
+        while True:
+            started = time.perf_counter()
+            try:
+                lines, total = await price_order_items(db, items)
+                reservation = await inventory.reserve(db, user_id, lines)
+                await place_order(db, user_id, lines, total, "1 Bench Street", reservation_id=reservation["_id"])
+            except HTTPException as e:
+                if e.status_code == 409:
+                    outcomes["sold_out"] += 1
+                    return
+                if e.status_code != 410:
+                    raise
+                outcomes["expired"] += 1
+                continue
+            latencies.append(time.perf_counter() - started)
+            outcomes["confirmed"] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*[buyer() for _ in range(buyers)])
+    elapsed = time.perf_counter() - started
+
+    stats = summarize(latencies, elapsed)
+    return {
+        "shards": shards,
+        **outcomes,
+        "confirmed_orders_per_sec": round(outcomes["confirmed"] / elapsed, 1) if elapsed else 0.0,
+        "latency": stats,
+        "left_in_stock": (await inventory.stock_level(db, product_id))["available"],
+        "still_held": await db.reservations.count_documents({"status": inventory.HELD}),
+        "orders_written": await db.orders.count_documents({"items.product_id": product_id}),
+    }
+
+
+async def main_async(args):
+    client = AsyncIOMotorClient(settings.MONGODB_URL, maxPoolSize=args.pool_size)
+    await client.admin.command("ping")
+    db = client[f"{settings.DATABASE_NAME}_bench_reservations"]
+    runs = []
+    try:
+        for shards in args.shards:
+            await client.drop_database(db.name)
+            runs.append(await drop(db, shards, args.stock, args.buyers))
+        return {
+            "topology": client.topology_description.topology_type_name,
+            "transactions": supports_transactions(client),
+            "stock": args.stock,
+            "buyers": args.buyers,
+            "runs": runs,
+        }
+    finally:
+        await client.drop_database(db.name)
+        client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--stock", type=int, default=20000)
+    parser.add_argument("--buyers", type=int, default=200)
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--pool-size", type=int, default=100)
+    args = parser.parse_args()
+    result = asyncio.run(main_async(args))
+    print_json(result)
+    for run in result["runs"]:
+        if run["orders_written"] != args.stock or run["left_in_stock"] != 0 or run["still_held"]:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Sales rollups: rebuild throughput and query latency vs scanning orders.
+
+Seeds --products products and --orders synthetic orders (10M by default;
+reused across runs unless --force), then:
+
+- rebuild: app.analytics.rebuild() over every order, at each --chunk-sizes
+- incremental: record_order() calls per second
+- query: "revenue per category per day" for the last --days days, from the
+  rollups vs the equivalent $unwind/$group over orders
+
+    python -m benchmarks.bench_rollups --orders 10000000 --chunk-sizes 20000,100000
+"""
+import argparse
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app import analytics
+from app.config import settings
+from app.indexes import ensure_indexes
+from benchmarks.common import print_json, summarize
+from benchmarks.synthetic import make_orders, seed_orders, seed_products
+
+DATABASE = f"{settings.DATABASE_NAME}_bench_rollups"
+
+
+async def seed(db, args) -> dict:
+    scale = {"products": args.products, "orders": args.orders, "seed": args.seed}
+    meta = await db.bench_meta.find_one({"_id": "scale"})
+    if not args.force and meta is not None and meta.get("scale") == scale:
+        return {"reused": True, **scale}
+
+    await db.client.drop_database(db.name)
+    await ensure_indexes(db)
+    await seed_products(db.products, args.products, seed=args.seed)
+    products = await db.products.find({}, {"name": 1, "price": 1, "category": 1}) \
+        .sort("category", 1).to_list(length=None)
+
+    started = time.perf_counter()
+    await seed_orders(db.orders, args.orders, products, seed=args.seed)
+    seconds = time.perf_counter() - started
+    await db.bench_meta.replace_one({"_id": "scale"}, {"scale": scale}, upsert=True)
+    return {"reused": False, **scale, "orders_seconds": round(seconds, 1)}
+
+
+def scan_pipeline(start: str) -> list:
+    """The report computed straight from orders"""
+    return [
+        {"$match": {"created_at": {"$gte": datetime.strptime(start, analytics.DAY_FORMAT)}}},
+        {"$unwind": "$items"},
+        {"$group": {
+            "_id": {
+                "day": {"$dateToString": {"format": analytics.DAY_FORMAT, "date": "$created_at"}},
+                "category": "$items.category",
+            },
+            "revenue": {"$sum": {"$multiply": ["$items.quantity", "$items.price"]}},
+        }},
+    ]
+
+
+async def timed(fetch, rounds):
+    latencies = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        await fetch()
+        latencies.append(time.perf_counter() - started)
+    return summarize(latencies)
+
+
+async def main_async(args):
+    client = AsyncIOMotorClient(settings.MONGODB_URL)
+    db = client[DATABASE]
+    try:
+        seeded = await seed(db, args)
+
+        rebuilds = []
+        for chunk_size in args.chunk_sizes:
+            result = await analytics.rebuild(db, chunk_size=chunk_size)
+            result["orders_per_sec"] = round(result["orders"] / result["seconds"]) if result["seconds"] else None
+            rebuilds.append({"chunk_size": chunk_size, **result})
+
+        # Incremental updates, on orders that are not in the collection
+        products = await db.products.find({}, {"name": 1, "price": 1, "category": 1}) \
+            .limit(1000).to_list(length=None)
+        orders = list(make_orders(args.incremental, products, seed=args.seed + 1))
+        for index, order in enumerate(orders):
+            order["_id"] = index
+        started = time.perf_counter()
+        for order in orders:
+            await analytics.record_order(db, order)
+        incremental_seconds = time.perf_counter() - started
+        # Put the rollups back in line with the orders collection
+        await analytics.rebuild(db, chunk_size=max(args.chunk_sizes))
+
+        start = (datetime.utcnow() - timedelta(days=args.days)).strftime(analytics.DAY_FORMAT)
+        rollup_query = await timed(
+            lambda: analytics.sales(db, start=start, group_by=("day", "category")), args.rounds
+        )
+        scan_query = await timed(
+            lambda: db.orders.aggregate(scan_pipeline(start), allowDiskUse=True).to_list(length=None),
+            args.scan_rounds,
+        )
+
+        return {
+            "seed": seeded,
+            "rebuild": rebuilds,
+            "incremental": {
+                "orders": args.incremental,
+                "orders_per_sec": round(args.incremental / incremental_seconds),
+            },
+            "revenue_per_category_per_day": {
+                "days": args.days,
+                "rollups": rollup_query,
+                "scan_orders": scan_query,
+            },
+        }
+    finally:
+        client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--products", type=int, default=10_000)
+    parser.add_argument("--orders", type=int, default=10_000_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--force", action="store_true", help="Reseed even if the scale matches")
+    parser.add_argument("--chunk-sizes", default="50000",
+                        type=lambda text: [int(n) for n in text.split(",")], help="Comma-separated")
+    parser.add_argument("--incremental", type=int, default=5000, help="record_order calls to time")
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--rounds", type=int, default=50)
+    parser.add_argument("--scan-rounds", type=int, default=3)
+    args = parser.parse_args()
+    print_json(asyncio.run(main_async(args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Product search: unanchored $regex scans vs the in-process search index.
+
+Seeds --products synthetic products into a scratch database, then times
+the old three-field $regex query and app.search against the same queries.
+
+    python -m benchmarks.bench_search --products 100000
+"""
+import argparse
+import asyncio
+import time
+import tracemalloc
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.config import settings
+from app.search import CatalogSearch
+from benchmarks.common import print_json, summarize
+from benchmarks.synthetic import seed_products
+
+QUERIES = ["pegasus", "air max", "running carbon", "vaporfy", "bask", "waterproof leather", "jordan retro", "zoom"]
+
+
+async def regex_search(db, query):
+    cursor = db.products.find({
+        "$or": [
+            {"name": {"$regex": query, "$options": "i"}},
+            {"description": {"$regex": query, "$options": "i"}},
+            {"category": {"$regex": query, "$options": "i"}}
+        ]
+    })
+    return await cursor.to_list(length=100)
+
+
+async def time_queries(search, rounds):
+    latencies = []
+    for _ in range(rounds):
+        for query in QUERIES:
+            started = time.perf_counter()
+            await search(query)
+            latencies.append(time.perf_counter() - started)
+    return summarize(latencies)
+
+
+async def main_async(args):
+    client = AsyncIOMotorClient(settings.MONGODB_URL)
+    db = client[f"{settings.DATABASE_NAME}_bench_search"]
+    await db.products.drop()
+    try:
+        await seed_products(db.products, args.products)
+
+        catalog_search = CatalogSearch(max_age=float("inf"))
+        tracemalloc.start()
+        started = time.perf_counter()
+        await catalog_search.rebuild(db)
+        build_seconds = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        regex = await time_queries(lambda q: regex_search(db, q), args.rounds)
+        index = await time_queries(lambda q: catalog_search.search(db, q, limit=100), args.rounds)
+        return {
+            "products": args.products,
+            "regex": regex,
+            "index": {**index, "build_sec": round(build_seconds, 3), "build_peak_mb": round(peak / 2**20, 1)},
+        }
+    finally:
+        await client.drop_database(db.name)
+        client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--products", type=int, default=100_000)
+    parser.add_argument("--rounds", type=int, default=10)
+    args = parser.parse_args()
+    print_json(asyncio.run(main_async(args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+List response encoding: FastAPI/Pydantic response_model vs app.serialization.
+
+Encodes --page-size synthetic product and order documents per iteration
+with both paths on a single core, reports pages/sec for each, and checks
+that both paths produce the same JSON (exits non-zero if they differ).
+Needs no database.
+
+    python -m benchmarks.bench_serialization --page-size 100
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from typing import List
+
+from bson import ObjectId
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from app.schemas.schemas import OrderResponse, ProductResponse
+from app.serialization import orjson, render_documents
+from benchmarks.common import print_json
+from benchmarks.synthetic import make_products
+
+
+def make_orders(count):
+    products = list(make_products(count))
+    return [
+        {
+            "_id": ObjectId(),
+            "user_id": str(ObjectId()),
+            "items": [
+                {"product_id": str(ObjectId()), "product_name": p["name"], "quantity": 2, "price": p["price"]}
+                for p in products[i:i + 3]
+            ],
+            "total": sum(p["price"] * 2 for p in products[i:i + 3]),
+            "status": "pending",
+            "shipping_address": "1 Main Street",
+            "created_at": product["created_at"],
+        }
+        for i, product in enumerate(products)
+    ]
+
+
+async def pydantic_path(field, documents):
+    for document in documents:
+        document["_id"] = str(document["_id"])
+    content = await serialize_response(field=field, response_content=documents)
+    return JSONResponse(content).body
+
+
+def fast_path(model, documents):
+    return render_documents(model, documents).body
+
+
+def fresh(documents):
+    return [dict(document) for document in documents]
+
+
+async def measure(model, documents, seconds):
+    field = create_response_field("Response", List[model])
+    slow_body = await pydantic_path(field, fresh(documents))
+    fast_body = fast_path(model, fresh(documents))
+    conforms = json.loads(slow_body) == json.loads(fast_body)
+
+    results = {"conforms": conforms, "page_bytes": len(fast_body)}
+    for label, run in (
+        ("pydantic", lambda docs: pydantic_path(field, docs)),
+        ("fast", lambda docs: fast_path(model, docs)),
+    ):
+        pages = 0
+        started = time.perf_counter()
+        while time.perf_counter() - started < seconds:
+            result = run(fresh(documents))
+            if asyncio.iscoroutine(result):
+                await result
+            pages += 1
+        results[f"{label}_pages_per_sec"] = round(pages / (time.perf_counter() - started), 1)
+    results["speedup"] = round(results["fast_pages_per_sec"] / results["pydantic_pages_per_sec"], 2)
+    return results
+
+
+async def main_async(args):
+    products = list(make_products(args.page_size))
+    for product in products:
+        product["_id"] = ObjectId()
+    # Exercise default filling and extra-key dropping as well
+    products[0].pop("image_url")
+    products[1]["internal_note"] = "not part of the schema"
+
+    return {
+        "encoder": "orjson" if orjson is not None else "json",
+        "page_size": args.page_size,
+        "products": await measure(ProductResponse, products, args.seconds),
+        "orders": await measure(OrderResponse, make_orders(args.page_size), args.seconds),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--seconds", type=float, default=3.0)
+    args = parser.parse_args()
+    result = asyncio.run(main_async(args))
+    print_json(result)
+    if not (result["products"]["conforms"] and result["orders"]["conforms"]):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
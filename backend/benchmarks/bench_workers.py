@@ -0,0 +1,118 @@
+"""
+Requests/sec as the production server scales from 1 to N workers.
+
+Seeds (or reuses) the benchmark database, then for each worker count starts
+`python -m app.server --workers N` and drives --path with --concurrency
+keep-alive connections for --duration seconds. Load comes from --clients
+separate processes so the load generator is not the bottleneck; give it
+its own cores (or machine) when measuring large N.
+
+    python -m benchmarks.bench_workers --max-workers 8 --duration 20
+    python -m benchmarks.bench_workers --workers 1,2,4 --path "/products/search/air max"
+"""
+import argparse
+import asyncio
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import httpx
+
+from benchmarks import seed as seeding
+from benchmarks.common import print_json, run_server, summarize
+from app.server import available_cpus
+
+
+async def _drive(base_url, path, connections, duration, warmup):
+    latencies = []
+    limits = httpx.Limits(max_connections=connections, max_keepalive_connections=connections)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        errors = 0
+        recording_from = time.monotonic() + warmup
+        stop_at = recording_from + duration
+
+        async def loop():
+            nonlocal errors
+            while time.monotonic() < stop_at:
+                started = time.perf_counter()
+                try:
+                    response = await client.get(path)
+                    failed = response.status_code >= 400
+                except httpx.HTTPError:
+                    failed = True
+                if time.monotonic() >= recording_from:
+                    if failed:
+                        errors += 1
+                    else:
+                        latencies.append(time.perf_counter() - started)
+
+        await asyncio.gather(*[loop() for _ in range(connections)])
+    return latencies, errors
+
+
+def _client_process(base_url, path, connections, duration, warmup):
+    return asyncio.run(_drive(base_url, path, connections, duration, warmup))
+
+
+def load(base_url, args):
+    """Run --clients load processes at once; returns all latencies and errors"""
+    per_client = max(1, args.concurrency // args.clients)
+    with ProcessPoolExecutor(max_workers=args.clients) as pool:
+        futures = [
+            pool.submit(_client_process, base_url, args.path, per_client, args.duration, args.warmup)
+            for _ in range(args.clients)
+        ]
+        results = [future.result() for future in futures]
+    latencies = [latency for values, _ in results for latency in values]
+    return latencies, sum(errors for _, errors in results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    seeding.add_arguments(parser)
+    parser.add_argument("--path", default="/products/?limit=20&view=card", help="Endpoint to load")
+    parser.add_argument("--workers", help="Comma-separated worker counts (default: 1, 2, 4, ... up to --max-workers)")
+    parser.add_argument("--max-workers", type=int, default=available_cpus())
+    parser.add_argument("--concurrency", type=int, default=256, help="Open connections in total")
+    parser.add_argument("--clients", type=int, default=4, help="Load generator processes")
+    parser.add_argument("--duration", type=float, default=15.0)
+    parser.add_argument("--warmup", type=float, default=3.0)
+    parser.add_argument("--port", type=int, default=8100)
+    args = parser.parse_args()
+
+    if args.workers:
+        counts = [int(n) for n in args.workers.split(",")]
+    else:
+        counts, n = [], 1
+        while n < args.max_workers:
+            counts.append(n)
+            n *= 2
+        counts.append(args.max_workers)
+
+    seeded = asyncio.run(seeding.seed(args.database, args.products, args.users, args.seed, args.stock, args.force))
+
+    runs = []
+    for workers in counts:
+        with run_server(port=args.port, env={"DATABASE_NAME": args.database}, workers=workers) as base_url:
+            latencies, errors = load(base_url, args)
+        runs.append({"workers": workers, "errors": errors, **summarize(latencies, args.duration)})
+
+    baseline = runs[0]["requests_per_sec"] / runs[0]["workers"] if runs and runs[0]["requests_per_sec"] else None
+    for run in runs:
+        # 1.0 = perfectly linear from the first run
+        run["scaling_efficiency"] = (
+            round(run["requests_per_sec"] / (baseline * run["workers"]), 2) if baseline else None
+        )
+
+    print_json({
+        "path": args.path,
+        "cpus": available_cpus(),
+        "concurrency": args.concurrency,
+        "clients": args.clients,
+        "duration_sec": args.duration,
+        "seed": seeded,
+        "runs": runs,
+    })
+
+
+if __name__ == "__main__":
+    main()
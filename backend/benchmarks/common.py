@@ -0,0 +1,124 @@
+"""
+Shared helpers for the benchmark scripts
+"""
+import asyncio
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+import httpx
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def summarize(latencies, elapsed=None):
+    """Latency summary in milliseconds for a list of durations in seconds"""
+    summary = {
+        "count": len(latencies),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "max_ms": round(max(latencies) * 1000, 3) if latencies else 0.0,
+    }
+    if elapsed:
+        summary["requests_per_sec"] = round(len(latencies) / elapsed, 1)
+    return summary
+
+
+def print_json(result):
+    print(json.dumps(result, indent=2, default=str))
+
+
+def rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except OSError:
+        # ru_maxrss is in KB on Linux; only the lifetime peak is available
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def measured(coro):
+    """Run coro while sampling RSS; returns (result, seconds, start MB, peak MB)"""
+    start = peak = rss_mb()
+    done = asyncio.Event()
+
+    async def sample():
+        nonlocal peak
+        while not done.is_set():
+            peak = max(peak, rss_mb())
+            await asyncio.sleep(0.05)
+
+    sampler = asyncio.create_task(sample())
+    started = time.perf_counter()
+    try:
+        result = await coro
+    finally:
+        elapsed = time.perf_counter() - started
+        done.set()
+        await sampler
+    return result, elapsed, start, max(peak, rss_mb())
+
+
+@contextmanager
+def run_server(port=8100, env=None, workers=1):
+    """Start the production server (app.server) in a subprocess and wait for /health"""
+    server_env = {**os.environ, **(env or {})}
+    process = subprocess.Popen(
+        [
+            sys.executable, "-m", "app.server",
+            "--host", "127.0.0.1", "--port", str(port),
+            "--workers", str(workers), "--log-level", "warning",
+        ],
+        cwd=BACKEND_DIR,
+        env=server_env,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                if httpx.get(f"{base_url}/health").status_code == 200:
+                    break
+            except httpx.HTTPError:
+                pass
+            if process.poll() is not None or time.monotonic() > deadline:
+                raise RuntimeError("Server did not start")
+            time.sleep(0.2)
+        yield base_url
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+
+async def ensure_user(client, email, password):
+    """Sign up a benchmark user, ignoring "already registered" errors"""
+    response = await client.post("/auth/signup", json={
+        "email": email,
+        "password": password,
+        "first_name": "Bench",
+        "last_name": "User",
+    })
+    if response.status_code not in (201, 400):
+        response.raise_for_status()
+
+
+async def login(client, email, password):
+    """Log in and return an Authorization header"""
+    response = await client.post("/auth/login-json", json={"email": email, "password": password})
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
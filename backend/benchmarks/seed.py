@@ -0,0 +1,83 @@
+"""
+Seed a benchmark database with a synthetic catalog and users.
+
+Data is generated from a fixed seed, so the same --products/--users/--seed
+always produce the same database. Reruns are skipped when the database
+already holds that scale (pass --force to rebuild). Every user's password
+is PASSWORD; it is hashed once and shared, so 100k users seed in seconds.
+
+Needs a mongod at MONGODB_URL. Any server works; for a throwaway
+in-memory stand-in, start one on a tmpfs dbpath:
+
+    mongod --dbpath /dev/shm/nike-bench --port 27017
+    python -m benchmarks.seed --products 100000 --users 100000
+"""
+import argparse
+import asyncio
+import time
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.auth import get_password_hash
+from app.config import settings
+from app.indexes import ensure_indexes
+from benchmarks.common import print_json
+from benchmarks.synthetic import seed_products, seed_users
+
+PASSWORD = "bench-password"
+DEFAULT_DATABASE = f"{settings.DATABASE_NAME}_bench"
+META_ID = "scale"
+
+
+async def seed(database: str, products: int, users: int, seed_value: int, stock: int, force: bool = False) -> dict:
+    """Create (or reuse) a benchmark database at the given scale"""
+    client = AsyncIOMotorClient(settings.MONGODB_URL)
+    db = client[database]
+    scale = {"products": products, "users": users, "seed": seed_value, "stock": stock}
+    try:
+        meta = await db.bench_meta.find_one({"_id": META_ID})
+        if not force and meta is not None and meta.get("scale") == scale:
+            return {"database": database, "reused": True, **scale}
+
+        await client.drop_database(database)
+        problems = await ensure_indexes(db)
+
+        started = time.perf_counter()
+        await seed_products(db.products, products, seed=seed_value, stock=stock)
+        products_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        await seed_users(db.users, users, get_password_hash(PASSWORD), seed=seed_value)
+        users_seconds = time.perf_counter() - started
+
+        await db.bench_meta.replace_one({"_id": META_ID}, {"scale": scale}, upsert=True)
+        return {
+            "database": database,
+            "reused": False,
+            **scale,
+            "products_seconds": round(products_seconds, 2),
+            "users_seconds": round(users_seconds, 2),
+            "index_problems": problems,
+        }
+    finally:
+        client.close()
+
+
+def add_arguments(parser):
+    parser.add_argument("--database", default=DEFAULT_DATABASE)
+    parser.add_argument("--products", type=int, default=10_000)
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--stock", type=int, default=1_000_000, help="Pairs in stock per product")
+    parser.add_argument("--force", action="store_true", help="Rebuild even if the scale matches")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    add_arguments(parser)
+    args = parser.parse_args()
+    print_json(asyncio.run(seed(args.database, args.products, args.users, args.seed, args.stock, args.force)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Synthetic catalog data for the benchmarks
+"""
+import random
+from datetime import datetime, timedelta
+from typing import Optional
+
+CATEGORIES = ["Running", "Basketball", "Football", "Lifestyle", "Training", "Tennis", "Golf", "Skateboarding"]
+LINES = ["Air Max", "Air Force", "Pegasus", "Vaporfly", "Invincible", "Zoom", "React", "Jordan", "Dunk", "Blazer",
+         "Cortez", "Metcon", "Phantom", "Mercurial", "Infinity", "Structure", "Vomero", "Alphafly"]
+ADJECTIVES = ["premium", "lightweight", "responsive", "breathable", "durable", "cushioned", "stable", "grippy",
+              "waterproof", "classic", "retro", "carbon", "foam", "knit", "leather", "mesh"]
+NOUNS = ["comfort", "speed", "support", "traction", "cushioning", "plate", "upper", "outsole", "heel", "design"]
+
+
+def make_product(rng: random.Random, index: int, now: datetime) -> dict:
+    line = rng.choice(LINES)
+    category = rng.choice(CATEGORIES)
+    words = [f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)}" for _ in range(6)]
+    return {
+        "name": f"Nike {line} {rng.randint(1, 99)} {category} Edition {index}",
+        "description": f"The Nike {line} brings " + ", ".join(words) + ".",
+        "price": float(rng.randrange(2995, 24995, 100)),
+        "category": category,
+        "image_url": f"/assets/synthetic/{index}.jpg",
+        "stock": rng.randint(0, 200),
+        "created_at": now - timedelta(seconds=index),
+    }
+
+
+def make_products(count: int, seed: int = 42):
+    """Yield `count` reproducible synthetic products"""
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    for index in range(count):
+        yield make_product(rng, index, now)
+
+
+async def seed_products(collection, count: int, batch_size: int = 5000, seed: int = 42,
+                        stock: Optional[int] = None):
+    """Insert `count` synthetic products in batches, optionally all with `stock` pairs"""
+    batch = []
+    for product in make_products(count, seed=seed):
+        if stock is not None:
+            product["stock"] = stock
+        batch.append(product)
+        if len(batch) >= batch_size:
+            await collection.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        await collection.insert_many(batch, ordered=False)
+
+
+def user_email(index: int) -> str:
+    return f"bench-user-{index}@example.com"
+
+
+def make_users(count: int, hashed_password: str, seed: int = 42):
+    """Yield `count` synthetic users sharing one password hash"""
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    for index in range(count):
+        yield {
+            "email": user_email(index),
+            "first_name": "Bench",
+            "last_name": f"User {index}",
+            "country": rng.choice(["India", "United States", "United Kingdom", "Japan", "Germany"]),
+            "newsletter_subscription": False,
+            "hashed_password": hashed_password,
+            "created_at": now - timedelta(seconds=index),
+        }
+
+
+async def seed_users(collection, count: int, hashed_password: str, batch_size: int = 5000, seed: int = 42):
+    """Insert `count` synthetic users in batches"""
+    batch = []
+    for user in make_users(count, hashed_password, seed=seed):
+        batch.append(user)
+        if len(batch) >= batch_size:
+            await collection.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        await collection.insert_many(batch, ordered=False)
+
+
+ORDER_STATUSES = ["pending", "processing", "shipped", "delivered", "cancelled"]
+ORDER_STATUS_WEIGHTS = [10, 10, 15, 60, 5]
+
+
+def make_orders(count: int, products: list, seed: int = 42, days: int = 365, users: int = 10_000):
+    """Yield `count` synthetic orders over `products` (dicts with _id, name, price, category).
+
+    Popular products are picked more often, and the other items of an
+    order usually come from near the first one in `products`, so
+    "bought together" pairs repeat across orders.
+    """
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    n = len(products)
+    for _ in range(count):
+        anchor = int(n * rng.random() ** 2)
+        picked = {anchor}
+        for _ in range(rng.choice([0, 1, 1, 2, 3])):
+            if rng.random() < 0.7:
+                picked.add((anchor + rng.randint(1, 20)) % n)
+            else:
+                picked.add(rng.randrange(n))
+        items = []
+        for index in picked:
+            product = products[index]
+            items.append({
+                "product_id": str(product["_id"]),
+                "product_name": product["name"],
+                "quantity": rng.choice([1, 1, 1, 2, 3]),
+                "price": product["price"],
+                "category": product["category"],
+            })
+        yield {
+            "user_id": f"bench-user-{rng.randrange(users)}",
+            "items": items,
+            "total": sum(item["price"] * item["quantity"] for item in items),
+            "status": rng.choices(ORDER_STATUSES, ORDER_STATUS_WEIGHTS)[0],
+            "shipping_address": "1 Bench Street",
+            "created_at": now - timedelta(seconds=rng.randrange(days * 86400)),
+        }
+
+
+async def seed_orders(collection, count: int, products: list, batch_size: int = 10_000, seed: int = 42):
+    """Insert `count` synthetic orders in batches"""
+    batch = []
+    for order in make_orders(count, products, seed=seed):
+        batch.append(order)
+        if len(batch) >= batch_size:
+            await collection.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        await collection.insert_many(batch, ordered=False)
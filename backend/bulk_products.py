@@ -0,0 +1,82 @@
+"""
+Bulk import and export of the product catalog from the command line.
+
+Uses the same streaming pipeline as POST /products/bulk and
+GET /products/export, straight against the database.
+
+    python bulk_products.py import products.ndjson
+    python bulk_products.py import products.csv --chunk-size 2000
+    python bulk_products.py export products.csv
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app import bulk
+from app.config import settings
+from app.indexes import ensure_indexes
+
+
+def _format(path: str, given: str) -> str:
+    if given:
+        return given
+    return "csv" if path.lower().endswith(".csv") else "ndjson"
+
+
+async def run_import(db, path: str, fmt: str, chunk_size: int) -> bool:
+    for problem in await ensure_indexes(db):
+        print(f"⚠️  Index could not be created: {problem}")
+
+    started = time.perf_counter()
+    report = await bulk.import_products(db, bulk.iter_file_lines(path), fmt, chunk_size)
+    elapsed = time.perf_counter() - started
+
+    for error in report.errors:
+        print(f"❌ Row {error['row']}: {error['error']}")
+    if report.failed > len(report.errors):
+        print(f"❌ ... and {report.failed - len(report.errors)} more")
+    summary = {k: v for k, v in report.as_dict().items() if k != "errors"}
+    print(f"✅ Imported {path} in {elapsed:.1f}s ({report.rows / elapsed if elapsed else 0:,.0f} rows/s)")
+    print(json.dumps(summary, indent=2))
+    return report.failed == 0
+
+
+async def run_export(db, path: str, fmt: str) -> bool:
+    started = time.perf_counter()
+    size = 0
+    with open(path, "wb") as f:
+        async for chunk in bulk.export_products(db, fmt):
+            f.write(chunk)
+            size += len(chunk)
+    print(f"✅ Exported {size:,} bytes to {path} in {time.perf_counter() - started:.1f}s")
+    return True
+
+
+async def main_async(args) -> bool:
+    client = AsyncIOMotorClient(settings.MONGODB_URL)
+    db = client[settings.DATABASE_NAME]
+    try:
+        fmt = _format(args.path, args.format)
+        if args.command == "import":
+            return await run_import(db, args.path, fmt, args.chunk_size)
+        return await run_export(db, args.path, fmt)
+    finally:
+        client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk product import/export")
+    parser.add_argument("command", choices=["import", "export"])
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=["ndjson", "csv"], help="Default: from the file extension")
+    parser.add_argument("--chunk-size", type=int, default=settings.BULK_IMPORT_CHUNK_SIZE)
+    args = parser.parse_args()
+    return asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,40 @@
+"""
+Verify that every hot query is served by an index.
+
+Creates the declared indexes, explains each query registered with
+app.indexes.hot_query() and exits with status 1 if any winning plan is a
+COLLSCAN, so it can gate CI against a test database. An index blocked by
+existing duplicates is reported with the migration that removes them.
+
+    python check_indexes.py
+"""
+import asyncio
+import sys
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.config import settings
+from app.indexes import HOT_QUERIES, ensure_indexes, find_collscans
+
+
+async def check_indexes() -> bool:
+    client = AsyncIOMotorClient(settings.MONGODB_URL)
+    db = client[settings.DATABASE_NAME]
+    try:
+        problems = await ensure_indexes(db)
+        for problem in problems:
+            print(f"❌ Index could not be created: {problem}")
+        
+        collscans = await find_collscans(db)
+    finally:
+        client.close()
+    
+    for name, stages in collscans:
+        print(f"❌ {name}: {' <- '.join(stages)}")
+    if not collscans:
+        print(f"✅ All {len(HOT_QUERIES)} hot queries use an index")
+    return not problems and not collscans
+
+
+if __name__ == "__main__":
+    sys.exit(0 if asyncio.run(check_indexes()) else 1)
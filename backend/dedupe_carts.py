@@ -0,0 +1,79 @@
+"""
+Merge duplicate carts before creating the unique carts.user_id index.
+
+Databases from before the index can hold several carts for one user. Each
+user's carts are merged into the most recently updated one: quantities of
+the same product are added up (at that cart's price) and the total is
+recomputed. The other carts are deleted.
+
+    python dedupe_carts.py --dry-run
+    python dedupe_carts.py
+"""
+import argparse
+import asyncio
+import sys
+from datetime import datetime
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.config import settings
+
+DUPLICATES_PIPELINE = [
+    {"$group": {"_id": "$user_id", "carts": {"$push": "$_id"}, "count": {"$sum": 1}}},
+    {"$match": {"count": {"$gt": 1}}},
+]
+
+
+def merge_carts(carts: list) -> dict:
+    """Items and total of the merged cart; `carts` newest first"""
+    items = {}
+    for cart in carts:
+        for item in cart.get("items") or []:
+            merged = items.get(item["product_id"])
+            if merged is None:
+                items[item["product_id"]] = dict(item)
+            else:
+                merged["quantity"] += item["quantity"]
+    total = sum(item["price"] * item["quantity"] for item in items.values())
+    return {"items": list(items.values()), "total": total}
+
+
+async def dedupe_carts(db, dry_run: bool = False) -> dict:
+    """Merge every user's carts into one. Returns users and carts affected"""
+    users = removed = 0
+    async for group in db.carts.aggregate(DUPLICATES_PIPELINE):
+        carts = await db.carts.find({"_id": {"$in": group["carts"]}}).to_list(length=None)
+        carts.sort(key=lambda cart: cart.get("updated_at") or datetime.min, reverse=True)
+        users += 1
+        removed += len(carts) - 1
+        if dry_run:
+            continue
+        kept, others = carts[0], [cart["_id"] for cart in carts[1:]]
+        await db.carts.update_one(
+            {"_id": kept["_id"]},
+            {"$set": {**merge_carts(carts), "updated_at": datetime.utcnow()}}
+        )
+        await db.carts.delete_many({"_id": {"$in": others}})
+    return {"users": users, "carts_removed": removed}
+
+
+async def main_async(args) -> bool:
+    client = AsyncIOMotorClient(settings.MONGODB_URL)
+    try:
+        report = await dedupe_carts(client[settings.DATABASE_NAME], args.dry_run)
+    finally:
+        client.close()
+    verb = "Would merge" if args.dry_run else "Merged"
+    print(f"✅ {verb} the carts of {report['users']} users ({report['carts_removed']} carts removed)")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Merge duplicate carts per user")
+    parser.add_argument("--dry-run", action="store_true", help="Only count the duplicates")
+    args = parser.parse_args()
+    return asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
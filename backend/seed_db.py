@@ -2,6 +2,7 @@
 import asyncio
 from motor.motor_asyncio import AsyncIOMotorClient
 from datetime import datetime
+from app.indexes import ensure_indexes
 
 # Sample products
 PRODUCTS = [
@@ -75,12 +76,10 @@ async def seed_database():
     result = await db.products.insert_many(PRODUCTS)
     print(f"✅ Inserted {len(result.inserted_ids)} products")
     
-    # Create indexes
-    await db.users.create_index("email", unique=True)
-    await db.products.create_index("category")
-    await db.products.create_index("name")
-    await db.carts.create_index("user_id", unique=True)
-    await db.orders.create_index("user_id")
+    # Create indexes declared by the routes
+    problems = await ensure_indexes(db)
+    for problem in problems:
+        print(f"⚠️  {problem}")
     print("✅ Created database indexes")
     
     client.close()
@@ -0,0 +1,93 @@
+"""
+Shared fixtures: the app on an in-memory MongoDB, or on a real one.
+
+By default the database is mongomock-motor. Set TEST_MONGODB_URL (e.g.
+mongodb://localhost:27017) to run against a real server instead; each
+test then gets its own database, dropped afterwards. Tests that need
+server features mongomock lacks (update pipelines, $merge, real
+concurrency) are marked with `requires_mongodb` and skipped without it.
+
+The app's lifespan (connection, background tasks) is not run. The
+declared indexes are created on real test databases only: mongomock
+ignores partial filters, so the sparse unique ones would misfire there.
+Requests and `run()` share the TestClient's event loop, so Motor stays on
+one loop.
+"""
+import uuid
+from contextlib import asynccontextmanager
+
+import pytest
+from fastapi.testclient import TestClient
+from mongomock_motor import AsyncMongoMockClient
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.cache import cart_summary_cache, catalog_cache, principal_cache
+from app.config import settings
+from app.database import get_db
+from app.indexes import ensure_indexes
+from app.main import app
+from app.search import catalog_search
+from tests.support import TEST_MONGODB_URL, login, signup
+
+
+@asynccontextmanager
+async def _no_lifespan(app):
+    yield
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    for cache in (catalog_cache, principal_cache, cart_summary_cache):
+        cache.clear()
+    catalog_search.clear()
+    yield
+    app.dependency_overrides.clear()
+
+
+@pytest.fixture
+def client():
+    lifespan = app.router.lifespan_context
+    app.router.lifespan_context = _no_lifespan
+    try:
+        with TestClient(app) as test_client:
+            yield test_client
+    finally:
+        app.router.lifespan_context = lifespan
+
+
+@pytest.fixture
+def run(client):
+    """run(async_fn, *args): call a coroutine function on the app's event loop"""
+    return client.portal.call
+
+
+@pytest.fixture
+def db(client, run):
+    if TEST_MONGODB_URL is None:
+        database = AsyncMongoMockClient()[settings.DATABASE_NAME]
+    else:
+        async def connect():
+            return AsyncIOMotorClient(TEST_MONGODB_URL)
+
+        motor = run(connect)
+        database = motor[f"{settings.DATABASE_NAME}_test_{uuid.uuid4().hex[:12]}"]
+        problems = run(ensure_indexes, database)
+        assert not problems, problems
+    app.dependency_overrides[get_db] = lambda: database
+    yield database
+
+    if TEST_MONGODB_URL is not None:
+        run(motor.drop_database, database.name)
+        motor.close()
+
+
+@pytest.fixture
+def auth_headers(client, db) -> dict:
+    """Headers for a freshly signed-up user"""
+    signup(client)
+    return login(client)
+
+
+@pytest.fixture
+def user_id(client, auth_headers) -> str:
+    return client.get("/auth/me", headers=auth_headers).json()["_id"]
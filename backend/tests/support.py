@@ -0,0 +1,42 @@
+"""
+Helpers shared by the tests
+"""
+import os
+from datetime import datetime
+
+import pytest
+
+TEST_MONGODB_URL = os.environ.get("TEST_MONGODB_URL")
+PASSWORD = "correct horse battery"
+
+requires_mongodb = pytest.mark.skipif(
+    TEST_MONGODB_URL is None, reason="needs a real MongoDB (set TEST_MONGODB_URL)"
+)
+
+
+def signup(client, email: str = "runner@example.com", password: str = PASSWORD) -> dict:
+    response = client.post("/auth/signup", json={
+        "email": email, "password": password, "first_name": "Test", "last_name": "Runner",
+    })
+    assert response.status_code == 201, response.text
+    return response.json()
+
+
+def login(client, email: str = "runner@example.com", password: str = PASSWORD) -> dict:
+    response = client.post("/auth/login-json", json={"email": email, "password": password})
+    assert response.status_code == 200, response.text
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def product(**fields) -> dict:
+    """A product document for inserting directly"""
+    return {
+        "name": "Air Zoom Pegasus", "description": "Daily trainer", "price": 120.0,
+        "category": "Running", "image_url": None, "stock": 10, "created_at": datetime.utcnow(), **fields,
+    }
+
+
+async def insert_products(db, *products) -> list:
+    """Insert product documents; returns their ids as strings"""
+    result = await db.products.insert_many(list(products))
+    return [str(product_id) for product_id in result.inserted_ids]
@@ -0,0 +1,97 @@
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+
+from app import analytics
+from tests.support import requires_mongodb
+
+
+def _order(status: str = "pending", day: int = 1, lines=(("Running", 2, 100.0),)) -> dict:
+    return {
+        "_id": ObjectId(), "user_id": "u1", "status": status, "created_at": datetime(2024, 3, day, 12),
+        "items": [{"product_id": str(ObjectId()), "product_name": "Shoe", "quantity": quantity,
+                   "price": price, "category": category} for category, quantity, price in lines],
+    }
+
+
+def _sales(db, run, group_by=("day", "category", "status")) -> list:
+    return run(analytics.sales, db, None, None, None, None, group_by)
+
+
+def test_rollups_follow_orders_and_status_changes(db, run):
+    first = _order(lines=[("Running", 2, 100.0), ("Lifestyle", 1, 80.0)])
+    second = _order(day=2)
+    for order in (first, second):
+        run(analytics.record_order, db, order)
+    run(analytics.record_status_change, db, dict(first), "shipped")
+
+    assert _sales(db, run) == [
+        {"day": "2024-03-01", "category": "Lifestyle", "status": "pending", "units": 0, "revenue": 0.0, "orders": 0},
+        {"day": "2024-03-01", "category": "Lifestyle", "status": "shipped", "units": 1, "revenue": 80.0, "orders": 1},
+        {"day": "2024-03-01", "category": "Running", "status": "pending", "units": 0, "revenue": 0.0, "orders": 0},
+        {"day": "2024-03-01", "category": "Running", "status": "shipped", "units": 2, "revenue": 200.0, "orders": 1},
+        {"day": "2024-03-02", "category": "Running", "status": "pending", "units": 2, "revenue": 200.0, "orders": 1},
+    ]
+    assert _sales(db, run, group_by=("category",)) == [
+        {"category": "Lifestyle", "units": 1, "revenue": 80.0, "orders": 1},
+        {"category": "Running", "units": 4, "revenue": 400.0, "orders": 2},
+    ]
+
+
+def test_rebuild_lease_is_exclusive_until_it_lapses(db, run):
+    first, second = analytics.RebuildLease(db, 60), analytics.RebuildLease(db, 60)
+    assert run(first.acquire)
+    assert not run(second.acquire)
+
+    # The first holder died without releasing: its lease lapses
+    run(db[analytics.LOCKS].update_one, {"_id": analytics.REBUILD_LOCK},
+        {"$set": {"expires_at": datetime.utcnow() - timedelta(seconds=1)}})
+    assert run(second.acquire)
+    with pytest.raises(RuntimeError):
+        run(first.renew)
+
+    # Only the holder can release it
+    run(first.release)
+    assert not run(analytics.RebuildLease(db, 60).acquire)
+    run(second.release)
+    assert run(analytics.RebuildLease(db, 60).acquire)
+
+
+def test_rebuild_endpoint_conflicts_with_a_rebuild_in_another_worker(client, db, run, auth_headers):
+    run(analytics.RebuildLease(db, 60).acquire)
+
+    response = client.post("/analytics/rollups/rebuild", headers=auth_headers)
+    assert response.status_code == 409
+    with pytest.raises(RuntimeError):
+        run(analytics.rebuild, db)
+
+
+def test_rebuild_without_orders_empties_rollups_and_cleans_up(db, run):
+    run(analytics.record_order, db, _order())
+    run(db[f"{analytics.STAGING}_{ObjectId()}"].insert_one, {"day": "2024-03-01"})
+
+    assert run(analytics.rebuild, db)["rollups"] == 0
+    assert run(db[analytics.ROLLUPS].count_documents, {}) == 0
+    assert not [name for name in run(db.list_collection_names) if name.startswith(analytics.STAGING)]
+    assert run(db[analytics.LOCKS].count_documents, {}) == 0
+
+
+@requires_mongodb
+def test_rebuild_matches_incremental_rollups(db, run):
+    orders = [_order(), _order("shipped", 2, [("Running", 1, 50.0), ("Lifestyle", 3, 20.0)]), _order(day=3)]
+    run(db.orders.insert_many, orders)
+    for order in orders:
+        run(analytics.record_order, db, dict(order, status="pending"))
+    run(analytics.record_status_change, db, dict(orders[1], status="pending"), "shipped")
+    incremental = [row for row in _sales(db, run) if row["orders"]]
+
+    # A staging collection left by a crashed run is cleaned up
+    run(db[f"{analytics.STAGING}_{ObjectId()}"].insert_one, {"day": "2024-03-01"})
+    run(db[analytics.ROLLUPS].delete_many, {})
+    result = run(analytics.rebuild, db, 2)
+
+    assert result["orders"] == 3 and result["chunks"] == 2
+    assert _sales(db, run) == incremental
+    assert not [name for name in run(db.list_collection_names) if name.startswith(analytics.STAGING + "_")]
+    assert run(db[analytics.LOCKS].count_documents, {}) == 0
@@ -0,0 +1,68 @@
+from app.cache import PrincipalCache
+from app.config import settings
+from app.routes import auth
+from tests.support import PASSWORD, login
+
+
+def test_password_change_revokes_existing_tokens(client, auth_headers):
+    other_session = login(client)
+    assert client.get("/cart/summary", headers=other_session).status_code == 200
+
+    response = client.put("/auth/password", headers=auth_headers, json={
+        "current_password": PASSWORD, "new_password": "new secret phrase",
+    })
+    assert response.status_code == 200
+    new_headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    # Both the cached principal and the full user lookup reject old tokens
+    assert client.get("/cart/summary", headers=other_session).status_code == 401
+    assert client.get("/auth/me", headers=auth_headers).status_code == 401
+    assert client.get("/auth/me", headers=new_headers).status_code == 200
+    assert client.post("/auth/login-json", json={
+        "email": "runner@example.com", "password": PASSWORD,
+    }).status_code == 401
+    login(client, password="new secret phrase")
+
+
+def test_password_change_requires_current_password(client, auth_headers):
+    response = client.put("/auth/password", headers=auth_headers, json={
+        "current_password": "wrong", "new_password": "new secret phrase",
+    })
+    assert response.status_code == 400
+    assert client.get("/auth/me", headers=auth_headers).status_code == 200
+
+
+def test_delete_account(client, auth_headers, db):
+    assert client.get("/cart/summary", headers=auth_headers).status_code == 200
+
+    assert client.delete("/auth/me", headers=auth_headers).status_code == 204
+
+    assert client.get("/cart/summary", headers=auth_headers).status_code in (401, 404)
+    assert client.get("/auth/me", headers=auth_headers).status_code in (401, 404)
+    assert client.post("/auth/login-json", json={
+        "email": "runner@example.com", "password": PASSWORD,
+    }).status_code == 401
+
+
+def test_revocation_reaches_other_workers_within_the_cache_ttl(client, auth_headers, monkeypatch):
+    now = [0.0]
+    other_worker = PrincipalCache(maxsize=100, max_ttl=settings.PRINCIPAL_CACHE_MAX_TTL_SECONDS,
+                                  clock=lambda: now[0])
+    this_worker = auth.principal_cache
+
+    # The other worker verifies and caches the token
+    monkeypatch.setattr(auth, "principal_cache", other_worker)
+    assert client.get("/cart/summary", headers=auth_headers).status_code == 200
+
+    # This worker revokes it; only its own cache is cleared
+    monkeypatch.setattr(auth, "principal_cache", this_worker)
+    response = client.put("/auth/password", headers=auth_headers, json={
+        "current_password": PASSWORD, "new_password": "new secret phrase",
+    })
+    assert response.status_code == 200
+
+    monkeypatch.setattr(auth, "principal_cache", other_worker)
+    assert client.get("/cart/summary", headers=auth_headers).status_code == 200
+    now[0] += settings.PRINCIPAL_CACHE_MAX_TTL_SECONDS + 0.1
+    assert client.get("/cart/summary", headers=auth_headers).status_code == 401
+    assert settings.PRINCIPAL_CACHE_MAX_TTL_SECONDS <= 5
@@ -0,0 +1,99 @@
+from datetime import datetime
+
+from bson import ObjectId
+
+from app.config import settings
+from app.routes.products import MAX_BATCH_IDS
+from tests.support import insert_products, product
+
+
+def test_batch_keeps_the_order_asked_for(client, db, run):
+    ids = run(insert_products, db, product(name="Pegasus"), product(name="Vomero"), product(name="Invincible"))
+    asked = [ids[2], ids[0], ids[1]]
+
+    response = client.get("/products/batch", params={"ids": ",".join(asked)})
+    assert response.status_code == 200
+    assert [p["_id"] for p in response.json()["products"]] == asked
+    posted = client.post("/products/batch", json={"ids": asked}).json()
+    assert [p["name"] for p in posted["products"]] == ["Invincible", "Pegasus", "Vomero"]
+
+
+def test_batch_returns_duplicates_once(client, db, run):
+    pegasus, vomero = run(insert_products, db, product(name="Pegasus"), product(name="Vomero"))
+
+    body = client.post("/products/batch", json={"ids": [vomero, pegasus, vomero, pegasus]}).json()
+    assert [p["_id"] for p in body["products"]] == [vomero, pegasus]
+    assert body["missing"] == []
+
+
+def test_batch_lists_invalid_and_unknown_ids_as_missing(client, db, run):
+    [pegasus] = run(insert_products, db, product())
+    unknown = str(ObjectId())
+
+    body = client.get("/products/batch", params={"ids": f"{unknown},{pegasus},not-an-id,,"}).json()
+    assert [p["_id"] for p in body["products"]] == [pegasus]
+    assert body["missing"] == [unknown, "not-an-id"]
+
+
+def test_batch_is_limited(client, db):
+    too_many = [str(ObjectId()) for _ in range(MAX_BATCH_IDS + 1)]
+
+    response = client.post("/products/batch", json={"ids": too_many})
+    assert response.status_code == 400
+    assert response.json()["detail"] == f"At most {MAX_BATCH_IDS} ids can be fetched at once"
+    # Duplicates count once
+    assert client.post("/products/batch", json={"ids": too_many[:1] * (MAX_BATCH_IDS + 1)}).status_code == 200
+
+
+def test_get_batch_is_not_taken_for_a_product_id(client, db, run):
+    [pegasus] = run(insert_products, db, product())
+
+    response = client.get("/products/batch", params={"ids": pegasus})
+    assert response.status_code == 200
+    assert "products" in response.json()
+    # Without ids it is a validation error, not "Invalid product ID"
+    assert client.get("/products/batch").status_code == 422
+
+
+def test_get_batch_etag_changes_with_stock(client, db, run, auth_headers, monkeypatch):
+    monkeypatch.setattr(settings, "ORDER_TRANSACTIONS", "never")
+    [pegasus] = run(insert_products, db, product(stock=5))
+    first = client.get("/products/batch", params={"ids": pegasus})
+
+    client.post("/orders/", headers=auth_headers, json={
+        "items": [{"product_id": pegasus, "quantity": 1}], "shipping_address": "1 Main St",
+    })
+    again = client.get("/products/batch", params={"ids": pegasus}, headers={"If-None-Match": first.headers["ETag"]})
+    assert again.status_code == 200
+    assert again.json()["products"][0]["stock"] == 4
+
+
+def test_cart_expands_deleted_products_to_null(client, db, run, auth_headers, user_id):
+    pegasus, vomero = run(insert_products, db, product(name="Pegasus"), product(name="Vomero"))
+    # Inserted directly: mongomock cannot run the cart's update pipelines
+    run(db.carts.insert_one, {"user_id": user_id, "total": 240.0, "updated_at": datetime.utcnow(), "items": [
+        {"product_id": product_id, "quantity": 1, "price": 120.0} for product_id in (pegasus, vomero)
+    ]})
+    assert client.delete(f"/products/{vomero}", headers=auth_headers).status_code == 204
+
+    items = client.get("/cart/?expand=products", headers=auth_headers).json()["items"]
+    assert [(item["product_id"], item["product"] and item["product"]["name"]) for item in items] == [
+        (pegasus, "Pegasus"), (vomero, None)
+    ]
+    assert "product" not in client.get("/cart/", headers=auth_headers).json()["items"][0]
+    assert client.get("/cart/?expand=reviews", headers=auth_headers).status_code == 400
+
+
+def test_orders_expand_deleted_products_to_null(client, db, run, auth_headers, monkeypatch):
+    monkeypatch.setattr(settings, "ORDER_TRANSACTIONS", "never")
+    pegasus, vomero = run(insert_products, db, product(name="Pegasus"), product(name="Vomero"))
+    order = client.post("/orders/", headers=auth_headers, json={
+        "items": [{"product_id": pegasus, "quantity": 1}, {"product_id": vomero, "quantity": 2}],
+        "shipping_address": "1 Main St",
+    }).json()
+    assert client.delete(f"/products/{pegasus}", headers=auth_headers).status_code == 204
+
+    single = client.get(f"/orders/{order['_id']}?expand=products", headers=auth_headers).json()
+    [listed] = client.get("/orders/?expand=products", headers=auth_headers).json()
+    for expanded in (single, listed):
+        assert [item["product"] and item["product"]["name"] for item in expanded["items"]] == [None, "Vomero"]
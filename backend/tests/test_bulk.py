@@ -0,0 +1,70 @@
+import csv
+
+from app import bulk
+from app.config import settings
+
+HEADER = "sku,name,description,price,category\n"
+
+
+async def _lines(text: str):
+    for line in text.splitlines(keepends=True):
+        yield line
+
+
+async def _rows(text: str, max_record=None) -> list:
+    return [row async for row in bulk._csv_rows(_lines(text), max_record)]
+
+
+def _errors(rows) -> dict:
+    return {number: str(row) for number, row in rows if isinstance(row, Exception)}
+
+
+def test_quoted_field_may_span_lines(run):
+    rows = run(_rows, HEADER + 'A1,Pegasus,"Daily\ntrainer, ""41""",120,Running\nA2,Vomero,Cushioned,150,Running\n')
+    assert rows == [
+        (1, {"sku": "A1", "name": "Pegasus", "description": 'Daily\ntrainer, "41"', "price": "120", "category": "Running"}),
+        (2, {"sku": "A2", "name": "Vomero", "description": "Cushioned", "price": "150", "category": "Running"}),
+    ]
+
+
+def test_unmatched_quote_is_capped_and_parsing_resumes(run):
+    # The record passes 60 characters on the third filler line
+    text = HEADER + 'A1,"Pegasus,Daily,120,Running\n' + "filler,line\n" * 3 + "A2,Vomero,Cushioned,150,Running\n"
+    rows = run(_rows, text, 60)
+
+    assert _errors(rows) == {1: "unterminated quoted field (record longer than 60 characters)"}
+    assert rows[-1] == (2, {"sku": "A2", "name": "Vomero", "description": "Cushioned", "price": "150",
+                            "category": "Running"})
+
+
+def test_unterminated_quote_at_end_of_file_is_reported(run):
+    rows = run(_rows, HEADER + "A1,Pegasus,Daily,120,Running\nA2,\"Vomero,Cushioned,150,Running\n")
+    assert rows[0][0] == 1 and isinstance(rows[0][1], dict)
+    assert _errors(rows) == {2: "unterminated quoted field"}
+
+
+def test_csv_errors_become_row_errors(run):
+    limit = csv.field_size_limit(20)
+    try:
+        rows = run(_rows, HEADER + "A1,Pegasus,A description longer than twenty,120,Running\n"
+                   "A2,Vomero,Cushioned,150,Running\n")
+    finally:
+        csv.field_size_limit(limit)
+    assert list(_errors(rows)) == [1]
+    assert rows[1][0] == 2 and rows[1][1]["sku"] == "A2"
+
+
+def test_import_reports_bad_rows_and_writes_the_rest(client, db, run, auth_headers, monkeypatch):
+    monkeypatch.setattr(settings, "BULK_IMPORT_MAX_CSV_RECORD_CHARS", 100)
+    body = (HEADER + "A1,Pegasus,Daily,120,Running\n" + 'A2,"Broken,Oops,1,Running\n' + "x,y\n" * 19
+            + "A3,Vomero,Cushioned,150,Running\n" + 'A4,"Never closed,1,Running\n')
+    response = client.post("/products/bulk?format=csv", headers=auth_headers, content=body.encode())
+
+    assert response.status_code == 200
+    report = response.json()
+    assert report["inserted"] == 2 and report["failed"] == 2
+    assert [error["error"] for error in report["errors"]] == [
+        "parse error: unterminated quoted field (record longer than 100 characters)",
+        "parse error: unterminated quoted field",
+    ]
+    assert sorted(p["sku"] for p in run(db.products.find().to_list, None)) == ["A1", "A3"]
@@ -0,0 +1,63 @@
+from bson import ObjectId
+
+from app.cache import CatalogCache, catalog_cache
+from app.database import get_db
+from app.main import app
+from tests.support import insert_products, product
+
+
+def test_fill_started_before_an_invalidation_is_dropped():
+    cache = CatalogCache(maxsize=10, ttl=60)
+    generation = cache.generation
+    # ... the database read happens here, then the product is written ...
+    cache.invalidate_product("p1")
+    cache.set_product("p1", {"name": "old"}, generation)
+    cache.set_list(("all",), ["old"], generation)
+    assert cache.get_product("p1") is None
+    assert cache.get_list(("all",)) is None
+
+    cache.set_product("p1", {"name": "new"}, cache.generation)
+    assert cache.get_product("p1") == {"name": "new"}
+
+
+class _WriteDuringRead:
+    """Wraps a database so a product update lands while find_one is in flight"""
+
+    def __init__(self, db, on_read):
+        self._db = db
+        self._on_read = on_read
+
+    def __getattr__(self, name):
+        return getattr(self._db, name)
+
+    def __getitem__(self, name):
+        return self._db[name]
+
+    @property
+    def products(self):
+        outer = self
+
+        class Products:
+            def __getattr__(self, name):
+                return getattr(outer._db.products, name)
+
+            async def find_one(self, *args, **kwargs):
+                document = await outer._db.products.find_one(*args, **kwargs)
+                on_read, outer._on_read = outer._on_read, None
+                if on_read is not None:
+                    await on_read()
+                return document
+        return Products()
+
+
+def test_stale_read_is_not_cached_after_a_concurrent_update(client, db, run, auth_headers):
+    [product_id] = run(insert_products, db, product(name="Pegasus 40"))
+
+    async def update():
+        await db.products.update_one({"_id": ObjectId(product_id)}, {"$set": {"name": "Pegasus 41"}})
+        catalog_cache.invalidate_product(product_id)
+
+    app.dependency_overrides[get_db] = lambda: _WriteDuringRead(db, update)
+    # This read saw the old document; it must not stay cached
+    assert client.get(f"/products/{product_id}").json()["name"] == "Pegasus 40"
+    assert client.get(f"/products/{product_id}").json()["name"] == "Pegasus 41"
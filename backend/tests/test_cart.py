@@ -0,0 +1,56 @@
+import asyncio
+
+from app.routes.cart import add_cart_item, remove_cart_item
+from app.schemas.schemas import CartItem
+from tests.support import requires_mongodb
+
+
+def test_remove_without_cart_is_404(client, auth_headers):
+    response = client.delete("/cart/remove/000000000000000000000000", headers=auth_headers)
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Cart not found"
+
+
+def test_reads_do_not_create_a_cart(client, auth_headers, db, run):
+    cart = client.get("/cart/", headers=auth_headers).json()
+    assert cart["_id"] is None and cart["items"] == []
+    assert client.get("/cart/summary", headers=auth_headers).json() == {"count": 0, "total": 0.0}
+    assert run(db.carts.count_documents, {}) == 0
+
+
+@requires_mongodb
+def test_concurrent_adds_and_removes_lose_no_updates(db, run):
+    user_id = "concurrent-shopper"
+
+    async def scenario():
+        await add_cart_item(db, user_id, CartItem(product_id="kept", quantity=1, price=10.0))
+        for i in range(50):
+            await add_cart_item(db, user_id, CartItem(product_id=f"churn-{i}", quantity=1, price=1.0))
+
+        # 200 single-unit adds of one product race 50 removes of the others
+        await asyncio.gather(
+            *[add_cart_item(db, user_id, CartItem(product_id="hot", quantity=1, price=5.0)) for _ in range(200)],
+            *[remove_cart_item(db, user_id, f"churn-{i}") for i in range(50)],
+        )
+        return await db.carts.find_one({"user_id": user_id})
+
+    cart = run(scenario)
+    quantities = {item["product_id"]: item["quantity"] for item in cart["items"]}
+    assert quantities == {"kept": 1, "hot": 200}
+    assert cart["total"] == 10.0 + 200 * 5.0
+
+
+@requires_mongodb
+def test_concurrent_first_adds_create_one_cart(db, run):
+    user_id = "new-shopper"
+
+    async def scenario():
+        await asyncio.gather(*[
+            add_cart_item(db, user_id, CartItem(product_id=f"p-{i}", quantity=1, price=2.0)) for i in range(20)
+        ])
+        return await db.carts.find({"user_id": user_id}).to_list(length=None)
+
+    carts = run(scenario)
+    assert len(carts) == 1
+    assert len(carts[0]["items"]) == 20
+    assert carts[0]["total"] == 40.0
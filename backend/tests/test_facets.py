@@ -0,0 +1,25 @@
+import pytest
+from pydantic import ValidationError
+
+from app.config import Settings
+from tests.support import insert_products, product
+
+
+@pytest.mark.parametrize("buckets", ["", "50", "0,100,50", "0,50,50", "0,cheap"])
+def test_invalid_price_buckets_fail_at_config_load(buckets):
+    with pytest.raises(ValidationError, match="PRODUCT_PRICE_BUCKETS"):
+        Settings(PRODUCT_PRICE_BUCKETS=buckets)
+
+
+def test_price_buckets_config():
+    assert Settings(PRODUCT_PRICE_BUCKETS=" 0, 25.5 ,100").PRODUCT_PRICE_BUCKETS == " 0, 25.5 ,100"
+
+
+def test_facet_counts(client, db, run):
+    run(insert_products, db,
+        product(price=30.0), product(price=120.0), product(price=260.0, category="Lifestyle"))
+
+    facets = client.get("/products/facets").json()
+    assert facets["total"] == 3
+    assert facets["categories"] == [{"category": "Lifestyle", "count": 1}, {"category": "Running", "count": 2}]
+    assert [bucket["count"] for bucket in facets["price_buckets"]] == [1, 0, 1, 0, 1]
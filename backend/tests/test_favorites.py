@@ -0,0 +1,126 @@
+import asyncio
+
+from pymongo.errors import DuplicateKeyError
+
+from app.config import settings
+from app.routes.favorites import add_favorite, remove_favorite
+from tests.support import insert_products, product, requires_mongodb
+
+
+def _favorite(client, headers, product_id):
+    return client.post(f"/favorites/{product_id}", headers=headers)
+
+
+def _check(client, headers, *product_ids) -> dict:
+    response = client.get("/favorites/check", params={"ids": ",".join(product_ids)}, headers=headers)
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_add_and_remove_favorites(client, db, run, auth_headers):
+    pegasus, vomero = run(insert_products, db, product(name="Pegasus"), product(name="Vomero"))
+
+    assert _favorite(client, auth_headers, pegasus).json()["count"] == 1
+    assert _favorite(client, auth_headers, vomero).json()["count"] == 2
+    # Already favorited: a no-op
+    assert _favorite(client, auth_headers, pegasus).json()["count"] == 2
+
+    favorites = client.get("/favorites/", headers=auth_headers).json()
+    assert favorites["product_ids"] == [pegasus, vomero]
+    assert [p["name"] for p in favorites["products"]] == ["Vomero", "Pegasus"]
+
+    removed = client.delete(f"/favorites/{pegasus}", headers=auth_headers)
+    assert removed.json()["count"] == 1
+    assert client.get("/favorites/", headers=auth_headers).json()["product_ids"] == [vomero]
+    assert run(db.favorites.count_documents, {}) == 1
+
+
+def test_favoriting_an_unknown_product_is_404(client, db, auth_headers):
+    assert _favorite(client, auth_headers, "000000000000000000000000").status_code == 404
+    assert _favorite(client, auth_headers, "not-an-id").status_code == 400
+
+
+# mongomock returns no document once the update makes the filter stop
+# matching, which is exactly what filling the last slot does
+@requires_mongodb
+def test_favorites_are_limited(client, db, run, auth_headers, monkeypatch):
+    monkeypatch.setattr(settings, "FAVORITES_MAX_ITEMS", 2)
+    ids = run(insert_products, db, product(), product(), product())
+
+    assert _favorite(client, auth_headers, ids[0]).status_code == 200
+    assert _favorite(client, auth_headers, ids[1]).status_code == 200
+    full = _favorite(client, auth_headers, ids[2])
+    assert full.status_code == 400
+    assert full.json()["detail"] == "Favorites are limited to 2 products"
+    # Re-adding one already there is still fine when full
+    assert _favorite(client, auth_headers, ids[1]).json()["count"] == 2
+    assert run(db.favorites.count_documents, {}) == 1
+
+
+class _RacingFirstAdd:
+    """Wraps a database so another request creates the favorites document just before this one's upsert"""
+
+    def __init__(self, db, user_id, product_id):
+        self._db = db
+        self._racer = (user_id, product_id)
+
+    def __getattr__(self, name):
+        return getattr(self._db, name)
+
+    def __getitem__(self, name):
+        return self._db[name]
+
+    @property
+    def favorites(self):
+        wrapper = self
+
+        class Favorites:
+            def __getattr__(self, name):
+                return getattr(wrapper._db.favorites, name)
+
+            async def find_one_and_update(self, query, update, **kwargs):
+                if kwargs.get("upsert") and wrapper._racer:
+                    user_id, product_id = wrapper._racer
+                    wrapper._racer = None
+                    await wrapper._db.favorites.insert_one({"user_id": user_id, "product_ids": [product_id]})
+                    raise DuplicateKeyError("E11000 duplicate key error")
+                return await wrapper._db.favorites.find_one_and_update(query, update, **kwargs)
+        return Favorites()
+
+
+def test_add_retries_when_another_request_created_the_document(db, run):
+    racing = _RacingFirstAdd(db, "u1", "first")
+
+    assert run(add_favorite, racing, "u1", "second") == 2
+    favorites = run(db.favorites.find_one, {"user_id": "u1"})
+    assert favorites["product_ids"] == ["first", "second"]
+
+
+def test_check_reflects_changes_made_elsewhere(client, db, run, auth_headers, user_id):
+    pegasus, vomero = run(insert_products, db, product(), product())
+    _favorite(client, auth_headers, pegasus)
+    assert _check(client, auth_headers, pegasus, vomero) == {pegasus: True, vomero: False}
+
+    # Changed by another worker: nothing in this one hears about it
+    run(db.favorites.update_one, {"user_id": user_id}, {"$set": {"product_ids": [vomero]}})
+    assert _check(client, auth_headers, pegasus, vomero) == {pegasus: False, vomero: True}
+
+
+def test_check_limits_the_ids(client, db, auth_headers):
+    ids = ",".join(f"{n:024x}" for n in range(101))
+    response = client.get("/favorites/check", params={"ids": ids}, headers=auth_headers)
+    assert response.status_code == 400
+
+
+@requires_mongodb
+def test_concurrent_adds_and_removes_lose_no_updates(db, run):
+    async def scenario():
+        await add_favorite(db, "u1", "kept")
+        await asyncio.gather(
+            *[add_favorite(db, "u1", f"new-{i}") for i in range(50)],
+            *[remove_favorite(db, "u1", "kept") for _ in range(5)],
+        )
+        return await db.favorites.find_one({"user_id": "u1"})
+
+    favorites = run(scenario)
+    assert sorted(favorites["product_ids"]) == sorted(f"new-{i}" for i in range(50))
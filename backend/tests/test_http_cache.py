@@ -0,0 +1,62 @@
+from app.cache import catalog_cache
+from app.config import settings
+from app.http_cache import CatalogVersion, bump_catalog_version, catalog_version
+from tests.support import insert_products, product
+
+
+def test_conditional_get_answers_304(client, db, run):
+    run(insert_products, db, product())
+    first = client.get("/products/")
+    etag = first.headers["ETag"]
+
+    again = client.get("/products/", headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.content == b""
+    assert again.headers["ETag"] == etag and "max-age" in again.headers["Cache-Control"]
+
+
+def test_etag_is_shared_and_survives_restarts(client, db, run, auth_headers):
+    etag = client.get("/products/").headers["ETag"]
+    # Another worker, or this one after a restart
+    assert run(CatalogVersion(check_interval=60).current, db) == run(catalog_version.current, db)
+
+    created = client.post("/products/", headers=auth_headers, json={
+        "name": "Dunk Low", "description": "Court classic", "price": 110, "category": "Lifestyle",
+    })
+    assert created.status_code == 201
+    changed = client.get("/products/", headers={"If-None-Match": etag})
+    assert changed.status_code == 200 and changed.headers["ETag"] != etag
+    assert run(CatalogVersion(check_interval=60).current, db) == run(catalog_version.current, db)
+
+
+def test_write_by_another_worker_clears_the_cache(client, db, run, monkeypatch):
+    monkeypatch.setattr(catalog_version, "check_interval", 0)
+    run(insert_products, db, product(name="Pegasus"))
+    etag = client.get("/products/").headers["ETag"]
+    assert catalog_cache.stats()["size"] > 0
+
+    # Written elsewhere: no local invalidation, only the shared counter moves
+    run(insert_products, db, product(name="Vomero"))
+    run(bump_catalog_version, db)
+
+    response = client.get("/products/", headers={"If-None-Match": etag})
+    assert response.status_code == 200 and response.headers["ETag"] != etag
+    assert sorted(p["name"] for p in response.json()) == ["Pegasus", "Vomero"]
+
+
+def test_checkout_changes_the_etag_of_product_reads(client, db, run, auth_headers, monkeypatch):
+    monkeypatch.setattr(settings, "ORDER_TRANSACTIONS", "never")
+    [product_id] = run(insert_products, db, product(stock=5))
+    first = client.get(f"/products/{product_id}")
+    etag = first.headers["ETag"]
+    assert first.json()["stock"] == 5
+
+    placed = client.post("/orders/", headers=auth_headers, json={
+        "items": [{"product_id": product_id, "quantity": 2}], "shipping_address": "1 Main St",
+    })
+    assert placed.status_code == 201
+
+    response = client.get(f"/products/{product_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 200 and response.json()["stock"] == 3
+    listing = client.get("/products/?in_stock=true", headers={"If-None-Match": etag})
+    assert listing.status_code == 200 and listing.json()[0]["stock"] == 3
@@ -0,0 +1,47 @@
+from datetime import datetime
+
+from app.indexes import ensure_indexes
+from dedupe_carts import dedupe_carts
+from tests.support import requires_mongodb
+
+
+def _cart(user_id: str, updated_at: datetime, *items) -> dict:
+    items = [{"product_id": product_id, "quantity": quantity, "price": price} for product_id, quantity, price in items]
+    total = sum(item["quantity"] * item["price"] for item in items)
+    return {"user_id": user_id, "items": items, "total": total, "updated_at": updated_at}
+
+
+def _legacy_carts(db, run):
+    run(db.carts.insert_many, [
+        _cart("u1", datetime(2024, 1, 1), ("a", 1, 10.0), ("b", 2, 5.0)),
+        _cart("u1", datetime(2024, 2, 1), ("a", 2, 12.0)),
+        _cart("u2", datetime(2024, 1, 1), ("c", 1, 3.0)),
+    ])
+
+
+def test_dedupe_merges_each_users_carts_into_the_newest(db, run):
+    _legacy_carts(db, run)
+
+    assert run(dedupe_carts, db, True) == {"users": 1, "carts_removed": 1}
+    assert run(db.carts.count_documents, {}) == 3
+
+    assert run(dedupe_carts, db) == {"users": 1, "carts_removed": 1}
+    carts = run(db.carts.find({"user_id": "u1"}).to_list, None)
+    assert len(carts) == 1
+    items = {item["product_id"]: (item["quantity"], item["price"]) for item in carts[0]["items"]}
+    # Quantities add up at the newest cart's price
+    assert items == {"a": (3, 12.0), "b": (2, 5.0)}
+    assert carts[0]["total"] == 46.0
+    assert run(db.carts.count_documents, {"user_id": "u2"}) == 1
+
+
+@requires_mongodb
+def test_duplicate_carts_block_the_index_with_a_migration_step(db, run):
+    run(db.carts.drop)
+    _legacy_carts(db, run)
+
+    problems = run(ensure_indexes, db)
+    assert len(problems) == 1 and "python dedupe_carts.py" in problems[0]
+
+    run(dedupe_carts, db)
+    assert run(ensure_indexes, db) == []
@@ -0,0 +1,116 @@
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+from pymongo.errors import AutoReconnect
+
+from app import inventory
+from tests.support import insert_products, product
+
+
+def _in_stock_names(client) -> list:
+    return sorted(p["name"] for p in client.get("/products/?in_stock=true").json())
+
+
+def _stocked_shards(db, run, product_id: str) -> int:
+    return run(db.products.find_one, {"_id": ObjectId(product_id)})["stocked_shards"]
+
+
+def test_sharded_product_leaves_in_stock_listing_when_shards_run_out(client, db, run):
+    hot, _ = run(insert_products, db, product(name="Hot Drop", stock=4), product(name="Pegasus", stock=1))
+    run(inventory.set_stock_shards, db, hot, 2)
+    assert _stocked_shards(db, run, hot) == 2
+    assert _in_stock_names(client) == ["Hot Drop", "Pegasus"]
+
+    reservation = run(inventory.reserve, db, "u1", [{"product_id": hot, "quantity": 4}])
+    assert _stocked_shards(db, run, hot) == 0
+    assert _in_stock_names(client) == ["Pegasus"]
+
+    run(inventory.release, db, reservation["_id"])
+    assert _stocked_shards(db, run, hot) == 2
+    assert _in_stock_names(client) == ["Hot Drop", "Pegasus"]
+
+
+def test_stocked_shards_counts_partly_drained_shards(db, run):
+    [hot] = run(insert_products, db, product(stock=3))
+    run(inventory.set_stock_shards, db, hot, 5)
+    # 3 units over 5 shards: two start empty
+    assert _stocked_shards(db, run, hot) == 3
+
+    run(inventory.reserve, db, "u1", [{"product_id": hot, "quantity": 2}])
+    assert _stocked_shards(db, run, hot) == 1
+    assert run(inventory.stock_level, db, hot)["available"] == 1
+
+    run(inventory.set_stock_shards, db, hot, 0)
+    merged = run(db.products.find_one, {"_id": ObjectId(hot)})
+    assert merged["stock"] == 1 and "stocked_shards" not in merged
+
+
+class _FailingShardTake:
+    """Wraps a database so the second shard take fails, as on a lost connection"""
+
+    def __init__(self, db):
+        self._db = db
+        self.takes = 0
+
+    def __getattr__(self, name):
+        return getattr(self._db, name)
+
+    def __getitem__(self, name):
+        return self._db[name]
+
+    @property
+    def stock_shards(self):
+        wrapper = self
+
+        class StockShards:
+            def __getattr__(self, name):
+                return getattr(wrapper._db.stock_shards, name)
+
+            async def find_one_and_update(self, query, update, **kwargs):
+                if "$inc" not in update:
+                    wrapper.takes += 1
+                    if wrapper.takes == 2:
+                        raise AutoReconnect("connection lost")
+                return await wrapper._db.stock_shards.find_one_and_update(query, update, **kwargs)
+        return StockShards()
+
+
+def test_hold_that_fails_part_way_gives_the_stock_back(db, run):
+    plain, hot = run(insert_products, db, product(stock=5), product(stock=4))
+    run(inventory.set_stock_shards, db, hot, 2)
+
+    with pytest.raises(AutoReconnect):
+        run(inventory.reserve, _FailingShardTake(db), "u1",
+            [{"product_id": plain, "quantity": 2}, {"product_id": hot, "quantity": 3}])
+
+    assert run(inventory.stock_level, db, plain)["available"] == 5
+    assert run(inventory.stock_level, db, hot)["available"] == 4
+    assert _stocked_shards(db, run, hot) == 2
+    [reservation] = run(db.reservations.find({}).to_list, None)
+    assert reservation["status"] == inventory.RELEASED
+
+
+def test_abandoned_pending_hold_is_released_once_expired(db, run):
+    [product_id] = run(insert_products, db, product(stock=5))
+    run(inventory.reserve, db, "u1", [{"product_id": product_id, "quantity": 2}], 1)
+    # As if the worker died after taking the stock
+    run(db.reservations.update_one, {}, {"$set": {"status": inventory.PENDING, "expires_at": datetime(2000, 1, 1)}})
+
+    assert run(inventory.release_expired, db) == 1
+    assert run(inventory.stock_level, db, product_id)["available"] == 5
+
+
+def test_stock_update_is_rejected_while_sharded(client, db, run, auth_headers):
+    [hot] = run(insert_products, db, product(stock=4))
+    run(inventory.set_stock_shards, db, hot, 2)
+
+    response = client.put(f"/products/{hot}", headers=auth_headers, json={"stock": 50, "price": 99})
+    assert response.status_code == 409
+    assert run(inventory.stock_level, db, hot)["available"] == 4
+    assert run(db.products.find_one, {"_id": ObjectId(hot)})["price"] == 120
+
+    renamed = client.put(f"/products/{hot}", headers=auth_headers, json={"name": "Hot Drop"})
+    assert renamed.status_code == 200 and renamed.json()["name"] == "Hot Drop"
+    restocked = client.put(f"/products/{ObjectId()}", headers=auth_headers, json={"stock": 5})
+    assert restocked.status_code == 404
@@ -0,0 +1,145 @@
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+from pymongo.errors import AutoReconnect
+
+from app.config import settings
+from app.database import get_db
+from app.main import app
+from tests.support import insert_products, product
+
+
+def _insert_orders(db, run, user_id: str, count: int):
+    started = datetime.utcnow()
+    orders = [{
+        "user_id": user_id, "total": 10.0 * n, "status": "pending", "shipping_address": "1 Main St",
+        "items": [{"product_id": "p", "product_name": "Air Max", "quantity": 1, "price": 10.0 * n}],
+        "created_at": started + timedelta(seconds=n),
+    } for n in range(1, count + 1)]
+    run(db.orders.insert_many, orders)
+
+
+class _LimitSpy:
+    """Wraps a database and records the server-side limit of orders queries"""
+
+    def __init__(self, db):
+        self._db = db
+        self.limits = []
+
+    def __getattr__(self, name):
+        return getattr(self._db, name)
+
+    @property
+    def orders(self):
+        spy = self
+
+        class Orders:
+            def find(self, *args, **kwargs):
+                cursor = spy._db.orders.find(*args, **kwargs)
+                original = cursor.limit
+
+                def limit(n):
+                    spy.limits.append(n)
+                    return original(n)
+                cursor.limit = limit
+                return cursor
+        return Orders()
+
+
+class _FailingOrderInsert:
+    """Wraps a database so inserting an order fails, as on a lost connection"""
+
+    def __init__(self, db):
+        self._db = db
+
+    def __getattr__(self, name):
+        return getattr(self._db, name)
+
+    def __getitem__(self, name):
+        return self._db[name]
+
+    @property
+    def orders(self):
+        class Orders:
+            async def insert_one(self, document, **kwargs):
+                raise AutoReconnect("connection lost")
+        return Orders()
+
+
+def test_order_history_pages_with_cursor(client, db, run, auth_headers, user_id):
+    _insert_orders(db, run, user_id, 5)
+
+    first = client.get("/orders/?limit=2", headers=auth_headers)
+    assert first.status_code == 200
+    assert [order["total"] for order in first.json()] == [50.0, 40.0]
+    cursor = first.headers["X-Next-Cursor"]
+
+    second = client.get("/orders/", params={"limit": 2, "cursor": cursor}, headers=auth_headers)
+    assert [order["total"] for order in second.json()] == [30.0, 20.0]
+    third = client.get("/orders/", params={"limit": 2, "cursor": second.headers["X-Next-Cursor"]},
+                       headers=auth_headers)
+    assert [order["total"] for order in third.json()] == [10.0]
+    assert "X-Next-Cursor" not in third.headers
+
+
+def test_order_history_limits_the_query(client, db, run, auth_headers, user_id):
+    _insert_orders(db, run, user_id, 3)
+    spy = _LimitSpy(db)
+    app.dependency_overrides[get_db] = lambda: spy
+
+    response = client.get("/orders/?limit=2", headers=auth_headers)
+    assert response.status_code == 200 and len(response.json()) == 2
+    assert spy.limits == [2]
+
+
+def _stock(db, run, product_id: str) -> int:
+    return run(db.products.find_one, {"_id": ObjectId(product_id)})["stock"]
+
+
+def test_failed_order_insert_gives_the_stock_back(client, db, run, auth_headers, monkeypatch):
+    monkeypatch.setattr(settings, "ORDER_TRANSACTIONS", "never")
+    [product_id] = run(insert_products, db, product(stock=5))
+    app.dependency_overrides[get_db] = lambda: _FailingOrderInsert(db)
+
+    with pytest.raises(AutoReconnect):
+        client.post("/orders/", headers=auth_headers, json={
+            "items": [{"product_id": product_id, "quantity": 2}], "shipping_address": "1 Main St",
+        })
+    assert _stock(db, run, product_id) == 5
+
+
+def test_failed_order_insert_keeps_the_reservation_held(client, db, run, auth_headers, monkeypatch):
+    monkeypatch.setattr(settings, "ORDER_TRANSACTIONS", "never")
+    [product_id] = run(insert_products, db, product(stock=5))
+    reservation = client.post("/reservations/", headers=auth_headers, json={
+        "items": [{"product_id": product_id, "quantity": 2}],
+    }).json()
+
+    app.dependency_overrides[get_db] = lambda: _FailingOrderInsert(db)
+    with pytest.raises(AutoReconnect):
+        client.post(f"/reservations/{reservation['_id']}/confirm", headers=auth_headers,
+                    json={"shipping_address": "1 Main St"})
+    app.dependency_overrides[get_db] = lambda: db
+
+    # Still held, so it can be retried or released
+    assert client.get(f"/reservations/{reservation['_id']}", headers=auth_headers).json()["status"] == "held"
+    placed = client.post(f"/reservations/{reservation['_id']}/confirm", headers=auth_headers,
+                         json={"shipping_address": "1 Main St"})
+    assert placed.status_code == 201
+    assert _stock(db, run, product_id) == 3
+
+
+def test_order_is_removed_if_the_hold_expired(client, db, run, auth_headers, monkeypatch):
+    monkeypatch.setattr(settings, "ORDER_TRANSACTIONS", "never")
+    [product_id] = run(insert_products, db, product(stock=5))
+    reservation = client.post("/reservations/", headers=auth_headers, json={
+        "items": [{"product_id": product_id, "quantity": 2}],
+    }).json()
+    run(db.reservations.update_one, {"_id": ObjectId(reservation["_id"])},
+        {"$set": {"expires_at": datetime.utcnow() - timedelta(seconds=1)}})
+
+    response = client.post(f"/reservations/{reservation['_id']}/confirm", headers=auth_headers,
+                           json={"shipping_address": "1 Main St"})
+    assert response.status_code == 410
+    assert run(db.orders.count_documents, {}) == 0
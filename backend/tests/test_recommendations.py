@@ -0,0 +1,115 @@
+import os
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+
+from app import recommendations as recs
+from app.config import settings
+from app.recommendations import Recommendations, Snapshot
+from tests.support import insert_products, product
+
+# Ids deliberately not in sorted order, so the by_id table is exercised
+A, B, C, D = "ffff00000000000000000001", "0000ffff0000000000000002", "aaaa00000000000000000003", "5555000000000000000000aa"
+
+
+def _past_id(minutes_ago: int) -> ObjectId:
+    """A unique ObjectId from before the settle cutoff"""
+    stamp = int((datetime.utcnow() - timedelta(minutes=minutes_ago)).timestamp())
+    return ObjectId(f"{stamp:08x}" + str(ObjectId())[8:])
+
+
+def _orders(*baskets, minutes_ago: int = 10) -> list:
+    return [
+        {"_id": _past_id(minutes_ago), "status": "pending",
+         "items": [{"product_id": product_id, "quantity": 1, "price": 10.0} for product_id in basket]}
+        for basket in baskets
+    ]
+
+
+@pytest.fixture
+def snapshot_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "RECOMMENDATIONS_SETTLE_SECONDS", 60)
+    return str(tmp_path / "recommendations.snapshot")
+
+
+def _neighbours(snapshot, product_id: str) -> list:
+    return [(item["product_id"], item["orders"]) for item in snapshot.recommend(product_id, 10)]
+
+
+@pytest.mark.parametrize("vectorized", [False, True] if recs.numpy is not None else [False])
+def test_build_counts_pairs_and_finds_ids_by_binary_search(db, run, snapshot_path, vectorized):
+    orders = _orders([A, B], [A, B, C], [A, C], [B, C], [D])
+    orders.append({**_orders([A, D])[0], "status": "cancelled"})
+    run(db.orders.insert_many, orders)
+
+    report = run(recs.build, db, snapshot_path, 10, vectorized)
+    assert report["orders"] == 5 and report["products"] == 4
+
+    snapshot = Snapshot(snapshot_path)
+    assert _neighbours(snapshot, A) == [(B, 2), (C, 2)]
+    assert _neighbours(snapshot, C) == [(A, 2), (B, 2)]
+    assert snapshot.recommend(A, 1)[0]["confidence"] == round(2 / 3, 4)
+    assert _neighbours(snapshot, D) == []
+    for index, product_id in enumerate(snapshot.product_ids()):
+        assert snapshot.position(product_id) == index
+    assert snapshot.position("0" * 24) is None and snapshot.position("short") is None
+
+
+def test_refresh_adds_newer_orders(db, run, snapshot_path):
+    run(db.orders.insert_many, _orders([A, B], minutes_ago=20))
+    run(recs.build, db, snapshot_path, 10)
+    run(db.orders.insert_many, _orders([A, C], [A, C], minutes_ago=10))
+
+    assert run(recs.refresh, db, snapshot_path, 10)["orders_added"] == 2
+    assert _neighbours(Snapshot(snapshot_path), A) == [(C, 2), (B, 1)]
+
+
+def test_refresh_rebuilds_a_snapshot_in_an_older_format(db, run, snapshot_path):
+    with open(snapshot_path, "wb") as f:
+        f.write(b"NSRECS1\n" + b"\0" * 64)
+    run(db.orders.insert_many, _orders([A, B]))
+
+    assert run(recs.refresh, db, snapshot_path, 10)["orders"] == 1
+    assert _neighbours(Snapshot(snapshot_path), B) == [(A, 1)]
+
+
+def test_new_snapshot_is_mapped_off_the_request_path(db, run, snapshot_path):
+    run(db.orders.insert_many, _orders([A, B]))
+    run(recs.build, db, snapshot_path, 10)
+    served = Recommendations(snapshot_path, reload_seconds=0)
+
+    async def scenario():
+        await served.load()
+        first = served.current()
+        assert [item["product_id"] for item in first.recommend(A, 10)] == [B]
+
+        await db.orders.insert_many(_orders([A, C], [A, C]))
+        await recs.build(db, snapshot_path, 10)
+        os.utime(snapshot_path, ns=(time.time_ns(), time.time_ns() + 10**9))
+        # The check is scheduled, not run inline: this call still sees the old one
+        assert served.current() is first
+        await served._reloading
+        return served.current()
+
+    assert [item["product_id"] for item in run(scenario).recommend(A, 10)] == [C, B]
+
+
+def test_recommendations_endpoint_and_search_for_the_route_name(client, db, run, snapshot_path, monkeypatch):
+    first, second = run(insert_products, db, product(name="Recommendations Pack"), product(name="Pegasus"))
+    run(db.orders.insert_many, _orders([first, second], [first, second]))
+    run(recs.build, db, snapshot_path, 10)
+    served = Recommendations(snapshot_path, reload_seconds=60)
+    run(served.load)
+    monkeypatch.setattr("app.routes.products.recommendations", served)
+
+    response = client.get(f"/products/{first}/recommendations?expand=products")
+    assert response.status_code == 200
+    body = response.json()
+    assert [item["product_id"] for item in body["recommendations"]] == [second]
+    assert [card["name"] for card in body["products"]] == ["Pegasus"]
+
+    search = client.get("/products/search/recommendations")
+    assert search.status_code == 200
+    assert [p["name"] for p in search.json()] == ["Recommendations Pack"]
@@ -0,0 +1,120 @@
+import asyncio
+
+from bson import ObjectId
+
+from app.search import CatalogSearch
+from tests.support import insert_products, product
+
+
+class ScanHook:
+    """Wraps a database so the first full products scan runs `hook` after its first product"""
+
+    def __init__(self, db, hook):
+        self.products = _Products(db.products, hook)
+
+
+class _Products:
+    def __init__(self, collection, hook):
+        self._collection = collection
+        self._hook = hook
+
+    def find(self, query, *args):
+        cursor = self._collection.find(query, *args)
+        if query or self._hook is None:
+            return cursor
+        hook, self._hook = self._hook, None
+        return _HookedCursor(cursor, hook)
+
+
+class _HookedCursor:
+    def __init__(self, cursor, hook):
+        self._cursor = cursor
+        self._hook = hook
+
+    def batch_size(self, size):
+        return self
+
+    async def __aiter__(self):
+        first = True
+        async for document in self._cursor:
+            # The consumer may rewrite the document (e.g. stringify _id)
+            product_id = document["_id"]
+            yield document
+            if first:
+                first = False
+                await self._hook(product_id)
+
+
+def _rename_during_scan(db, search, full_invalidation):
+    async def hook(product_id):
+        # The product was already read by the scan, then changes
+        await db.products.update_one({"_id": product_id}, {"$set": {"name": "Nike Alphafly Next"}})
+        search.on_catalog_change(None if full_invalidation else str(product_id))
+    return ScanHook(db, hook)
+
+
+def test_changes_during_rebuild_are_not_lost(db, run):
+    run(insert_products, db, product(name="Nike Pegasus 41"), product(name="Nike Vomero 18"))
+    search = CatalogSearch(max_age=600)
+    hooked = _rename_during_scan(db, search, full_invalidation=False)
+
+    run(search.search, hooked, "nike")
+    total, products = run(search.search, hooked, "alphafly")
+    assert total == 1 and products[0]["name"] == "Nike Alphafly Next"
+
+
+def test_full_invalidation_during_rebuild_rebuilds_again(db, run):
+    run(insert_products, db, product(name="Nike Pegasus 41"), product(name="Nike Vomero 18"))
+    search = CatalogSearch(max_age=600)
+    hooked = _rename_during_scan(db, search, full_invalidation=True)
+
+    run(search.search, hooked, "nike")
+    # The next search starts another rebuild and answers from the old index
+    run(search.search, hooked, "alphafly")
+    run(search.wait_for_rebuild)
+    total, _ = run(search.search, hooked, "alphafly")
+    assert total == 1
+
+
+def test_searches_use_the_old_index_while_it_rebuilds(db, run):
+    ids = run(insert_products, db, product(name="Nike Pegasus 41"), product(name="Nike Vomero 18"))
+    search = CatalogSearch(max_age=600)
+    run(search.search, db, "nike")
+    run(db.products.update_one, {"_id": ObjectId(ids[0])}, {"$set": {"name": "Nike Alphafly Next"}})
+    search.on_catalog_change(None)
+
+    released = asyncio.Event()
+
+    async def hold_scan(product_id):
+        await released.wait()
+
+    hooked = ScanHook(db, hold_scan)
+    # The rebuild is stuck mid-scan, yet searches answer
+    assert run(search.search, hooked, "pegasus")[0] == 1
+    assert run(search.search, hooked, "alphafly")[0] == 0
+
+    run(released.set)
+    run(search.wait_for_rebuild)
+    assert run(search.search, db, "pegasus")[0] == 0
+    assert run(search.search, db, "alphafly")[0] == 1
+
+
+def test_search_picks_up_product_changes(client, db, run):
+    ids = run(insert_products, db, product(name="Nike Pegasus 41"),
+              product(name="Nike Dunk Low", category="Lifestyle"))
+    assert [p["name"] for p in client.get("/products/search/dunk").json()] == ["Nike Dunk Low"]
+
+    search = CatalogSearch(max_age=600)
+    run(search.search, db, "nike")
+    run(db.products.update_one, {"_id": ObjectId(ids[1])}, {"$set": {"name": "Nike Blazer Mid"}})
+    search.on_catalog_change(ids[1])
+    assert run(search.search, db, "dunk")[0] == 0
+    assert run(search.search, db, "blazer")[0] == 1
+
+
+def test_search_for_a_sub_route_name(client, db, run):
+    run(insert_products, db, product(name="Nike Stock Runner"), product(name="Nike Vomero 18"))
+
+    response = client.get("/products/search/stock")
+    assert response.status_code == 200
+    assert [p["name"] for p in response.json()] == ["Nike Stock Runner"]
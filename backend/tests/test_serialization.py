@@ -0,0 +1,58 @@
+import json
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+
+from app.config import settings
+from app.schemas.schemas import OrderResponse, ProductBatchResponse, ProductResponse
+from app.serialization import dumps, shape_documents
+
+
+def _order(**fields) -> dict:
+    return {
+        "_id": str(ObjectId()), "user_id": "u1", "total": 240, "status": "pending",
+        "shipping_address": "1 Main St", "created_at": datetime(2024, 5, 1, 12, 30),
+        "items": [
+            # price_order_items adds category; integer prices from old documents
+            {"product_id": "p1", "product_name": "Air Max", "quantity": 2, "price": 120,
+             "category": "Running"},
+        ],
+        "internal_note": "not for clients", **fields,
+    }
+
+
+def _validated(model, documents) -> list:
+    return [model.model_validate(document).model_dump(mode="json", by_alias=True) for document in documents]
+
+
+@pytest.mark.parametrize("model, documents", [
+    (OrderResponse, [_order(), _order(shipping_address=None, total=12.5)]),
+    (ProductResponse, [{
+        "_id": "p1", "name": "Dunk Low", "description": "", "price": 110, "category": "Lifestyle",
+        "created_at": datetime(2024, 1, 1), "stock_shards": [3, 4], "search_terms": ["dunk"],
+    }]),
+    (ProductBatchResponse, [{
+        "products": [{
+            "_id": "p1", "name": "Dunk Low", "description": "", "price": 110, "category": "Lifestyle",
+            "created_at": datetime(2024, 1, 1), "stock_shards": [3, 4],
+        }],
+    }]),
+])
+def test_fast_shaping_matches_response_model(model, documents):
+    fast = json.loads(dumps(shape_documents(model, documents)))
+    assert fast == _validated(model, documents)
+
+
+def test_fast_order_history_matches_validated(client, db, run, auth_headers, user_id, monkeypatch):
+    order = _order(user_id=user_id)
+    del order["_id"]
+    run(db.orders.insert_one, order)
+
+    monkeypatch.setattr(settings, "FAST_JSON_RESPONSES", True)
+    fast = client.get("/orders/", headers=auth_headers).json()
+    monkeypatch.setattr(settings, "FAST_JSON_RESPONSES", False)
+    validated = client.get("/orders/", headers=auth_headers).json()
+
+    assert fast == validated
+    assert fast[0]["items"] == [{"product_id": "p1", "product_name": "Air Max", "quantity": 2, "price": 120.0}]
@@ -0,0 +1,21 @@
+from app import server
+from app.config import settings
+from app.database import max_pool_size
+
+
+def test_pool_is_split_over_the_same_worker_count_as_the_server(monkeypatch):
+    monkeypatch.setattr(settings, "MONGO_TOTAL_POOL_SIZE", 200)
+    monkeypatch.setattr(settings, "SERVER_WORKERS", 0)
+    monkeypatch.delenv("WEB_CONCURRENCY", raising=False)
+    monkeypatch.setattr(server, "available_cpus", lambda: 8)
+    # Plain uvicorn, no worker count exported: one worker per CPU
+    assert server.worker_count() == 8 and max_pool_size() == 25
+
+    monkeypatch.setenv("WEB_CONCURRENCY", "4")
+    assert server.worker_count() == 4 and max_pool_size() == 50
+
+    monkeypatch.setattr(settings, "SERVER_WORKERS", 2)
+    assert server.worker_count() == 2 and max_pool_size() == 100
+
+    monkeypatch.setattr(settings, "MONGO_TOTAL_POOL_SIZE", None)
+    assert max_pool_size() == settings.MONGO_MAX_POOL_SIZE
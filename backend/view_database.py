@@ -1,87 +1,119 @@
 """
 Script to view MongoDB database contents
+
+Streams documents instead of loading whole collections, so it is safe to
+point at production-sized data.
+
+    python view_database.py                              # everything, pretty
+    python view_database.py orders --filter '{"status": "pending"}' --limit 20
+    python view_database.py orders --limit 20 --after <last _id>   # next page
+    python view_database.py products --fields name,price --format csv > products.csv
+    python view_database.py --summary                    # counts via aggregation
 """
+import argparse
 import asyncio
+import sys
+
 from motor.motor_asyncio import AsyncIOMotorClient
-from datetime import datetime
-import json
 
-async def view_database():
-    # Connect to MongoDB
-    client = AsyncIOMotorClient("mongodb://localhost:27017")
-    db = client.nike_store
-    
-    print("=" * 80)
-    print("NIKE STORE DATABASE")
-    print("=" * 80)
-    
-    # View Users Collection
-    print("\n📧 USERS COLLECTION:")
-    print("-" * 80)
-    users = await db.users.find().to_list(length=None)
-    if users:
-        for i, user in enumerate(users, 1):
-            print(f"\nUser {i}:")
-            print(f"  ID: {user.get('_id')}")
-            print(f"  Email: {user.get('email')}")
-            print(f"  First Name: {user.get('first_name')}")
-            print(f"  Last Name: {user.get('last_name')}")
-            print(f"  Country: {user.get('country')}")
-            print(f"  Created: {user.get('created_at')}")
-            print(f"  Password Hash: {user.get('hashed_password')[:50]}...")
-    else:
-        print("  No users found")
-    
-    # View Products Collection
-    print("\n\n👟 PRODUCTS COLLECTION:")
-    print("-" * 80)
-    products = await db.products.find().to_list(length=None)
-    if products:
-        for i, product in enumerate(products, 1):
-            print(f"\nProduct {i}:")
-            print(f"  ID: {product.get('_id')}")
-            print(f"  Name: {product.get('name')}")
-            print(f"  Price: ${product.get('price')}")
-            print(f"  Category: {product.get('category')}")
-            print(f"  Stock: {product.get('stock')}")
-    else:
-        print("  No products found")
-    
-    # View Carts Collection
-    print("\n\n🛒 CARTS COLLECTION:")
-    print("-" * 80)
-    carts = await db.carts.find().to_list(length=None)
-    if carts:
-        for i, cart in enumerate(carts, 1):
-            print(f"\nCart {i}:")
-            print(f"  User ID: {cart.get('user_id')}")
-            print(f"  Items: {len(cart.get('items', []))}")
-    else:
-        print("  No carts found")
-    
-    # View Orders Collection
-    print("\n\n📦 ORDERS COLLECTION:")
-    print("-" * 80)
-    orders = await db.orders.find().to_list(length=None)
-    if orders:
-        for i, order in enumerate(orders, 1):
-            print(f"\nOrder {i}:")
-            print(f"  ID: {order.get('_id')}")
-            print(f"  User ID: {order.get('user_id')}")
-            print(f"  Total: ${order.get('total_amount')}")
-            print(f"  Status: {order.get('status')}")
+from app import inspector
+from app.config import settings
+from app.serialization import dumps
+
+HEADINGS = {
+    "users": ("📧", "User"),
+    "products": ("👟", "Product"),
+    "carts": ("🛒", "Cart"),
+    "orders": ("📦", "Order"),
+}
+
+
+def print_document(label: str, number: int, document: dict):
+    print(f"\n{label} {number}:")
+    for name, value in document.items():
+        print(f"  {name}: {inspector.cell(value, width=100)}")
+
+
+async def show_collection(db, collection: str, args) -> int:
+    emoji, label = HEADINGS.get(collection, ("📄", "Document"))
+    cursor = inspector.find(db, collection, args)
+
+    if args.format == "ndjson":
+        written, last = await inspector.write_ndjson(cursor)
+    elif args.format == "csv":
+        written, last = await inspector.write_csv(cursor, inspector.columns_for(collection, args))
     else:
-        print("  No orders found")
-    
-    print("\n" + "=" * 80)
-    print(f"Total Users: {len(users)}")
-    print(f"Total Products: {len(products)}")
-    print(f"Total Carts: {len(carts)}")
-    print(f"Total Orders: {len(orders)}")
-    print("=" * 80)
-    
-    # Close connection
-    client.close()
+        print(f"\n\n{emoji} {collection.upper()} COLLECTION:")
+        print("-" * 80)
+        written, last = 0, None
+        async for document in cursor:
+            written += 1
+            last = document
+            print_document(label, args.skip + written, document)
+        if not written:
+            print(f"  No {collection} found")
+
+    hint = inspector.next_page_hint(collection, last, written, args)
+    if hint:
+        print(f"\n➡️  {hint}", file=sys.stderr)
+    return written
+
+
+async def show_summary(db, collection: str, args):
+    query, _, _ = inspector.build_query(args, collection)
+    summary = await inspector.summarize(db, collection, query, args.group_by)
+
+    if args.format == "ndjson":
+        print(dumps(summary).decode("utf-8"))
+        return
+
+    emoji, _ = HEADINGS.get(collection, ("📄", "Document"))
+    print(f"\n{emoji} {collection.upper()}: {summary['count']} documents")
+    for group in summary["groups"]:
+        values = ", ".join(f"{k}={inspector.cell(v)}" for k, v in group.items() if k not in ("_id", "count"))
+        print(f"  {inspector.cell(group['_id']) or '(none)'}: {group['count']}" + (f" ({values})" if values else ""))
+
+
+async def view_database(args):
+    # Connect to MongoDB
+    client = AsyncIOMotorClient(settings.MONGODB_URL)
+    db = client[settings.DATABASE_NAME]
+
+    try:
+        if args.summary:
+            for collection in args.collections:
+                await show_summary(db, collection, args)
+            return
+
+        pretty = args.format == "pretty"
+        if pretty:
+            print("=" * 80)
+            print("NIKE STORE DATABASE")
+            print("=" * 80)
+
+        shown = {}
+        for collection in args.collections:
+            shown[collection] = await show_collection(db, collection, args)
+
+        if pretty:
+            print("\n" + "=" * 80)
+            for collection, written in shown.items():
+                total = await db[collection].estimated_document_count()
+                print(f"Shown {collection.capitalize()}: {written} of ~{total}")
+            print("=" * 80)
+    finally:
+        # Close connection
+        client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="View MongoDB database contents")
+    inspector.add_arguments(parser, ["pretty", "ndjson", "csv"])
+    args = parser.parse_args()
+    if args.format == "csv" and len(args.collections) != 1 and not args.summary:
+        parser.error("--format csv needs exactly one collection")
+    asyncio.run(view_database(args))
+
 
 if __name__ == "__main__":
-    asyncio.run(view_database())
+    main()
@@ -1,117 +1,122 @@
 """
 MongoDB Database Viewer - Table Format
+
+Streams each collection through a cursor and prints it as a series of
+tables of --page-size rows, so memory stays bounded whatever the size of
+the collection. Takes the same filter/paging options as view_database.py.
+
+    python view_database_table.py orders --filter '{"status": "shipped"}' --sort=-_id --limit 100
+    python view_database_table.py --summary
 """
+import argparse
 import asyncio
+import sys
+
 from motor.motor_asyncio import AsyncIOMotorClient
-from tabulate import tabulate
-from datetime import datetime
 
-async def view_database_tables():
-    # Connect to MongoDB
-    client = AsyncIOMotorClient("mongodb://localhost:27017")
-    db = client.nike_store
-    
-    print("\n" + "="*100)
-    print(" "*35 + "NIKE STORE DATABASE")
-    print("="*100 + "\n")
-    
-    # View Users Collection
-    print("📧 USERS TABLE:")
-    print("-"*100)
-    users = await db.users.find().to_list(length=None)
-    if users:
-        user_data = []
-        for user in users:
-            user_data.append([
-                str(user.get('_id'))[:24],
-                user.get('email'),
-                user.get('first_name'),
-                user.get('last_name'),
-                user.get('country'),
-                user.get('created_at').strftime('%Y-%m-%d %H:%M') if user.get('created_at') else 'N/A'
-            ])
-        print(tabulate(user_data, 
-                      headers=['ID', 'Email', 'First Name', 'Last Name', 'Country', 'Created At'],
-                      tablefmt='grid'))
-    else:
-        print("No users found")
-    
-    # View Products Collection
-    print("\n\n👟 PRODUCTS TABLE:")
-    print("-"*100)
-    products = await db.products.find().to_list(length=None)
-    if products:
-        product_data = []
-        for product in products:
-            product_data.append([
-                str(product.get('_id'))[:24],
-                product.get('name'),
-                f"${product.get('price', 0):.2f}",
-                product.get('category'),
-                product.get('stock'),
-                product.get('description', '')[:40] + '...' if len(product.get('description', '')) > 40 else product.get('description', '')
-            ])
-        print(tabulate(product_data,
-                      headers=['ID', 'Product Name', 'Price', 'Category', 'Stock', 'Description'],
-                      tablefmt='grid'))
-    else:
-        print("No products found")
-    
-    # View Carts Collection
-    print("\n\n🛒 CARTS TABLE:")
-    print("-"*100)
-    carts = await db.carts.find().to_list(length=None)
-    if carts:
-        cart_data = []
-        for cart in carts:
-            cart_data.append([
-                str(cart.get('_id'))[:24],
-                str(cart.get('user_id'))[:24],
-                len(cart.get('items', [])),
-                cart.get('updated_at', 'N/A')
-            ])
-        print(tabulate(cart_data,
-                      headers=['Cart ID', 'User ID', 'Items Count', 'Updated At'],
-                      tablefmt='grid'))
-    else:
-        print("No carts found")
-    
-    # View Orders Collection
-    print("\n\n📦 ORDERS TABLE:")
-    print("-"*100)
-    orders = await db.orders.find().to_list(length=None)
-    if orders:
-        order_data = []
-        for order in orders:
-            order_data.append([
-                str(order.get('_id'))[:24],
-                str(order.get('user_id'))[:24],
-                f"${order.get('total_amount', 0):.2f}",
-                order.get('status'),
-                len(order.get('items', [])),
-                order.get('created_at', 'N/A')
-            ])
-        print(tabulate(order_data,
-                      headers=['Order ID', 'User ID', 'Total Amount', 'Status', 'Items', 'Created At'],
-                      tablefmt='grid'))
+from app import inspector
+from app.config import settings
+
+try:
+    from tabulate import tabulate
+except ImportError:
+    tabulate = None
+
+HEADINGS = {
+    "users": "📧 USERS TABLE:",
+    "products": "👟 PRODUCTS TABLE:",
+    "carts": "🛒 CARTS TABLE:",
+    "orders": "📦 ORDERS TABLE:",
+}
+
+
+async def show_table(db, collection: str, args) -> int:
+    columns = inspector.columns_for(collection, args)
+    cursor = inspector.find(db, collection, args)
+
+    if args.format == "ndjson":
+        written, last = await inspector.write_ndjson(cursor)
+    elif args.format == "csv":
+        written, last = await inspector.write_csv(cursor, columns)
     else:
-        print("No orders found")
-    
-    # Summary
-    print("\n" + "="*100)
-    print(f"📊 SUMMARY: {len(users)} Users | {len(products)} Products | {len(carts)} Carts | {len(orders)} Orders")
-    print("="*100 + "\n")
-    
-    # Close connection
-    client.close()
+        print(f"\n\n{HEADINGS.get(collection, collection.upper() + ' TABLE:')}")
+        print("-" * 100)
+        written, last = 0, None
+        async for page in inspector.pages(cursor, args.page_size):
+            rows = [[inspector.cell(document.get(name), width=40) for name in columns] for document in page]
+            print(tabulate(rows, headers=columns, tablefmt="grid"))
+            written += len(page)
+            last = page[-1]
+        if not written:
+            print(f"No {collection} found")
+
+    hint = inspector.next_page_hint(collection, last, written, args)
+    if hint:
+        print(f"\n➡️  {hint}", file=sys.stderr)
+    return written
+
+
+async def show_summary(db, collection: str, args):
+    query, _, _ = inspector.build_query(args, collection)
+    summary = await inspector.summarize(db, collection, query, args.group_by)
+    groups = summary["groups"]
+    columns = list(dict.fromkeys(name for group in groups for name in group))
+    rows = [[inspector.cell(group.get(name)) for name in columns] for group in groups]
+
+    print(f"\n\n{HEADINGS.get(collection, collection.upper() + ' TABLE:')} {summary['count']} documents")
+    print("-" * 100)
+    if rows:
+        print(tabulate(rows, headers=["group" if name == "_id" else name for name in columns], tablefmt="grid"))
+
+
+async def view_database_tables(args):
+    # Connect to MongoDB
+    client = AsyncIOMotorClient(settings.MONGODB_URL)
+    db = client[settings.DATABASE_NAME]
 
-if __name__ == "__main__":
     try:
-        asyncio.run(view_database_tables())
-    except ImportError:
+        if args.summary:
+            for collection in args.collections:
+                await show_summary(db, collection, args)
+            return
+
+        table = args.format == "table"
+        if table:
+            print("\n" + "=" * 100)
+            print(" " * 35 + "NIKE STORE DATABASE")
+            print("=" * 100 + "\n")
+
+        shown = {}
+        for collection in args.collections:
+            shown[collection] = await show_table(db, collection, args)
+
+        if table:
+            # Summary
+            parts = [f"{written} {collection.capitalize()}" for collection, written in shown.items()]
+            print("\n" + "=" * 100)
+            print(f"📊 SHOWN: {' | '.join(parts)}  (run with --summary for totals)")
+            print("=" * 100 + "\n")
+    finally:
+        # Close connection
+        client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MongoDB database viewer - table format")
+    inspector.add_arguments(parser, ["table", "ndjson", "csv"])
+    parser.add_argument("--page-size", type=int, default=50, help="Rows per printed table")
+    args = parser.parse_args()
+    if args.format == "csv" and len(args.collections) != 1 and not args.summary:
+        parser.error("--format csv needs exactly one collection")
+    asyncio.run(view_database_tables(args))
+
+
+if __name__ == "__main__":
+    if tabulate is None:
         print("\n⚠️  The 'tabulate' package is not installed.")
         print("Installing it now...\n")
         import subprocess
-        subprocess.run(["pip", "install", "tabulate"], check=True)
+        subprocess.run([sys.executable, "-m", "pip", "install", "tabulate"], check=True)
         print("\n✅ Installation complete! Running again...\n")
-        asyncio.run(view_database_tables())
+        from tabulate import tabulate
+    main()
@@ -63,6 +63,45 @@ export const authAPI = {
     return await response.json();
   },
 
+  // Change password; every other session is signed out and a new token is stored
+  changePassword: async (currentPassword, newPassword) => {
+    const token = localStorage.getItem('access_token');
+    const response = await fetch(`${API_BASE_URL}/auth/password`, {
+      method: 'PUT',
+      headers: {
+        'Content-Type': 'application/json',
+        'Authorization': `Bearer ${token}`,
+      },
+      body: JSON.stringify({ current_password: currentPassword, new_password: newPassword }),
+    });
+    
+    if (!response.ok) {
+      const error = await response.json();
+      throw new Error(error.detail || 'Failed to change password');
+    }
+    
+    const data = await response.json();
+    localStorage.setItem('access_token', data.access_token);
+    return data;
+  },
+
+  // Delete account (cart and favorites included)
+  deleteAccount: async () => {
+    const token = localStorage.getItem('access_token');
+    const response = await fetch(`${API_BASE_URL}/auth/me`, {
+      method: 'DELETE',
+      headers: {
+        'Authorization': `Bearer ${token}`,
+      },
+    });
+    
+    if (!response.ok) {
+      throw new Error('Failed to delete account');
+    }
+    
+    localStorage.removeItem('access_token');
+  },
+
   // Logout
   logout: () => {
     localStorage.removeItem('access_token');
@@ -82,13 +121,17 @@ export const authAPI = {
 // Product APIs
 export const productAPI = {
   // Get all products
-  getAll: async (category = null) => {
-    let url = `${API_BASE_URL}/products/`;
-    if (category) {
-      url += `?category=${category}`;
-    }
+  // filters: { minPrice, maxPrice, inStock, sort: 'created' | 'newest' | 'price_asc' | 'price_desc' }
+  getAll: async (category = null, filters = {}) => {
+    const params = new URLSearchParams();
+    if (category) params.set('category', category);
+    if (filters.minPrice != null) params.set('min_price', filters.minPrice);
+    if (filters.maxPrice != null) params.set('max_price', filters.maxPrice);
+    if (filters.inStock) params.set('in_stock', 'true');
+    if (filters.sort) params.set('sort', filters.sort);
     
-    const response = await fetch(url);
+    const query = params.toString();
+    const response = await fetch(`${API_BASE_URL}/products/${query ? `?${query}` : ''}`);
     if (!response.ok) {
       throw new Error('Failed to fetch products');
     }
@@ -96,6 +139,23 @@ export const productAPI = {
     return await response.json();
   },
 
+  // Facet counts: { total, categories: [{ category, count }], price_buckets: [{ min, max, count }] }
+  getFacets: async (category = null, filters = {}) => {
+    const params = new URLSearchParams();
+    if (category) params.set('category', category);
+    if (filters.minPrice != null) params.set('min_price', filters.minPrice);
+    if (filters.maxPrice != null) params.set('max_price', filters.maxPrice);
+    if (filters.inStock) params.set('in_stock', 'true');
+    
+    const query = params.toString();
+    const response = await fetch(`${API_BASE_URL}/products/facets${query ? `?${query}` : ''}`);
+    if (!response.ok) {
+      throw new Error('Failed to fetch facets');
+    }
+    
+    return await response.json();
+  },
+
   // Get single product
   getById: async (id) => {
     const response = await fetch(`${API_BASE_URL}/products/${id}`);
@@ -106,6 +166,35 @@ export const productAPI = {
     return await response.json();
   },
 
+  // Get several products in one request: { products: [...], missing: [ids] }
+  getBatch: async (ids) => {
+    const response = await fetch(`${API_BASE_URL}/products/batch`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+      },
+      body: JSON.stringify({ ids: ids }),
+    });
+    if (!response.ok) {
+      throw new Error('Failed to fetch products');
+    }
+    
+    return await response.json();
+  },
+
+  // Frequently bought together: { product_id, recommendations: [{ product_id, orders, confidence }], products }
+  getRecommendations: async (id, limit = 10, expandProducts = true) => {
+    const params = new URLSearchParams({ limit: limit });
+    if (expandProducts) params.set('expand', 'products');
+    
+    const response = await fetch(`${API_BASE_URL}/products/${id}/recommendations?${params.toString()}`);
+    if (!response.ok) {
+      throw new Error('Failed to fetch recommendations');
+    }
+    
+    return await response.json();
+  },
+
   // Search products
   search: async (query) => {
     const response = await fetch(`${API_BASE_URL}/products/search/${query}`);
@@ -119,10 +208,11 @@ export const productAPI = {
 
 // Cart APIs
 export const cartAPI = {
-  // Get cart
-  get: async () => {
+  // Get cart (expandProducts inlines each item's product)
+  get: async (expandProducts = false) => {
     const token = authAPI.getToken();
-    const response = await fetch(`${API_BASE_URL}/cart/`, {
+    const query = expandProducts ? '?expand=products' : '';
+    const response = await fetch(`${API_BASE_URL}/cart/${query}`, {
       headers: {
         'Authorization': `Bearer ${token}`,
       },
@@ -135,6 +225,22 @@ export const cartAPI = {
     return await response.json();
   },
 
+  // Get cart item count and total (cheap; for the cart badge)
+  getSummary: async () => {
+    const token = authAPI.getToken();
+    const response = await fetch(`${API_BASE_URL}/cart/summary`, {
+      headers: {
+        'Authorization': `Bearer ${token}`,
+      },
+    });
+    
+    if (!response.ok) {
+      throw new Error('Failed to fetch cart summary');
+    }
+    
+    return await response.json();
+  },
+
   // Add to cart
   add: async (productId, quantity, price) => {
     const token = authAPI.getToken();
@@ -193,12 +299,83 @@ export const cartAPI = {
   },
 };
 
+// Favorites APIs
+export const favoritesAPI = {
+  // Get favorites with product cards
+  getAll: async () => {
+    const token = authAPI.getToken();
+    const response = await fetch(`${API_BASE_URL}/favorites/`, {
+      headers: {
+        'Authorization': `Bearer ${token}`,
+      },
+    });
+    
+    if (!response.ok) {
+      throw new Error('Failed to fetch favorites');
+    }
+    
+    return await response.json();
+  },
+
+  // Check which products are favorited: returns { [productId]: true/false }
+  check: async (productIds) => {
+    const token = authAPI.getToken();
+    const ids = encodeURIComponent(productIds.join(','));
+    const response = await fetch(`${API_BASE_URL}/favorites/check?ids=${ids}`, {
+      headers: {
+        'Authorization': `Bearer ${token}`,
+      },
+    });
+    
+    if (!response.ok) {
+      throw new Error('Failed to check favorites');
+    }
+    
+    return await response.json();
+  },
+
+  // Add to favorites
+  add: async (productId) => {
+    const token = authAPI.getToken();
+    const response = await fetch(`${API_BASE_URL}/favorites/${productId}`, {
+      method: 'POST',
+      headers: {
+        'Authorization': `Bearer ${token}`,
+      },
+    });
+    
+    if (!response.ok) {
+      throw new Error('Failed to add to favorites');
+    }
+    
+    return await response.json();
+  },
+
+  // Remove from favorites
+  remove: async (productId) => {
+    const token = authAPI.getToken();
+    const response = await fetch(`${API_BASE_URL}/favorites/${productId}`, {
+      method: 'DELETE',
+      headers: {
+        'Authorization': `Bearer ${token}`,
+      },
+    });
+    
+    if (!response.ok) {
+      throw new Error('Failed to remove from favorites');
+    }
+    
+    return await response.json();
+  },
+};
+
 // Order APIs
 export const orderAPI = {
-  // Get all orders
-  getAll: async () => {
+  // Get all orders (expandProducts inlines each item's product)
+  getAll: async (expandProducts = false) => {
     const token = authAPI.getToken();
-    const response = await fetch(`${API_BASE_URL}/orders/`, {
+    const query = expandProducts ? '?expand=products' : '';
+    const response = await fetch(`${API_BASE_URL}/orders/${query}`, {
       headers: {
         'Authorization': `Bearer ${token}`,
       },
@@ -233,10 +410,11 @@ export const orderAPI = {
     return await response.json();
   },
 
-  // Get order by ID
-  getById: async (orderId) => {
+  // Get order by ID (expandProducts inlines each item's product)
+  getById: async (orderId, expandProducts = false) => {
     const token = authAPI.getToken();
-    const response = await fetch(`${API_BASE_URL}/orders/${orderId}`, {
+    const query = expandProducts ? '?expand=products' : '';
+    const response = await fetch(`${API_BASE_URL}/orders/${orderId}${query}`, {
       headers: {
         'Authorization': `Bearer ${token}`,
       },
@@ -254,5 +432,6 @@ export default {
   auth: authAPI,
   products: productAPI,
   cart: cartAPI,
+  favorites: favoritesAPI,
   orders: orderAPI,
 };
@@ -1,3 +1,4 @@
 #!/usr/bin/env bash
-# Start the FastAPI application
-cd backend && python -m uvicorn app.main:app --host 0.0.0.0 --port $PORT
+# Start the FastAPI application: one worker per CPU (SERVER_WORKERS to
+# override), uvloop/httptools, graceful shutdown - see backend/app/server.py
+cd backend && exec python -m app.server --host 0.0.0.0 --port "$PORT"